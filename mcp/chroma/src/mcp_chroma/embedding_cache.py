@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+
+from .metrics import EMBEDDING_CACHE_ENTRIES, EMBEDDING_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 1024))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.environ.get("EMBEDDING_CACHE_TTL_SECONDS", 3600))
+# Where to keep the most recently used entries across restarts; unset to disable.
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH")
+EMBEDDING_CACHE_PERSIST_ENTRIES = int(
+    os.environ.get("EMBEDDING_CACHE_PERSIST_ENTRIES", 256)
+)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Unicode NFC with runs of whitespace collapsed. Case is kept, since
+    embedding models tell "AWS" and "aws" apart.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    A bounded LRU of query embeddings keyed on (model, normalized query),
+    each entry expiring ``ttl`` seconds after it was embedded.
+
+    Expiry uses wall-clock time so entries saved by ``save`` keep their age
+    across a restart.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = EMBEDDING_CACHE_SIZE,
+        ttl: float = EMBEDDING_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple[str, str], tuple[float, list[float]]] = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, model: str, query: str) -> list[float] | None:
+        key = (model, normalize_query(query))
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry[0] > self.ttl:
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            EMBEDDING_CACHE_REQUESTS.labels("miss").inc()
+            EMBEDDING_CACHE_ENTRIES.set(len(self.entries))
+            return None
+        self.entries.move_to_end(key)
+        EMBEDDING_CACHE_REQUESTS.labels("hit").inc()
+        return entry[1]
+
+    def put(
+        self,
+        model: str,
+        query: str,
+        vector: list[float],
+        embedded_at: float | None = None,
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (model, normalize_query(query))
+        self.entries[key] = (
+            time.time() if embedded_at is None else embedded_at,
+            vector,
+        )
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        EMBEDDING_CACHE_ENTRIES.set(len(self.entries))
+
+    def save(
+        self, path: str, max_entries: int = EMBEDDING_CACHE_PERSIST_ENTRIES
+    ) -> None:
+        """Write the most recently used live entries, replacing the file atomically."""
+        now = time.time()
+        hottest = [
+            [model, query, embedded_at, vector]
+            for (model, query), (embedded_at, vector) in reversed(self.entries.items())
+            if now - embedded_at <= self.ttl
+        ][:max_entries]
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(hottest, f)
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Saved {len(hottest)} query embeddings to {path}")
+
+    def load(self, path: str) -> None:
+        """Add the entries saved at path that have not expired since."""
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring the query embedding cache at {path}: {e}")
+            return
+        # Saved hottest first; insert coldest first so LRU order is restored.
+        for model, query, embedded_at, vector in reversed(saved):
+            if time.time() - embedded_at <= self.ttl:
+                self.put(model, query, vector, embedded_at)
+        logger.info(f"Loaded {len(self.entries)} query embeddings from {path}")
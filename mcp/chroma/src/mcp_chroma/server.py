@@ -1,11 +1,14 @@
+import asyncio
 import json
 import logging
 import os
+from contextlib import asynccontextmanager
 
 import anyio
 import chromadb
 import mcp.types as types
 import uvicorn
+from chromadb.api.models.Collection import Collection
 from chromadb.config import Settings
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
@@ -16,6 +19,16 @@ from mcp.shared.exceptions import McpError
 from mcp.types import INTERNAL_ERROR, ErrorData, TextContent
 from uvicorn.config import LOGGING_CONFIG
 
+from .embedding_cache import EMBEDDING_CACHE_PATH, QueryEmbeddingCache, normalize_query
+from .metrics import (
+    SSE_SESSIONS,
+    backend_operation,
+    handle_metrics,
+    instrument_tool,
+    monitor_event_loop,
+)
+from .workers import WorkerPool
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -26,6 +39,9 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+OLLAMA_EMBEDDING_MODEL = os.environ.get("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+MAX_BATCH_QUERIES = 32
+
 
 def initialize_embeddings():
     protocol = (
@@ -35,12 +51,12 @@ def initialize_embeddings():
     )
     embeddings = OllamaEmbeddings(
         base_url=f"{protocol}://{os.environ.get('OLLAMA_HOST')}:{int(os.environ.get('OLLAMA_PORT', 11434))}",  # TODO: Make protocol configurable
-        model="nomic-embed-text",
+        model=OLLAMA_EMBEDDING_MODEL,
     )
     return embeddings
 
 
-def initialize_chroma_client(embeddings: Embeddings) -> Chroma:
+def initialize_chroma_client(embeddings: Embeddings) -> tuple[Chroma, Collection]:
 
     chroma_client = chromadb.HttpClient(
         settings=Settings(
@@ -54,23 +70,42 @@ def initialize_chroma_client(embeddings: Embeddings) -> Chroma:
     )
     chroma_client.heartbeat()
 
-    chroma_client.get_or_create_collection("notion")
+    collection = chroma_client.get_or_create_collection("notion")
 
     vector_store = Chroma(
         client=chroma_client,
         collection_name="notion",
         embedding_function=embeddings,
     )
-    return vector_store
+    return vector_store, collection
 
 
+# One embedding client and one query embedding cache for the whole process.
 embeddings = initialize_embeddings()
-vector_store = initialize_chroma_client(embeddings)
+# The langchain store serves single searches; batches query the collection directly.
+vector_store, collection = initialize_chroma_client(embeddings)
 logger.info("Retrieved existing collection 'langchain'")
+query_embeddings = QueryEmbeddingCache()
+if EMBEDDING_CACHE_PATH:
+    query_embeddings.load(EMBEDDING_CACHE_PATH)
+# The Chroma client is synchronous, so its queries run on a bounded pool.
+chroma_queries = WorkerPool("chroma")
 
 
 server = Server("mcp_chroma")
 
+FILTER_PROPERTIES = {
+    "metadata_filter": {
+        "type": "object",
+        "additionalProperties": True,
+        "description": 'Only documents whose metadata match this Chroma where clause, such as {"title": "Kubernetes"} or {"notion_id": {"$in": ["..."]}}. Documents carry title, notion_id and last_updated, which is a string so only equality operators apply to it',
+    },
+    "content_filter": {
+        "type": "string",
+        "description": "Only documents whose text contains this string",
+    },
+}
+
 
 server.command_options = {
     "search_similar": {
@@ -78,8 +113,7 @@ server.command_options = {
         "properties": {
             "query": {"type": "string"},
             "num_results": {"type": "integer", "minimum": 1, "default": 5},
-            # "metadata_filter": {"type": "object", "additionalProperties": True},
-            # "content_filter": {"type": "string"},
+            **FILTER_PROPERTIES,
         },
         "required": ["query"],
     },
@@ -98,16 +132,44 @@ async def handle_list_tools() -> list[types.Tool]:
                 "properties": {
                     "query": {"type": "string"},
                     "num_results": {"type": "integer", "minimum": 1, "default": 5},
-                    # "metadata_filter": {"type": "object", "additionalProperties": True},
-                    # "content_filter": {"type": "string"},
+                    **FILTER_PROPERTIES,
                 },
                 "required": ["query"],
             },
         ),
+        types.Tool(
+            name="search_similar_batch",
+            description="Search for documents similar to each of several queries at once, with one embedding request and one database query for the whole batch. Returns the matches grouped per query",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": 1,
+                        "maxItems": MAX_BATCH_QUERIES,
+                    },
+                    "num_results": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "default": 5,
+                        "description": "Matches per query",
+                    },
+                    "deduplicate": {
+                        "type": "boolean",
+                        "default": False,
+                        "description": "Return a document matched by several queries only under the query it is closest to",
+                    },
+                    **FILTER_PROPERTIES,
+                },
+                "required": ["queries"],
+            },
+        ),
     ]
 
 
 @server.call_tool()
+@instrument_tool
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent]:
@@ -118,6 +180,8 @@ async def handle_call_tool(
     try:
         if name == "search_similar":
             return await handle_search_similar(arguments)
+        elif name == "search_similar_batch":
+            return await handle_search_similar_batch(arguments)
             # return [
             #     TextContent(
             #         type="text",
@@ -146,29 +210,70 @@ async def handle_call_tool(
         )
 
 
+async def embed_queries(queries: list[str]) -> list[list[float]]:
+    """
+    Embed queries, taking what it can from the cache and the rest in one
+    batch. The normalized text is what gets embedded, as it is what the
+    cache is keyed on.
+    """
+    vectors = [query_embeddings.get(embeddings.model, query) for query in queries]
+    missing = list(
+        dict.fromkeys(
+            normalize_query(query)
+            for query, vector in zip(queries, vectors)
+            if vector is None
+        )
+    )
+    if missing:
+        with backend_operation("ollama", "embed"):
+            embedded = dict(zip(missing, await embeddings.aembed_documents(missing)))
+        for query, vector in embedded.items():
+            query_embeddings.put(embeddings.model, query, vector)
+        vectors = [
+            vector if vector is not None else embedded[normalize_query(query)]
+            for query, vector in zip(queries, vectors)
+        ]
+    return vectors
+
+
+def chroma_filters(arguments: dict) -> tuple[dict | None, dict | None]:
+    """
+    The Chroma where and where_document clauses for the optional filters, so
+    Chroma narrows the candidates before ranking them. A where clause takes a
+    single field or operator, so several top-level keys, fields and operators
+    alike, become one clause each under $and.
+    """
+    where = arguments.get("metadata_filter") or None
+    if where and len(where) > 1:
+        where = {"$and": [{key: value} for key, value in where.items()]}
+    content_filter = arguments.get("content_filter")
+    where_document = {"$contains": content_filter} if content_filter else None
+    return where, where_document
+
+
 async def handle_search_similar(arguments: dict) -> list[types.TextContent]:
     """Handle similarity search with retry logic"""
     query = arguments.get("query")
     num_results = arguments.get("num_results", 5)
-    # metadata_filter = arguments.get("metadata_filter")
-    # content_filter = arguments.get("content_filter")
+    where, where_document = chroma_filters(arguments)
 
     if not query:
         raise Exception("Missing query")
 
     try:
-
-        embeddings = initialize_embeddings()
-
-        embedding_vector = embeddings.embed_query(query)
-        logger.info("Embedding vector: " + str(embedding_vector))
-        results = vector_store.similarity_search_by_vector_with_relevance_scores(
-            embedding=embedding_vector, k=num_results
-        )
+        [embedding_vector] = await embed_queries([query])
+        with backend_operation("chroma", "query"):
+            results = await chroma_queries.run(
+                vector_store.similarity_search_by_vector_with_relevance_scores,
+                embedding=embedding_vector,
+                k=num_results,
+                filter=where,
+                where_document=where_document,
+            )
 
         if not results or len(results) == 0:
             return [
-                type.TextContent(
+                types.TextContent(
                     type="text", text="No documents found matching query: " + query
                 )
             ]
@@ -186,6 +291,74 @@ async def handle_search_similar(arguments: dict) -> list[types.TextContent]:
         raise Exception(str(e))
 
 
+async def handle_search_similar_batch(arguments: dict) -> list[types.TextContent]:
+    """
+    Search for several queries with one embed request and one multi-embedding
+    Chroma query. With deduplicate, a document matched by several queries is
+    kept only under the query it is closest to.
+    """
+    queries = arguments.get("queries")
+    num_results = int(arguments.get("num_results", 5))
+    deduplicate = bool(arguments.get("deduplicate", False))
+    where, where_document = chroma_filters(arguments)
+
+    if not queries:
+        raise Exception("Missing queries")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise Exception(f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    vectors = await embed_queries(queries)
+    with backend_operation("chroma", "query"):
+        results = await chroma_queries.run(
+            collection.query,
+            query_embeddings=vectors,
+            n_results=num_results,
+            where=where,
+            where_document=where_document,
+            include=["documents", "metadatas", "distances"],
+        )
+
+    groups = [
+        [
+            {"id": id, "content": content, "metadata": metadata, "distance": distance}
+            for id, content, metadata, distance in zip(
+                results["ids"][i],
+                results["documents"][i],
+                results["metadatas"][i],
+                results["distances"][i],
+            )
+        ]
+        for i in range(len(queries))
+    ]
+    if deduplicate:
+        closest = {}
+        for i, matches in enumerate(groups):
+            for match in matches:
+                if (
+                    match["id"] not in closest
+                    or match["distance"] < closest[match["id"]][0]
+                ):
+                    closest[match["id"]] = (match["distance"], i)
+        groups = [
+            [match for match in matches if closest[match["id"]][1] == i]
+            for i, matches in enumerate(groups)
+        ]
+
+    return [
+        types.TextContent(
+            type="text",
+            text=json.dumps(
+                {
+                    "results": [
+                        {"query": query, "matches": matches}
+                        for query, matches in zip(queries, groups)
+                    ]
+                }
+            ),
+        )
+    ]
+
+
 def main():
     logger.info("Server is starting up")
 
@@ -214,17 +387,30 @@ def main():
         sse = SseServerTransport("/messages/")
 
         async def handle_sse(request):
-            async with sse.connect_sse(
-                request.scope, request.receive, request._send
-            ) as streams:
-                await server.run(
-                    streams[0], streams[1], server.create_initialization_options()
-                )
+            with SSE_SESSIONS.track_inprogress():
+                async with sse.connect_sse(
+                    request.scope, request.receive, request._send
+                ) as streams:
+                    await server.run(
+                        streams[0], streams[1], server.create_initialization_options()
+                    )
+
+        @asynccontextmanager
+        async def lifespan(app):
+            lag_monitor = asyncio.create_task(monitor_event_loop())
+            try:
+                yield
+            finally:
+                lag_monitor.cancel()
+                if EMBEDDING_CACHE_PATH:
+                    query_embeddings.save(EMBEDDING_CACHE_PATH)
 
         starlette_app = Starlette(
             debug=True,
+            lifespan=lifespan,
             routes=[
                 Route("/sse", endpoint=handle_sse),
+                Route("/metrics", endpoint=handle_metrics),
                 Mount("/messages/", app=sse.handle_post_message),
             ],
         )
@@ -0,0 +1,45 @@
+import functools
+import os
+
+import anyio
+import anyio.to_thread
+
+from .metrics import WORKER_POOL_REJECTIONS
+
+CHROMA_QUERY_WORKERS = int(os.environ.get("CHROMA_QUERY_WORKERS", 8))
+CHROMA_QUERY_QUEUE = int(os.environ.get("CHROMA_QUERY_QUEUE", 64))
+
+
+class PoolFull(Exception):
+    pass
+
+
+class WorkerPool:
+    """
+    Runs blocking client calls on at most ``workers`` threads, off the event
+    loop. At most ``max_queued`` calls wait for a thread; any call beyond
+    that is turned away at once rather than left to time out in the queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int = CHROMA_QUERY_WORKERS,
+        max_queued: int = CHROMA_QUERY_QUEUE,
+    ):
+        self.name = name
+        self.limiter = anyio.CapacityLimiter(workers)
+        self.capacity = workers + max_queued
+        self.admitted = 0
+
+    async def run(self, func, *args, **kwargs):
+        if self.admitted >= self.capacity:
+            WORKER_POOL_REJECTIONS.labels(self.name).inc()
+            raise PoolFull(f"Too many {self.name} calls in progress, try again later")
+        self.admitted += 1
+        try:
+            return await anyio.to_thread.run_sync(
+                functools.partial(func, *args, **kwargs), limiter=self.limiter
+            )
+        finally:
+            self.admitted -= 1
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import mcp_chroma.server
+
+
+class CountingEmbeddings:
+    model = "counting"
+
+    def __init__(self):
+        self.batches = []
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(texts)
+        return [[float(i)] for i, _ in enumerate(texts)]
+
+
+class FakeCollection:
+    """Query i matches doc0 at distance 0.5 - 0.1 i, and a doc of its own."""
+
+    def __init__(self):
+        self.calls = []
+
+    def query(self, query_embeddings, n_results, include, **filters):
+        self.calls.append(query_embeddings)
+        self.filters = filters
+        count = len(query_embeddings)
+        return {
+            "ids": [["doc0", f"own{i}"] for i in range(count)],
+            "documents": [["shared", f"own {i}"] for i in range(count)],
+            "metadatas": [[{}, {"query": i}] for i in range(count)],
+            "distances": [[0.5 - 0.1 * i, 0.9] for i in range(count)],
+        }
+
+
+def search(monkeypatch, arguments):
+    embeddings, collection = CountingEmbeddings(), FakeCollection()
+    monkeypatch.setattr(mcp_chroma.server, "embeddings", embeddings)
+    monkeypatch.setattr(mcp_chroma.server, "collection", collection)
+    monkeypatch.setattr(
+        mcp_chroma.server, "query_embeddings", mcp_chroma.server.QueryEmbeddingCache()
+    )
+    result = asyncio.run(
+        mcp_chroma.server.handle_call_tool("search_similar_batch", arguments)
+    )
+    return json.loads(result[0].text)["results"], embeddings, collection
+
+
+def test_search_similar_batch(monkeypatch):
+    results, embeddings, collection = search(
+        monkeypatch, {"queries": ["AWS", "EKS", "AWS "], "num_results": 2}
+    )
+
+    assert embeddings.batches == [["AWS", "EKS"]]
+    assert collection.calls == [[[0.0], [1.0], [0.0]]]
+    assert [result["query"] for result in results] == ["AWS", "EKS", "AWS "]
+    assert [[match["id"] for match in result["matches"]] for result in results] == [
+        ["doc0", "own0"],
+        ["doc0", "own1"],
+        ["doc0", "own2"],
+    ]
+
+
+def test_search_similar_batch_deduplicate(monkeypatch):
+    results, _, _ = search(
+        monkeypatch, {"queries": ["AWS", "EKS", "GKE"], "deduplicate": True}
+    )
+
+    assert [[match["id"] for match in result["matches"]] for result in results] == [
+        ["own0"],
+        ["own1"],
+        ["doc0", "own2"],
+    ]
+
+
+def test_search_similar_batch_filters(monkeypatch):
+    _, _, collection = search(
+        monkeypatch,
+        {"queries": ["AWS"], "metadata_filter": {"title": "AWS"}},
+    )
+
+    assert collection.filters == {"where": {"title": "AWS"}, "where_document": None}
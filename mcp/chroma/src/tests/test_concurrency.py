@@ -0,0 +1,67 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import mcp_chroma.server
+from mcp_chroma.workers import PoolFull, WorkerPool
+
+DELAY = 0.2
+
+
+class SlowEmbeddings:
+    model = "slow"
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(DELAY)
+        return [[float(len(text))] for text in texts]
+
+
+class SlowVectorStore:
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k, **filters
+    ):
+        time.sleep(DELAY)
+        return [(SimpleNamespace(page_content="AWS", metadata={}), 0.5)]
+
+
+def test_searches_overlap(monkeypatch):
+    monkeypatch.setattr(mcp_chroma.server, "embeddings", SlowEmbeddings())
+    monkeypatch.setattr(mcp_chroma.server, "vector_store", SlowVectorStore())
+    monkeypatch.setattr(
+        mcp_chroma.server, "query_embeddings", mcp_chroma.server.QueryEmbeddingCache()
+    )
+    monkeypatch.setattr(
+        mcp_chroma.server, "chroma_queries", WorkerPool("chroma", workers=8)
+    )
+
+    async def search_concurrently():
+        return await asyncio.gather(
+            *(
+                mcp_chroma.server.handle_call_tool(
+                    "search_similar", {"query": f"query {i}"}
+                )
+                for i in range(8)
+            )
+        )
+
+    started = time.perf_counter()
+    results = asyncio.run(search_concurrently())
+    elapsed = time.perf_counter() - started
+
+    # One embed and one query each; run one after another this would take 16 delays.
+    assert elapsed < 4 * DELAY
+    assert all("AWS" in result[0].text for result in results)
+
+
+def test_worker_pool_admission():
+    pool = WorkerPool("test", workers=1, max_queued=1)
+
+    async def run_three():
+        return await asyncio.gather(
+            *(pool.run(time.sleep, DELAY) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run_three())
+
+    assert sum(isinstance(result, PoolFull) for result in results) == 1
+    assert results.count(None) == 2
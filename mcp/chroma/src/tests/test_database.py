@@ -10,7 +10,7 @@ load_dotenv()
 
 def test_list_tools():
     tools = asyncio.run(server.list_tools())
-    assert len(tools) == 1
+    assert len(tools) == 2
 
 
 def test_create_entity():
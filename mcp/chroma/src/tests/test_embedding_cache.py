@@ -0,0 +1,45 @@
+import time
+
+from mcp_chroma.embedding_cache import QueryEmbeddingCache
+from mcp_chroma.metrics import EMBEDDING_CACHE_REQUESTS
+
+
+def test_lru_and_normalization():
+    cache = QueryEmbeddingCache(max_entries=2)
+    hits = EMBEDDING_CACHE_REQUESTS.labels("hit")._value.get()
+    cache.put("model", "Tell me  about AWS", [1.0])
+    cache.put("model", "EKS", [2.0])
+
+    assert cache.get("model", " Tell me about\tAWS ") == [1.0]
+    assert cache.get("other-model", "Tell me about AWS") is None
+    assert cache.get("model", "tell me about aws") is None
+    cache.put("model", "GKE", [3.0])
+
+    assert cache.get("model", "EKS") is None
+    assert cache.get("model", "Tell me about AWS") == [1.0]
+    assert EMBEDDING_CACHE_REQUESTS.labels("hit")._value.get() == hits + 2
+
+
+def test_ttl():
+    cache = QueryEmbeddingCache(ttl=60)
+    cache.put("model", "fresh", [1.0])
+    cache.put("model", "stale", [2.0], embedded_at=time.time() - 120)
+
+    assert cache.get("model", "fresh") == [1.0]
+    assert cache.get("model", "stale") is None
+    assert len(cache) == 1
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "query-embeddings.json")
+    cache = QueryEmbeddingCache()
+    for i in range(5):
+        cache.put("model", f"query{i}", [float(i)])
+    cache.get("model", "query0")
+    cache.save(path, max_entries=2)
+
+    restarted = QueryEmbeddingCache()
+    restarted.load(path)
+
+    assert list(restarted.entries) == [("model", "query4"), ("model", "query0")]
+    assert restarted.get("model", "query0") == [0.0]
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import mcp_chroma.server
+from mcp_chroma.server import chroma_filters
+
+
+class FixedEmbeddings:
+    model = "fixed"
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0] for _ in texts]
+
+
+class RecordingVectorStore:
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k, **filters
+    ):
+        self.filters = filters
+        return [(SimpleNamespace(page_content="EKS", metadata={}), 0.5)]
+
+
+def test_chroma_filters():
+    assert chroma_filters({}) == (None, None)
+    assert chroma_filters({"metadata_filter": {}, "content_filter": ""}) == (
+        None,
+        None,
+    )
+    assert chroma_filters({"metadata_filter": {"title": "AWS"}}) == (
+        {"title": "AWS"},
+        None,
+    )
+    assert chroma_filters(
+        {"metadata_filter": {"title": "AWS", "notion_id": {"$in": ["a", "b"]}}}
+    ) == (
+        {"$and": [{"title": "AWS"}, {"notion_id": {"$in": ["a", "b"]}}]},
+        None,
+    )
+    either = [{"title": "AWS"}, {"title": "GCP"}]
+    assert chroma_filters({"metadata_filter": {"notion_id": "a", "$or": either}}) == (
+        {"$and": [{"notion_id": "a"}, {"$or": either}]},
+        None,
+    )
+    where = {"$or": either}
+    assert chroma_filters({"metadata_filter": where, "content_filter": "EKS"}) == (
+        where,
+        {"$contains": "EKS"},
+    )
+
+
+def test_search_similar_passes_filters(monkeypatch):
+    vector_store = RecordingVectorStore()
+    monkeypatch.setattr(mcp_chroma.server, "embeddings", FixedEmbeddings())
+    monkeypatch.setattr(mcp_chroma.server, "vector_store", vector_store)
+    monkeypatch.setattr(
+        mcp_chroma.server, "query_embeddings", mcp_chroma.server.QueryEmbeddingCache()
+    )
+
+    asyncio.run(
+        mcp_chroma.server.handle_call_tool(
+            "search_similar",
+            {
+                "query": "clusters",
+                "metadata_filter": {"title": "AWS"},
+                "content_filter": "EKS",
+            },
+        )
+    )
+
+    assert vector_store.filters == {
+        "filter": {"title": "AWS"},
+        "where_document": {"$contains": "EKS"},
+    }
@@ -0,0 +1,118 @@
+import random
+
+WORDS = [
+    "alpha",
+    "amber",
+    "anchor",
+    "apple",
+    "arrow",
+    "atlas",
+    "basin",
+    "beacon",
+    "birch",
+    "blossom",
+    "bridge",
+    "canyon",
+    "cedar",
+    "cinder",
+    "cobalt",
+    "comet",
+    "coral",
+    "cotton",
+    "crystal",
+    "delta",
+    "desert",
+    "ember",
+    "falcon",
+    "fern",
+    "forest",
+    "garnet",
+    "glacier",
+    "granite",
+    "harbor",
+    "hazel",
+    "horizon",
+    "island",
+    "ivory",
+    "jasper",
+    "lagoon",
+    "lantern",
+    "lilac",
+    "maple",
+    "meadow",
+    "meteor",
+    "mist",
+    "nectar",
+    "oasis",
+    "onyx",
+    "orchid",
+    "pebble",
+    "pine",
+    "prairie",
+    "quartz",
+    "raven",
+    "reef",
+    "ridge",
+    "saffron",
+    "sierra",
+    "spruce",
+    "summit",
+    "thistle",
+    "tundra",
+    "valley",
+    "willow",
+    "winter",
+    "zephyr",
+    "zenith",
+    "zinc",
+]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def generate_graph(
+    entities: int = 1000,
+    observations: int = 5,
+    observation_words: int = 12,
+    fanout: int = 3,
+    entity_types: int = 8,
+    relation_types: int = 6,
+    seed: int = 0,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Build a synthetic knowledge graph.
+
+    Every entity gets ``observations`` sentences of ``observation_words`` words
+    and ``fanout`` outgoing relations to other random entities. The same
+    arguments always produce the same graph.
+    """
+    rng = random.Random(seed)
+    names = [f"entity-{i:06d}" for i in range(entities)]
+    graph_entities = [
+        {
+            "name": name,
+            "entity_type": f"type-{rng.randrange(entity_types)}",
+            "observations": list(
+                dict.fromkeys(
+                    sentence(rng, observation_words) for _ in range(observations)
+                )
+            ),
+        }
+        for name in names
+    ]
+
+    relations = {}
+    for name in names:
+        for _ in range(min(fanout, entities - 1)):
+            target = rng.choice(names)
+            if target == name:
+                continue
+            relation = {
+                "from_entity": name,
+                "to_entity": target,
+                "relation_type": f"relation-{rng.randrange(relation_types)}",
+            }
+            relations[tuple(relation.values())] = relation
+    return graph_entities, list(relations.values())
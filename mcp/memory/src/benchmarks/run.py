@@ -0,0 +1,427 @@
+"""
+Benchmark every mcp_memory tool against a synthetic graph.
+
+Run from mcp/memory/src, e.g.:
+
+    python -m benchmarks.run --backend sqlite --entities 10000
+    python -m benchmarks.run --backend mongo --output after.json --compare before.json
+
+The mongo backend uses MONGO_URI and a throwaway database, which is dropped
+before and after the run.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from mcp_memory import server
+from pymongo import monitoring
+
+from .graph import WORDS, generate_graph, sentence
+
+SEED_BATCH_SIZE = 500
+BENCHMARK_DATABASE = "memories_benchmark"
+
+logger = logging.getLogger("mcp_memory")
+
+
+class OperationCounter(monitoring.CommandListener):
+    """Counts storage operations: MongoDB commands or SQLite statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event) -> None:
+        self.count += 1
+
+    def succeeded(self, event) -> None:
+        pass
+
+    def failed(self, event) -> None:
+        pass
+
+    def statement(self, statement: str) -> None:
+        self.count += 1
+
+
+def scenarios(names: list[str], observation_words: int) -> list[tuple]:
+    """
+    (label, tool, iterations cap, arguments for call i) for every tool.
+
+    Write scenarios create their own entities and relations, and the matching
+    delete scenarios later remove exactly those, so the seeded graph keeps its
+    size for the read scenarios in between.
+    """
+    added, targets = {}, {}
+
+    def pick(rng: random.Random, count: int = 1) -> list[str]:
+        return rng.sample(names, min(count, len(names)))
+
+    def add_observations(i, rng):
+        [name] = pick(rng)
+        observations = [f"{sentence(rng, observation_words)} {i}"]
+        added[i] = (name, observations)
+        return {"entity_name": name, "observations": observations}
+
+    def create_relation(i, rng):
+        targets[i] = pick(rng)[0]
+        return {
+            "from_entity": f"bench-entity-{i}",
+            "to_entity": targets[i],
+            "relation_type": "bench",
+        }
+
+    def delete_relation(i, rng):
+        return {
+            "from_entity": f"bench-entity-{i}",
+            "to_entity": targets.get(i, ""),
+            "relation_type": "bench",
+        }
+
+    def delete_observations(i, rng):
+        name, observations = added.get(i, (pick(rng)[0], ["missing"]))
+        return {"entity_name": name, "observations": observations}
+
+    return [
+        (
+            "create_entity",
+            "create_entity",
+            None,
+            lambda i, rng: {
+                "name": f"bench-entity-{i}",
+                "entity_type": "bench",
+                "observations": [sentence(rng, observation_words)],
+            },
+        ),
+        (
+            "create_entities",
+            "create_entities",
+            None,
+            lambda i, rng: {
+                "entities": [
+                    {
+                        "name": f"bench-batch-{i}-{j}",
+                        "entity_type": "bench",
+                        "observations": [sentence(rng, observation_words)],
+                    }
+                    for j in range(10)
+                ]
+            },
+        ),
+        ("create_relation", "create_relation", None, create_relation),
+        (
+            "create_relations",
+            "create_relations",
+            None,
+            lambda i, rng: {
+                "relations": [
+                    {
+                        "from_entity": f"bench-batch-{i}-{j}",
+                        "to_entity": pick(rng)[0],
+                        "relation_type": "bench",
+                    }
+                    for j in range(10)
+                ]
+            },
+        ),
+        ("add_observations", "add_observations", None, add_observations),
+        (
+            "add_observations_batch",
+            "add_observations_batch",
+            None,
+            lambda i, rng: {
+                "observations": [
+                    {
+                        "entity_name": name,
+                        "observations": [f"{sentence(rng, observation_words)} {i}"],
+                    }
+                    for name in pick(rng, 10)
+                ]
+            },
+        ),
+        ("delete_observations", "delete_observations", None, delete_observations),
+        (
+            "search_nodes:text",
+            "search_nodes",
+            None,
+            lambda i, rng: {"query": " ".join(rng.sample(WORDS, 2))},
+        ),
+        (
+            "search_nodes:substring",
+            "search_nodes",
+            None,
+            lambda i, rng: {"query": rng.choice(WORDS), "mode": "substring"},
+        ),
+        (
+            "open_nodes",
+            "open_nodes",
+            None,
+            lambda i, rng: {"names": pick(rng, 5)},
+        ),
+        (
+            "traverse",
+            "traverse",
+            None,
+            lambda i, rng: {"start": pick(rng), "max_depth": 2},
+        ),
+        (
+            "read_graph:summary",
+            "read_graph",
+            None,
+            lambda i, rng: {"mode": "summary"},
+        ),
+        (
+            "read_graph:page",
+            "read_graph",
+            None,
+            lambda i, rng: {"limit": 100, "observation_limit": 3},
+        ),
+        ("read_graph:full", "read_graph", 5, lambda i, rng: {}),
+        (
+            "list_by_type",
+            "list_by_type",
+            None,
+            lambda i, rng: {
+                "entity_type": f"type-{i % 8}",
+                "limit": 50,
+                "observation_counts": True,
+            },
+        ),
+        ("count_by_type", "count_by_type", None, lambda i, rng: {}),
+        (
+            "changes_since",
+            "changes_since",
+            None,
+            lambda i, rng: {"revision": 0, "limit": 100},
+        ),
+        ("delete_relation", "delete_relation", None, delete_relation),
+        (
+            "delete_entities",
+            "delete_entities",
+            None,
+            lambda i, rng: {
+                "entity_names": [f"bench-entity-{i}"]
+                + [f"bench-batch-{i}-{j}" for j in range(10)]
+            },
+        ),
+    ]
+
+
+def summarize(latencies: list[float], elapsed: float, operations: int) -> dict:
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return {
+        "calls": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "p99_ms": round(p99 * 1000, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "operations_per_call": round(operations / len(latencies), 2),
+    }
+
+
+async def run_scenario(
+    tool: str,
+    arguments: list[dict],
+    concurrency: int,
+    counter: OperationCounter,
+) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(args: dict) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await server.handle_call_tool(tool, args)
+            latencies.append(time.perf_counter() - started)
+
+    counter.count = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(call(args) for args in arguments))
+    return summarize(latencies, time.perf_counter() - started, counter.count)
+
+
+def create_storage(backend: str, sqlite_path: str | None, counter: OperationCounter):
+    if backend == "mongo":
+        from mcp_memory.mongo_storage import MongoConnection, MongoStorage
+
+        # Listeners must be registered before the client is created.
+        monitoring.register(counter)
+        return MongoStorage(MongoConnection(database=BENCHMARK_DATABASE))
+    if backend == "sqlite":
+        from mcp_memory.sqlite_storage import SQLiteStorage
+
+        return SQLiteStorage(sqlite_path)
+    raise Exception(f"Unknown memory backend: {backend}")
+
+
+async def drop_benchmark_database(storage) -> None:
+    db = await storage.connection.open()
+    await db.client.drop_database(BENCHMARK_DATABASE)
+
+
+async def benchmark(
+    backend: str = "sqlite",
+    entities: int = 1000,
+    observations: int = 5,
+    observation_words: int = 12,
+    fanout: int = 3,
+    iterations: int = 200,
+    concurrency: int = 1,
+    seed: int = 0,
+    sqlite_path: str | None = None,
+) -> dict:
+    parameters = {
+        "backend": backend,
+        "entities": entities,
+        "observations": observations,
+        "observation_words": observation_words,
+        "fanout": fanout,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "seed": seed,
+    }
+    counter = OperationCounter()
+    with tempfile.TemporaryDirectory() as directory:
+        storage = create_storage(
+            backend, sqlite_path or os.path.join(directory, "memory.db"), counter
+        )
+        manager = server.KnowledgeGraphManager(storage)
+        previous, server.manager = server.manager, manager
+        try:
+            if backend == "mongo":
+                await drop_benchmark_database(storage)
+            await manager.setup()
+            if backend == "sqlite":
+                storage.db.set_trace_callback(counter.statement)
+
+            graph_entities, graph_relations = generate_graph(
+                entities, observations, observation_words, fanout, seed=seed
+            )
+            started = time.perf_counter()
+            for i in range(0, len(graph_entities), SEED_BATCH_SIZE):
+                await manager.create_entities(
+                    {"entities": graph_entities[i : i + SEED_BATCH_SIZE]}
+                )
+            for i in range(0, len(graph_relations), SEED_BATCH_SIZE):
+                await manager.create_relations(
+                    {"relations": graph_relations[i : i + SEED_BATCH_SIZE]}
+                )
+            logger.info(
+                f"Seeded {len(graph_entities)} entities and {len(graph_relations)} "
+                f"relations in {time.perf_counter() - started:.1f}s"
+            )
+
+            rng = random.Random(seed)
+            names = [entity["name"] for entity in graph_entities]
+            results = {}
+            for label, tool, cap, make_arguments in scenarios(names, observation_words):
+                count = min(iterations, cap or iterations)
+                arguments = [make_arguments(i, rng) for i in range(count)]
+                results[label] = await run_scenario(
+                    tool, arguments, concurrency, counter
+                )
+                logger.info(f"{label}: {results[label]}")
+        finally:
+            if backend == "mongo":
+                await drop_benchmark_database(storage)
+            await manager.close()
+            server.manager = previous
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "parameters": parameters,
+        "tools": results,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results: dict, baseline: dict | None = None) -> list[str]:
+    """One line per tool with p50, p95 and throughput, relative to a baseline if given."""
+    lines = [
+        f"{'tool':<24} {'p50 ms':>16} {'p95 ms':>16} {'throughput/s':>20}",
+    ]
+    for label, stats in results["tools"].items():
+        before = baseline["tools"].get(label) if baseline else None
+        columns = []
+        for key in ("p50_ms", "p95_ms", "throughput_per_s"):
+            if before and before[key]:
+                change = (stats[key] - before[key]) / before[key] * 100
+                columns.append(f"{stats[key]} ({change:+.0f}%)")
+            else:
+                columns.append(str(stats[key]))
+        lines.append(f"{label:<24} {columns[0]:>16} {columns[1]:>16} {columns[2]:>20}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["mongo", "sqlite"], default="sqlite")
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--observations", type=int, default=5)
+    parser.add_argument("--observation-words", type=int, default=12)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sqlite-path")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="log every tool call")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("mcp_memory").setLevel(logging.WARNING)
+
+    results = asyncio.run(
+        benchmark(
+            backend=args.backend,
+            entities=args.entities,
+            observations=args.observations,
+            observation_words=args.observation_words,
+            fanout=args.fanout,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+            seed=args.seed,
+            sqlite_path=args.sqlite_path,
+        )
+    )
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print("\n".join(report(results, baseline)))
+    print(f"Results written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,6 @@
 
 
 # __all__ = ["main", "server"]
-import sys
-
 from .server import main
 
-sys.exit(main())
+__all__ = ["main"]
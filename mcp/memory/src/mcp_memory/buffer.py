@@ -0,0 +1,292 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from .storage import KnowledgeGraphStorage
+
+logger = logging.getLogger("mcp_memory")
+
+ENTITIES = "entities"
+RELATIONS = "relations"
+OBSERVATIONS = "observations"
+OBSERVATIONS_BATCH = "observations_batch"
+
+
+class BufferedStorage(KnowledgeGraphStorage):
+    """
+    Coalesces bursts of writes into bulk writes.
+
+    Entity, relation and observation adds are queued for up to ``window``
+    seconds (or until ``max_items`` are queued) and then written together:
+    one bulk write for the entities, one for the relations, one observation
+    add per entity however many calls targeted it, and one batch for the
+    batched observation adds. Each caller still waits for, and gets, its own
+    statuses, so the tool responses are exactly those of unbuffered writes.
+
+    Every read and delete first flushes what is queued, so a session always
+    reads its own writes and deletes never overtake earlier adds. ``close``
+    flushes before closing the wrapped storage.
+    """
+
+    def __init__(
+        self, storage: KnowledgeGraphStorage, window: float, max_items: int = 1000
+    ):
+        self.storage = storage
+        self.window = window
+        self.max_items = max_items
+        self.cacheable = storage.cacheable
+        self._pending: list[tuple[str, object, asyncio.Future]] = []
+        self._pending_items = 0
+        self._timer: asyncio.Task | None = None
+        self._flushes: set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+
+    def __getattr__(self, name):
+        # Backend specific helpers (migrations, degree rebuilds) pass through.
+        return getattr(self.storage, name)
+
+    async def setup(self) -> None:
+        await self.storage.setup()
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        await self.storage.close()
+
+    async def ping(self) -> None:
+        await self.storage.ping()
+
+    async def watch(
+        self,
+        on_change: Callable[[dict], None],
+        on_reset: Callable[[], Awaitable[None]],
+    ) -> None:
+        await self.storage.watch(on_change, on_reset)
+
+    # Buffering
+
+    def _enqueue(self, kind: str, payload, items: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, payload, future))
+        self._pending_items += items
+        if self._pending_items >= self.max_items:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything queued so far."""
+        async with self._lock:
+            pending, self._pending, self._pending_items = self._pending, [], 0
+            if not pending:
+                return
+            by_kind = {}
+            for kind, payload, future in pending:
+                by_kind.setdefault(kind, []).append((payload, future))
+            for kind, write in (
+                (ENTITIES, self._write_entities),
+                (RELATIONS, self._write_relations),
+                (OBSERVATIONS, self._write_observations),
+                (OBSERVATIONS_BATCH, self._write_observations_batch),
+            ):
+                if kind not in by_kind:
+                    continue
+                try:
+                    await write(by_kind[kind])
+                except Exception as e:
+                    logger.error(f"Buffered {kind} write failed: {e}")
+                    for _, future in by_kind[kind]:
+                        if not future.done():
+                            future.set_exception(e)
+            logger.debug(f"Flushed {len(pending)} buffered writes")
+
+    @staticmethod
+    async def _write_split(write, requests: list[tuple[list, asyncio.Future]]) -> None:
+        """
+        One bulk write for every request, with each request's statuses sent
+        back. A request whose caller was cancelled meanwhile is still written.
+        """
+        statuses = await write([item for items, _ in requests for item in items])
+        start = 0
+        for items, future in requests:
+            if not future.done():
+                future.set_result(statuses[start : start + len(items)])
+            start += len(items)
+
+    async def _write_entities(self, requests) -> None:
+        await self._write_split(self.storage.create_entities, requests)
+
+    async def _write_relations(self, requests) -> None:
+        await self._write_split(self.storage.create_relations, requests)
+
+    async def _write_observations(self, requests) -> None:
+        """
+        One add per entity. Each new observation is reported to the first
+        request that asked for it, as concurrent unbuffered adds would.
+        """
+        by_entity = {}
+        for (entity_name, observations), future in requests:
+            by_entity.setdefault(entity_name, []).append((observations, future))
+        for entity_name, entity_requests in by_entity.items():
+            merged = list(
+                dict.fromkeys(
+                    observation
+                    for observations, _ in entity_requests
+                    for observation in observations
+                )
+            )
+            new_observations = await self.storage.add_observations(entity_name, merged)
+            unclaimed = set(new_observations or ())
+            for observations, future in entity_requests:
+                if new_observations is None:
+                    if not future.done():
+                        future.set_result(None)
+                    continue
+                claimed = [
+                    observation
+                    for observation in observations
+                    if observation in unclaimed
+                ]
+                unclaimed.difference_update(claimed)
+                if not future.done():
+                    future.set_result(claimed)
+
+    async def _write_observations_batch(self, requests) -> None:
+        await self._write_split(self.storage.add_observations_batch, requests)
+
+    # Writes
+
+    async def create_entities(self, entities: list[dict]) -> list[dict]:
+        return await self._enqueue(ENTITIES, entities, len(entities))
+
+    async def create_relations(self, relations: list[dict]) -> list[dict]:
+        return await self._enqueue(RELATIONS, relations, len(relations))
+
+    async def add_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        return await self._enqueue(
+            OBSERVATIONS, (entity_name, observations), len(observations)
+        )
+
+    async def add_observations_batch(self, additions: list[dict]) -> list[dict]:
+        return await self._enqueue(OBSERVATIONS_BATCH, additions, len(additions))
+
+    async def delete_entities(self, entity_names: list[str]) -> None:
+        await self.flush()
+        await self.storage.delete_entities(entity_names)
+
+    async def delete_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        await self.flush()
+        return await self.storage.delete_observations(entity_name, observations)
+
+    async def delete_relation(self, relation: dict) -> None:
+        await self.flush()
+        await self.storage.delete_relation(relation)
+
+    async def begin_bulk_load(self) -> None:
+        await self.flush()
+        await self.storage.begin_bulk_load()
+
+    async def load_entities(self, entities: list[dict]) -> int:
+        return await self.storage.load_entities(entities)
+
+    async def load_relations(self, relations: list[dict]) -> int:
+        return await self.storage.load_relations(relations)
+
+    async def end_bulk_load(self) -> None:
+        await self.storage.end_bulk_load()
+
+    # Reads
+
+    async def snapshot(self, max_entities: int) -> tuple[list[dict], list[dict], int]:
+        await self.flush()
+        return await self.storage.snapshot(max_entities)
+
+    async def with_observations(
+        self, documents: list[dict], limit: int | None = None
+    ) -> list[dict]:
+        await self.flush()
+        return await self.storage.with_observations(documents, limit)
+
+    async def read_entities(
+        self, fields: list[str], after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        await self.flush()
+        return await self.storage.read_entities(fields, after, limit)
+
+    async def read_relations(
+        self, after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        await self.flush()
+        return await self.storage.read_relations(after, limit)
+
+    async def summarize_graph(self) -> dict:
+        await self.flush()
+        return await self.storage.summarize_graph()
+
+    async def get_entities(self, entity_names: list[str]) -> list[dict]:
+        await self.flush()
+        return await self.storage.get_entities(entity_names)
+
+    async def list_by_type(
+        self,
+        entity_type: str,
+        after: str | None,
+        limit: int,
+        observation_counts: bool = False,
+    ) -> list[dict]:
+        await self.flush()
+        return await self.storage.list_by_type(
+            entity_type, after, limit, observation_counts
+        )
+
+    async def count_entity_types(self) -> dict[str, int]:
+        await self.flush()
+        return await self.storage.count_entity_types()
+
+    async def search_text(self, query: str, limit: int) -> list[dict]:
+        await self.flush()
+        return await self.storage.search_text(query, limit)
+
+    async def search_substring(self, query: str, limit: int) -> list[dict]:
+        await self.flush()
+        return await self.storage.search_substring(query, limit)
+
+    async def relations_among(self, entity_names: list[str]) -> list[dict]:
+        await self.flush()
+        return await self.storage.relations_among(entity_names)
+
+    async def open_nodes(
+        self, entity_names: list[str]
+    ) -> tuple[list[dict], list[dict]]:
+        await self.flush()
+        return await self.storage.open_nodes(entity_names)
+
+    async def neighborhood(
+        self,
+        start: list[str],
+        max_depth: int,
+        direction: str,
+        relation_types: list[str] | None,
+    ) -> tuple[list[dict], list[dict]]:
+        await self.flush()
+        return await self.storage.neighborhood(
+            start, max_depth, direction, relation_types
+        )
+
+    async def changes_since(self, revision: int, limit: int) -> tuple[list[dict], int]:
+        await self.flush()
+        return await self.storage.changes_since(revision, limit)
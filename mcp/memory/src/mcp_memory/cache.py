@@ -0,0 +1,283 @@
+import heapq
+import logging
+import re
+from collections import OrderedDict, defaultdict
+
+from bson import ObjectId
+
+logger = logging.getLogger("mcp_memory")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+FIELD_WEIGHTS = {"name": 10, "entity_type": 5, "observations": 1}
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class GraphCache:
+    """
+    In-process mirror of the knowledge graph.
+
+    Holds a name -> entity map, outgoing and incoming adjacency lists and a
+    token index over names, types and observations, so reads are served
+    without a MongoDB round trip. The cache is kept current by the manager's
+    own writes and by a change stream (see ``KnowledgeGraphManager.watch``).
+
+    Once more than ``max_entities`` entities are held, the least recently used
+    ones are evicted and the cache stops being ``complete``: point lookups of
+    cached entities are still served, but anything that needs the whole graph
+    (searches, full reads) falls back to MongoDB.
+    """
+
+    def __init__(self, max_entities: int):
+        self.max_entities = max_entities
+        self.complete = False
+        self.entities: OrderedDict[str, dict] = OrderedDict()
+        self.entity_ids: dict[ObjectId, str] = {}
+        self.relations: dict[tuple[str, str, str], ObjectId | None] = {}
+        self.relation_ids: dict[ObjectId, tuple[str, str, str]] = {}
+        self.outgoing: defaultdict[str, set[tuple]] = defaultdict(set)
+        self.incoming: defaultdict[str, set[tuple]] = defaultdict(set)
+        self.tokens: defaultdict[str, defaultdict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+
+    def clear(self) -> None:
+        self.complete = False
+        self.entities.clear()
+        self.entity_ids.clear()
+        self.relations.clear()
+        self.relation_ids.clear()
+        self.outgoing.clear()
+        self.incoming.clear()
+        self.tokens.clear()
+
+    def load(self, entities: list[dict], relations: list[dict], total: int) -> None:
+        """Replace the cache contents with a snapshot of the graph."""
+        self.clear()
+        for entity in entities:
+            self.put_entity(entity)
+        for relation in relations:
+            self.put_relation(relation)
+        self.complete = total <= self.max_entities
+        logger.info(
+            f"Loaded {len(self.entities)} of {total} entities and "
+            f"{len(self.relations)} relations into the graph cache"
+        )
+
+    # Writes
+
+    def _entity_tokens(self, entity: dict) -> dict[str, int]:
+        weights = defaultdict(int)
+        for token in tokenize(entity["name"]):
+            weights[token] += FIELD_WEIGHTS["name"]
+        for token in tokenize(entity["entity_type"]):
+            weights[token] += FIELD_WEIGHTS["entity_type"]
+        for observation in entity["observations"]:
+            for token in tokenize(observation):
+                weights[token] += FIELD_WEIGHTS["observations"]
+        return weights
+
+    def _index(self, entity: dict) -> None:
+        for token, weight in self._entity_tokens(entity).items():
+            self.tokens[token][entity["name"]] += weight
+
+    def _unindex(self, entity: dict) -> None:
+        for token in self._entity_tokens(entity):
+            names = self.tokens.get(token)
+            if names is not None:
+                names.pop(entity["name"], None)
+                if not names:
+                    del self.tokens[token]
+
+    def put_entity(self, document: dict) -> None:
+        name = document["name"]
+        previous = self.entities.pop(name, None)
+        if previous is not None:
+            self._unindex(previous)
+        entity = {
+            "name": name,
+            "entity_type": document["entity_type"],
+            "observations": list(document.get("observations", [])),
+        }
+        self.entities[name] = entity
+        if "_id" in document:
+            self.entity_ids[document["_id"]] = name
+        self._index(entity)
+        while len(self.entities) > self.max_entities:
+            _, evicted = self.entities.popitem(last=False)
+            self._unindex(evicted)
+            self.complete = False
+
+    def remove_entities(self, names: list[str]) -> None:
+        names = set(names)
+        for name in names:
+            entity = self.entities.pop(name, None)
+            if entity is not None:
+                self._unindex(entity)
+            for key in list(self.outgoing.get(name, ())) + list(
+                self.incoming.get(name, ())
+            ):
+                self.remove_relation(key)
+        self.entity_ids = {
+            _id: name for _id, name in self.entity_ids.items() if name not in names
+        }
+
+    def add_observations(self, name: str, observations: list[str]) -> None:
+        entity = self.entities.get(name)
+        if entity is None:
+            return
+        self._unindex(entity)
+        existing = set(entity["observations"])
+        entity["observations"] += [
+            observation
+            for observation in dict.fromkeys(observations)
+            if observation not in existing
+        ]
+        self._index(entity)
+
+    def remove_observations(self, name: str, observations: list[str]) -> None:
+        entity = self.entities.get(name)
+        if entity is None:
+            return
+        self._unindex(entity)
+        removed = set(observations)
+        entity["observations"] = [
+            observation
+            for observation in entity["observations"]
+            if observation not in removed
+        ]
+        self._index(entity)
+
+    def put_relation(self, document: dict) -> None:
+        key = (
+            document["from_entity"],
+            document["to_entity"],
+            document["relation_type"],
+        )
+        _id = document.get("_id")
+        self.relations[key] = _id or self.relations.get(key)
+        if _id is not None:
+            self.relation_ids[_id] = key
+        self.outgoing[key[0]].add(key)
+        self.incoming[key[1]].add(key)
+
+    def remove_relation(self, key: tuple[str, str, str]) -> None:
+        _id = self.relations.pop(key, None)
+        if _id is not None:
+            self.relation_ids.pop(_id, None)
+        for adjacency, name in ((self.outgoing, key[0]), (self.incoming, key[1])):
+            keys = adjacency.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del adjacency[name]
+
+    def apply_change(self, change: dict) -> None:
+        """Apply a MongoDB change stream event to the cache."""
+        operation = change["operationType"]
+        collection = change.get("ns", {}).get("coll")
+        if operation in ("insert", "update", "replace"):
+            document = change.get("fullDocument")
+            if document is None:
+                return
+            if collection == "entities":
+                self.put_entity(document)
+            else:
+                self.put_relation(document)
+        elif operation == "delete":
+            _id = change["documentKey"]["_id"]
+            if collection == "entities":
+                name = self.entity_ids.pop(_id, None)
+                entity = self.entities.pop(name, None) if name else None
+                if entity is not None:
+                    self._unindex(entity)
+            else:
+                key = self.relation_ids.get(_id)
+                if key is not None:
+                    self.remove_relation(key)
+        elif operation in ("drop", "dropDatabase", "rename", "invalidate"):
+            # The cache no longer reflects the collections; serve from MongoDB
+            # until the manager reloads it.
+            self.clear()
+
+    # Reads
+
+    def _touch(self, name: str) -> dict | None:
+        entity = self.entities.get(name)
+        if entity is not None:
+            self.entities.move_to_end(name)
+        return entity
+
+    def relations_touching(self, names) -> list[dict]:
+        keys = set()
+        for name in names:
+            keys.update(self.outgoing.get(name, ()))
+            keys.update(self.incoming.get(name, ()))
+        return [self._relation_dict(key) for key in keys]
+
+    def relations_among(self, names) -> list[dict]:
+        names = set(names)
+        return [
+            self._relation_dict(key)
+            for name in names
+            for key in self.outgoing.get(name, ())
+            if key[1] in names
+        ]
+
+    def degree(self, name: str) -> int:
+        return len(self.outgoing.get(name, ())) + len(self.incoming.get(name, ()))
+
+    @staticmethod
+    def _relation_dict(key: tuple[str, str, str]) -> dict:
+        return {"from_entity": key[0], "to_entity": key[1], "relation_type": key[2]}
+
+    def open_nodes(self, names: list[str]) -> tuple[list[dict], list[dict]] | None:
+        """Return the named entities and their relations, or None on a miss."""
+        entities = [self._touch(name) for name in names]
+        if not self.complete and any(entity is None for entity in entities):
+            return None
+        found = [entity for entity in entities if entity is not None]
+        return found, self.relations_touching(entity["name"] for entity in found)
+
+    def read_graph(self) -> tuple[list[dict], list[dict]]:
+        return list(self.entities.values()), [
+            self._relation_dict(key) for key in self.relations
+        ]
+
+    def summarize(self) -> dict:
+        entity_types = defaultdict(int)
+        for entity in self.entities.values():
+            entity_types[entity["entity_type"]] += 1
+        relation_types = defaultdict(int)
+        for key in self.relations:
+            relation_types[key[2]] += 1
+        return {
+            "entity_count": len(self.entities),
+            "relation_count": len(self.relations),
+            "entity_types": dict(entity_types),
+            "relation_types": dict(relation_types),
+        }
+
+    def search_text(self, query: str, limit: int) -> list[tuple[dict, float]]:
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            for name, weight in self.tokens.get(token, {}).items():
+                scores[name] += weight
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self._touch(name), float(score)) for name, score in ranked[:limit]]
+
+    def search_substring(self, query: str, limit: int) -> list[dict]:
+        """The highest degree matches, as the storages pick them."""
+        needle = query.lower()
+        matches = (
+            entity
+            for entity in self.entities.values()
+            if needle in entity["name"].lower()
+            or needle in entity["entity_type"].lower()
+            or any(needle in obs.lower() for obs in entity["observations"])
+        )
+        return heapq.nlargest(
+            limit, matches, key=lambda entity: self.degree(entity["name"])
+        )
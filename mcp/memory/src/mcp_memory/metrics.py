@@ -0,0 +1,133 @@
+import asyncio
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+from starlette.responses import Response
+
+# Seconds between event loop lag samples.
+EVENT_LOOP_LAG_INTERVAL = 0.5
+
+TOOL_DURATION = Histogram(
+    "mcp_tool_call_duration_seconds",
+    "Time spent handling a tool call",
+    ["tool"],
+)
+TOOL_IN_FLIGHT = Gauge(
+    "mcp_tool_calls_in_flight",
+    "Tool calls currently being handled",
+    ["tool"],
+    multiprocess_mode="livesum",
+)
+TOOL_ERRORS = Counter(
+    "mcp_tool_call_errors_total",
+    "Tool calls that raised an error",
+    ["tool"],
+)
+BACKEND_DURATION = Histogram(
+    "mcp_backend_operation_duration_seconds",
+    "Time spent in a backend operation, such as a MongoDB command or an Ollama embed",
+    ["backend", "operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+BACKEND_ERRORS = Counter(
+    "mcp_backend_operation_errors_total",
+    "Backend operations that failed",
+    ["backend", "operation"],
+)
+SSE_SESSIONS = Gauge(
+    "mcp_sse_sessions_active",
+    "Open SSE sessions",
+    multiprocess_mode="livesum",
+)
+EVENT_LOOP_LAG = Histogram(
+    "mcp_event_loop_lag_seconds",
+    "How late the event loop woke up a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def instrument_tool(handler):
+    """Record the latency, concurrency and errors of a call_tool handler."""
+
+    @functools.wraps(handler)
+    async def instrumented(name: str, arguments: dict | None):
+        started = time.perf_counter()
+        in_flight = TOOL_IN_FLIGHT.labels(name)
+        in_flight.inc()
+        try:
+            return await handler(name, arguments)
+        except Exception:
+            TOOL_ERRORS.labels(name).inc()
+            raise
+        finally:
+            in_flight.dec()
+            TOOL_DURATION.labels(name).observe(time.perf_counter() - started)
+
+    return instrumented
+
+
+@contextmanager
+def backend_operation(backend: str, operation: str):
+    """Time a block as one backend operation."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        BACKEND_ERRORS.labels(backend, operation).inc()
+        raise
+    finally:
+        BACKEND_DURATION.labels(backend, operation).observe(
+            time.perf_counter() - started
+        )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command, labelled by command name."""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        BACKEND_DURATION.labels("mongo", event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event) -> None:
+        BACKEND_DURATION.labels("mongo", event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+        BACKEND_ERRORS.labels("mongo", event.command_name).inc()
+
+
+async def monitor_event_loop(interval: float = EVENT_LOOP_LAG_INTERVAL) -> None:
+    """Sample how late a sleep wakes up; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0))
+
+
+async def handle_metrics(request) -> Response:
+    """
+    Metrics of this process, or of every worker if PROMETHEUS_MULTIPROC_DIR
+    points the workers at a shared directory.
+    """
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,1447 @@
+import asyncio
+import heapq
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from dotenv import load_dotenv
+from pymongo import (
+    ASCENDING,
+    DESCENDING,
+    TEXT,
+    AsyncMongoClient,
+    ReturnDocument,
+    UpdateOne,
+)
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from .cache import tokenize
+from .metrics import MongoCommandMetrics
+from .storage import RELATION_FIELDS, KnowledgeGraphStorage
+
+load_dotenv()
+
+MONGO_URI = os.environ.get("MONGO_URI")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)
+)
+# "embedded" keeps observations in an array on the entity document; "collection"
+# stores one document per observation so busy entities stay small.
+OBSERVATION_STORAGE = os.environ.get("MEMORY_OBSERVATION_STORAGE", "embedded")
+DATABASE_NAME = "memories"
+ENTITIES_COLLECTION = "entities"
+RELATIONS_COLLECTION = "relations"
+OBSERVATIONS_COLLECTION = "observations"
+TOMBSTONES_COLLECTION = "tombstones"
+COUNTERS_COLLECTION = "counters"
+DUPLICATE_KEY_ERROR = 11000
+# Reads fetch only the fields a response needs.
+ENTITY_PROJECTION = {
+    "_id": 0,
+    "name": 1,
+    "entity_type": 1,
+    "observations": 1,
+    "degree": 1,
+}
+RELATION_PROJECTION = {"_id": 0, **{field: 1 for field in RELATION_FIELDS}}
+
+logger = logging.getLogger("mcp_memory")
+
+
+class MongoConnection:
+    """
+    Process-lifetime async MongoDB client with a bounded connection pool.
+
+    The client is opened once and shared by every session, so tool calls reuse
+    pooled connections instead of paying for a handshake, auth and server
+    discovery each time. pymongo binds an async client to the event loop it was
+    first used on, so a fresh client is opened if the running loop changes
+    (e.g. successive ``asyncio.run`` calls in tests and scripts), and the old
+    one is let go of by ``_discard_client``.
+    """
+
+    def __init__(self, uri: str | None = None, database: str = DATABASE_NAME):
+        self.uri = uri or MONGO_URI
+        self.database = database
+        self._client: AsyncMongoClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def open(self) -> AsyncDatabase:
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            logger.info("Event loop changed, reopening MongoDB client")
+            self._discard_client()
+        if self._client is None:
+            self._client = AsyncMongoClient(
+                self.uri,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                event_listeners=[MongoCommandMetrics()],
+            )
+            self._loop = loop
+        return self._client[self.database]
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            client, self._client, self._loop = self._client, None, None
+            await client.close()
+        else:
+            self._discard_client()
+
+    def _discard_client(self) -> None:
+        """
+        Let go of a client bound to another event loop. It can only be closed
+        on that loop, so if the loop is still running (in another thread) the
+        close is scheduled there. A loop that has stopped can no longer run
+        the close; ``asyncio.run`` already cancelled the client's monitor
+        tasks when it shut the loop down, and the pooled sockets are released
+        once the dropped client is collected.
+        """
+        client, loop = self._client, self._loop
+        self._client = None
+        self._loop = None
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+
+mongo = MongoConnection()
+
+
+class MongoStorage(KnowledgeGraphStorage):
+    def __init__(
+        self,
+        connection: MongoConnection | None = None,
+        observation_storage: str = OBSERVATION_STORAGE,
+    ):
+        if observation_storage not in ("embedded", "collection"):
+            raise Exception(f"Unknown observation storage: {observation_storage}")
+        self.connection = connection or mongo
+        self.observation_storage = observation_storage
+        # The change stream only mirrors entity documents, so the cache cannot
+        # follow observations kept in their own collection.
+        self.cacheable = not self.separate_observations
+        # The highest value this process has seen the revision counter at, and
+        # a lower bound of the revisions of each write in progress; see _write.
+        self._last_revision = 0
+        self._writing: list[int] = []
+
+    @property
+    def separate_observations(self) -> bool:
+        return self.observation_storage == "collection"
+
+    async def setup(self) -> None:
+        db = await self.connection.open()
+        collection_names = await db.list_collection_names()
+
+        if ENTITIES_COLLECTION not in collection_names:
+            logger.info("Creating entities collection")
+            await db.create_collection(ENTITIES_COLLECTION)
+
+        if RELATIONS_COLLECTION not in collection_names:
+            logger.info("Creating relations collection")
+            await db.create_collection(RELATIONS_COLLECTION)
+
+        if OBSERVATIONS_COLLECTION not in collection_names:
+            logger.info("Creating observations collection")
+            await db.create_collection(OBSERVATIONS_COLLECTION)
+
+        if TOMBSTONES_COLLECTION not in collection_names:
+            logger.info("Creating tombstones collection")
+            await db.create_collection(TOMBSTONES_COLLECTION)
+
+        await self.ensure_indexes()
+
+        if await db[ENTITIES_COLLECTION].find_one(
+            {"degree": {"$exists": False}}, {"_id": 1}
+        ):
+            await self.rebuild_degrees()
+
+        for collection in (ENTITIES_COLLECTION, RELATIONS_COLLECTION):
+            if await db[collection].find_one(
+                {"revision": {"$exists": False}}, {"_id": 1}
+            ):
+                await self.number_revisions()
+                break
+
+    async def close(self) -> None:
+        await self.connection.close()
+
+    async def ping(self) -> None:
+        db = await self.connection.open()
+        await db.command("ping")
+
+    async def ensure_indexes(self) -> None:
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+        relations_collection = db[RELATIONS_COLLECTION]
+
+        logger.info("Ensuring indexes")
+        await entities_collection.create_index(
+            [("name", ASCENDING)], unique=True, name="name_unique"
+        )
+        # The compound index also serves from_entity lookups through its prefix,
+        # so only to_entity needs an index of its own.
+        await relations_collection.create_index(
+            [
+                ("from_entity", ASCENDING),
+                ("to_entity", ASCENDING),
+                ("relation_type", ASCENDING),
+            ],
+            unique=True,
+            name="relation_unique",
+        )
+        await relations_collection.create_index(
+            [("to_entity", ASCENDING)], name="to_entity"
+        )
+        await entities_collection.create_index(
+            [("entity_type", ASCENDING), ("name", ASCENDING)], name="type_name"
+        )
+        await entities_collection.create_index(
+            [
+                ("name", TEXT),
+                ("entity_type", TEXT),
+                ("observations", TEXT),
+            ],
+            weights={"name": 10, "entity_type": 5, "observations": 1},
+            name="search_text",
+        )
+
+        observations_collection = db[OBSERVATIONS_COLLECTION]
+        await observations_collection.create_index(
+            [("entity_name", ASCENDING), ("content", ASCENDING)],
+            unique=True,
+            name="observation_unique",
+        )
+        await observations_collection.create_index(
+            [("entity_name", ASCENDING), ("created_at", DESCENDING)],
+            name="entity_latest",
+        )
+        await observations_collection.create_index(
+            [("content", TEXT)], name="search_text"
+        )
+
+        for collection in (ENTITIES_COLLECTION, RELATIONS_COLLECTION):
+            await db[collection].create_index(
+                [("revision", ASCENDING)], name="revision"
+            )
+        await db[TOMBSTONES_COLLECTION].create_index(
+            [("revision", ASCENDING)], unique=True, name="revision"
+        )
+
+    # Revisions
+
+    async def _reserve_revisions(self, count: int) -> int:
+        """Take count consecutive revisions from the shared counter; returns the first."""
+        db = await self.connection.open()
+        counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+            {"_id": "revision"},
+            {"$inc": {"value": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._last_revision = max(self._last_revision, counter["value"])
+        return counter["value"] - count + 1
+
+    @asynccontextmanager
+    async def _write(self):
+        """
+        Mark a write in progress.
+
+        Revisions are reserved before the documents carrying them are written,
+        so until the write has landed changes_since must stop short of them, or
+        a client would resume past a change it never saw. Anything reserved
+        from here on is above the counter as this process last saw it.
+        """
+        writing = self._last_revision + 1
+        self._writing.append(writing)
+        try:
+            yield
+        finally:
+            self._writing.remove(writing)
+
+    async def _complete_revision(self) -> int:
+        """The revision up to which every write made by this process has landed."""
+        db = await self.connection.open()
+        counter = await db[COUNTERS_COLLECTION].find_one({"_id": "revision"})
+        current = counter["value"] if counter else 0
+        self._last_revision = max(self._last_revision, current)
+        if self._writing:
+            current = min(current, min(self._writing) - 1)
+        return current
+
+    async def _add_tombstones(
+        self, entity_names: list[str], relations: list[dict]
+    ) -> None:
+        if not entity_names and not relations:
+            return
+        db = await self.connection.open()
+        first = await self._reserve_revisions(len(entity_names) + len(relations))
+        tombstones = [{"name": name} for name in entity_names] + [
+            {field: relation[field] for field in RELATION_FIELDS}
+            for relation in relations
+        ]
+        await db[TOMBSTONES_COLLECTION].insert_many(
+            [
+                {**tombstone, "revision": first + i}
+                for i, tombstone in enumerate(tombstones)
+            ]
+        )
+
+    async def _touch_entities(self, entity_names: list[str]) -> None:
+        """Give entities whose observations changed a new revision."""
+        if not entity_names:
+            return
+        db = await self.connection.open()
+        first = await self._reserve_revisions(len(entity_names))
+        await db[ENTITIES_COLLECTION].bulk_write(
+            [
+                UpdateOne({"name": name}, {"$set": {"revision": first + i}})
+                for i, name in enumerate(entity_names)
+            ],
+            ordered=False,
+        )
+
+    async def number_revisions(self) -> None:
+        """Give every entity and relation written before revisions one of its own."""
+        db = await self.connection.open()
+        logger.info("Numbering revisions")
+        for name in (ENTITIES_COLLECTION, RELATIONS_COLLECTION):
+            collection = db[name]
+            while True:
+                ids = [
+                    document["_id"]
+                    for document in await collection.find(
+                        {"revision": {"$exists": False}}, {"_id": 1}
+                    )
+                    .limit(1000)
+                    .to_list()
+                ]
+                if not ids:
+                    break
+                first = await self._reserve_revisions(len(ids))
+                await collection.bulk_write(
+                    [
+                        UpdateOne({"_id": _id}, {"$set": {"revision": first + i}})
+                        for i, _id in enumerate(ids)
+                    ],
+                    ordered=False,
+                )
+
+    async def _insert_ignoring_duplicates(
+        self, collection: AsyncCollection, documents: list[dict]
+    ) -> set[int]:
+        """Insert documents unordered; returns the indexes of those rejected as duplicates."""
+        if not documents:
+            return set()
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            return {error["index"] for error in errors}
+        return set()
+
+    async def begin_bulk_load(self) -> None:
+        """
+        Drop the indexes that only speed up reads; ensure_indexes builds them
+        in one pass at the end. The unique, text, revision and to_entity
+        indexes stay, so a server running on the same database keeps
+        rejecting duplicates, answering $text searches and changes_since,
+        and counting degrees while the load runs.
+        """
+        db = await self.connection.open()
+        for collection, names in (
+            (ENTITIES_COLLECTION, ["type_name"]),
+            (OBSERVATIONS_COLLECTION, ["entity_latest"]),
+        ):
+            existing = {
+                index["name"] async for index in await db[collection].list_indexes()
+            }
+            for name in names:
+                if name in existing:
+                    await db[collection].drop_index(name)
+
+    async def load_entities(self, entities: list[dict]) -> int:
+        db = await self.connection.open()
+        entities = [
+            {**entity, "observations": list(dict.fromkeys(entity["observations"]))}
+            for entity in entities
+        ]
+        async with self._write():
+            first = await self._reserve_revisions(len(entities))
+            skipped = await self._insert_ignoring_duplicates(
+                db[ENTITIES_COLLECTION],
+                [
+                    {
+                        "name": entity["name"],
+                        **self._stored_fields(entity),
+                        "revision": first + i,
+                    }
+                    for i, entity in enumerate(entities)
+                ],
+            )
+            if self.separate_observations:
+                created_at = datetime.now(timezone.utc)
+                await self._insert_ignoring_duplicates(
+                    db[OBSERVATIONS_COLLECTION],
+                    [
+                        {
+                            "entity_name": entity["name"],
+                            "content": content,
+                            "created_at": created_at,
+                        }
+                        for i, entity in enumerate(entities)
+                        if i not in skipped
+                        for content in entity["observations"]
+                    ],
+                )
+        await self._set_degrees(
+            [entity["name"] for i, entity in enumerate(entities) if i not in skipped]
+        )
+        return len(entities) - len(skipped)
+
+    async def load_relations(self, relations: list[dict]) -> int:
+        db = await self.connection.open()
+        async with self._write():
+            first = await self._reserve_revisions(len(relations))
+            skipped = await self._insert_ignoring_duplicates(
+                db[RELATIONS_COLLECTION],
+                [
+                    {
+                        **{field: relation[field] for field in RELATION_FIELDS},
+                        "revision": first + i,
+                    }
+                    for i, relation in enumerate(relations)
+                ],
+            )
+        await self._add_degrees(
+            self._relation_ends(
+                [relation for i, relation in enumerate(relations) if i not in skipped]
+            )
+        )
+        return len(relations) - len(skipped)
+
+    async def end_bulk_load(self) -> None:
+        await self.ensure_indexes()
+
+    async def watch(
+        self,
+        on_change: Callable[[dict], None],
+        on_reset: Callable[[], Awaitable[None]],
+    ) -> None:
+        """
+        Follow the entities and relations collections with a change stream.
+
+        Change streams need a replica set; a single-node replica set is enough.
+        Without one the cache only sees this process's own writes.
+        """
+        db = await self.connection.open()
+        pipeline = [
+            {
+                "$match": {
+                    "ns.coll": {"$in": [ENTITIES_COLLECTION, RELATIONS_COLLECTION]}
+                }
+            }
+        ]
+        while True:
+            try:
+                async with await db.watch(
+                    pipeline, full_document="updateLookup"
+                ) as stream:
+                    # Load once the stream is open so no change falls between
+                    # the snapshot and the first event.
+                    await on_reset()
+                    async for change in stream:
+                        on_change(change)
+                        if change["operationType"] in (
+                            "drop",
+                            "rename",
+                            "dropDatabase",
+                        ):
+                            await on_reset()
+                        elif change["operationType"] == "invalidate":
+                            break
+            except OperationFailure as e:
+                logger.warning(
+                    f"Change streams unavailable, the graph cache only sees this process's writes: {e}"
+                )
+                await on_reset()
+                return
+
+    async def snapshot(self, max_entities: int) -> tuple[list[dict], list[dict], int]:
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+        total = await entities_collection.count_documents({})
+        entities = await entities_collection.find().limit(max_entities).to_list()
+        relations = await db[RELATIONS_COLLECTION].find().to_list()
+        return await self.with_observations(entities), relations, total
+
+    # Observations
+
+    async def with_observations(
+        self, documents: list[dict], limit: int | None = None
+    ) -> list[dict]:
+        """
+        With separate storage this costs one aggregation over the
+        (entity_name, created_at) index regardless of how many observations
+        each entity has accumulated.
+        """
+        if not self.separate_observations:
+            if not limit:
+                return documents
+            return [
+                {**document, "observations": document["observations"][-limit:]}
+                for document in documents
+            ]
+
+        if not documents:
+            return documents
+        db = await self.connection.open()
+        names = [document["name"] for document in documents]
+        if limit:
+            pipeline = [
+                {"$match": {"entity_name": {"$in": names}}},
+                {
+                    "$group": {
+                        "_id": "$entity_name",
+                        "observations": {
+                            "$topN": {
+                                "n": int(limit),
+                                "sortBy": {"created_at": -1, "_id": -1},
+                                "output": "$content",
+                            }
+                        },
+                    }
+                },
+            ]
+        else:
+            pipeline = [
+                {"$match": {"entity_name": {"$in": names}}},
+                {"$sort": {"created_at": -1, "_id": -1}},
+                {
+                    "$group": {
+                        "_id": "$entity_name",
+                        "observations": {"$push": "$content"},
+                    }
+                },
+            ]
+        observations = {
+            group["_id"]: group["observations"][::-1]
+            for group in await (
+                await db[OBSERVATIONS_COLLECTION].aggregate(pipeline)
+            ).to_list()
+        }
+        return [
+            {**document, "observations": observations.get(document["name"], [])}
+            for document in documents
+        ]
+
+    async def _insert_observations(
+        self, observations: list[tuple[str, str]]
+    ) -> list[tuple[str, str]]:
+        """
+        Insert (entity_name, content) pairs into the observations collection.
+
+        Returns the pairs that were new; the rest already existed and were
+        rejected by the unique index.
+        """
+        if not observations:
+            return []
+        db = await self.connection.open()
+        created_at = datetime.now(timezone.utc)
+        try:
+            await db[OBSERVATIONS_COLLECTION].insert_many(
+                [
+                    {"entity_name": name, "content": content, "created_at": created_at}
+                    for name, content in observations
+                ],
+                ordered=False,
+            )
+            return observations
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            duplicates = {error["index"] for error in errors}
+            return [
+                observation
+                for i, observation in enumerate(observations)
+                if i not in duplicates
+            ]
+
+    def _stored_fields(self, entity: dict) -> dict:
+        """The fields kept on the entity document itself, apart from the name."""
+        if self.separate_observations:
+            return {"entity_type": entity["entity_type"], "degree": 0}
+        return {
+            "entity_type": entity["entity_type"],
+            "observations": entity["observations"],
+            "degree": 0,
+        }
+
+    # Degrees
+
+    async def _count_degrees(self, names: list[str] | None = None) -> dict[str, int]:
+        """Count the relations touching each entity, or only the named ones."""
+        db = await self.connection.open()
+        pipeline = [
+            {"$project": {"_id": 0, "ends": ["$from_entity", "$to_entity"]}},
+            {"$unwind": "$ends"},
+            {"$group": {"_id": "$ends", "degree": {"$sum": 1}}},
+        ]
+        if names is not None:
+            pipeline[:0] = [
+                {
+                    "$match": {
+                        "$or": [
+                            {"from_entity": {"$in": names}},
+                            {"to_entity": {"$in": names}},
+                        ]
+                    }
+                }
+            ]
+            pipeline.insert(3, {"$match": {"ends": {"$in": names}}})
+        return {
+            group["_id"]: group["degree"]
+            for group in await (
+                await db[RELATIONS_COLLECTION].aggregate(pipeline)
+            ).to_list()
+        }
+
+    async def _set_degrees(self, names: list[str]) -> None:
+        """
+        Count the degrees of newly created entities: relations may have been
+        created before the entities they point to.
+        """
+        if not names:
+            return
+        db = await self.connection.open()
+        degrees = await self._count_degrees(names)
+        if degrees:
+            await db[ENTITIES_COLLECTION].bulk_write(
+                [
+                    UpdateOne({"name": name}, {"$set": {"degree": degree}})
+                    for name, degree in degrees.items()
+                ],
+                ordered=False,
+            )
+
+    async def _add_degrees(self, ends: Counter, sign: int = 1) -> None:
+        db = await self.connection.open()
+        operations = [
+            UpdateOne({"name": name}, {"$inc": {"degree": sign * count}})
+            for name, count in ends.items()
+            if count
+        ]
+        if operations:
+            await db[ENTITIES_COLLECTION].bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def _relation_ends(relations: list[dict]) -> Counter:
+        ends = Counter()
+        for relation in relations:
+            ends[relation["from_entity"]] += 1
+            ends[relation["to_entity"]] += 1
+        return ends
+
+    async def rebuild_degrees(self) -> None:
+        """Recount every entity's degree, e.g. for graphs written before degrees."""
+        logger.info("Rebuilding entity degrees")
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+        await entities_collection.update_many({}, {"$set": {"degree": 0}})
+        degrees = await self._count_degrees()
+        if degrees:
+            await entities_collection.bulk_write(
+                [
+                    UpdateOne({"name": name}, {"$set": {"degree": degree}})
+                    for name, degree in degrees.items()
+                ],
+                ordered=False,
+            )
+
+    async def migrate_observations(self) -> int:
+        """
+        Move observations from entity arrays into the observations collection.
+
+        Safe to re-run: observations already moved are skipped. Each entity's
+        observations keep their order, timestamped from the entity's creation.
+        """
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+        moved = 0
+        async for entity in entities_collection.find(
+            {"observations": {"$exists": True}}, {"name": 1, "observations": 1}
+        ):
+            created_at = entity["_id"].generation_time
+            documents = [
+                {
+                    "entity_name": entity["name"],
+                    "content": content,
+                    "created_at": created_at + timedelta(milliseconds=i),
+                }
+                for i, content in enumerate(dict.fromkeys(entity["observations"]))
+            ]
+            if documents:
+                try:
+                    await db[OBSERVATIONS_COLLECTION].insert_many(
+                        documents, ordered=False
+                    )
+                except BulkWriteError as e:
+                    if any(
+                        error["code"] != DUPLICATE_KEY_ERROR
+                        for error in e.details.get("writeErrors", [])
+                    ):
+                        raise
+            await entities_collection.update_one(
+                {"_id": entity["_id"]}, {"$unset": {"observations": ""}}
+            )
+            moved += len(documents)
+        logger.info(f"Moved {moved} observations to the observations collection")
+        return moved
+
+    # Writes
+
+    async def _bulk_upsert(
+        self, collection: AsyncCollection, operations: list[UpdateOne]
+    ) -> tuple[set[int], dict[int, str]]:
+        """
+        Run upserts as one unordered bulk write.
+
+        Returns the indexes of the operations that inserted a document and the
+        error message of every operation that failed. Duplicate key errors are
+        not failures: they mean a concurrent writer created the document first.
+        """
+        if not operations:
+            return set(), {}
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            return set(result.upserted_ids), {}
+        except BulkWriteError as e:
+            upserted = {item["index"] for item in e.details.get("upserted", [])}
+            errors = {
+                error["index"]: error["errmsg"]
+                for error in e.details.get("writeErrors", [])
+                if error["code"] != DUPLICATE_KEY_ERROR
+            }
+            return upserted, errors
+
+    @staticmethod
+    def _bulk_status(index: int, upserted: set[int], errors: dict[int, str]) -> dict:
+        if index in errors:
+            return {"status": "error", "error": errors[index]}
+        return {"status": "created" if index in upserted else "skipped"}
+
+    async def create_entities(self, entities: list[dict]) -> list[dict]:
+        db = await self.connection.open()
+
+        async with self._write():
+            first = await self._reserve_revisions(len(entities))
+            upserted, errors = await self._bulk_upsert(
+                db[ENTITIES_COLLECTION],
+                [
+                    UpdateOne(
+                        {"name": entity["name"]},
+                        {
+                            "$setOnInsert": {
+                                **self._stored_fields(entity),
+                                "revision": first + i,
+                            }
+                        },
+                        upsert=True,
+                    )
+                    for i, entity in enumerate(entities)
+                ],
+            )
+            if self.separate_observations:
+                await self._insert_observations(
+                    [
+                        (entities[i]["name"], content)
+                        for i in sorted(upserted)
+                        for content in entities[i]["observations"]
+                    ]
+                )
+        await self._set_degrees([entities[i]["name"] for i in upserted])
+        return [
+            {"name": entity["name"], **self._bulk_status(i, upserted, errors)}
+            for i, entity in enumerate(entities)
+        ]
+
+    async def create_relations(self, relations: list[dict]) -> list[dict]:
+        db = await self.connection.open()
+
+        async with self._write():
+            first = await self._reserve_revisions(len(relations))
+            upserted, errors = await self._bulk_upsert(
+                db[RELATIONS_COLLECTION],
+                [
+                    UpdateOne(
+                        relation,
+                        {"$setOnInsert": {**relation, "revision": first + i}},
+                        upsert=True,
+                    )
+                    for i, relation in enumerate(relations)
+                ],
+            )
+        await self._add_degrees(self._relation_ends([relations[i] for i in upserted]))
+        return [
+            {**relation, **self._bulk_status(i, upserted, errors)}
+            for i, relation in enumerate(relations)
+        ]
+
+    async def add_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        """
+        Embedded observations are added with a single atomic $addToSet. The
+        document as it was before the update tells which observations were
+        actually new, so concurrent writers never lose each other's additions
+        and each addition is reported by exactly one of them. The update only
+        matches an entity missing one of them, so an add that brings nothing
+        new leaves its revision alone.
+        """
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+
+        if self.separate_observations:
+            if not await entities_collection.find_one(
+                {"name": entity_name}, {"_id": 1}
+            ):
+                return None
+            async with self._write():
+                inserted = await self._insert_observations(
+                    [(entity_name, content) for content in observations]
+                )
+                if inserted:
+                    await self._touch_entities([entity_name])
+            return [content for _, content in inserted]
+
+        observations = list(dict.fromkeys(observations))
+        before = None
+        if observations:
+            async with self._write():
+                revision = await self._reserve_revisions(1)
+                before = await entities_collection.find_one_and_update(
+                    {"name": entity_name, **self._missing_any(observations)},
+                    {
+                        "$addToSet": {"observations": {"$each": observations}},
+                        "$set": {"revision": revision},
+                    },
+                    projection={"observations": 1, "_id": 0},
+                    return_document=ReturnDocument.BEFORE,
+                )
+        if before is None:
+            # Nothing was new, unless there is no such entity.
+            if not await entities_collection.find_one(
+                {"name": entity_name}, {"_id": 1}
+            ):
+                return None
+            return []
+
+        existing = set(before["observations"])
+        return [obs for obs in observations if obs not in existing]
+
+    @staticmethod
+    def _missing_any(observations: list[str]) -> dict:
+        """Matches embedded entities lacking at least one of the observations."""
+        return {"observations": {"$not": {"$all": observations}}}
+
+    async def add_observations_batch(self, additions: list[dict]) -> list[dict]:
+        """
+        The additions are merged per entity. Embedded observations get one
+        $addToSet per entity, sent concurrently, whose before documents tell
+        which observations were new, as in ``add_observations``; entities with
+        nothing new are not updated. Each new observation is reported to the
+        first addition that asked for it.
+        """
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+
+        requested: dict[str, dict[str, None]] = {}
+        for addition in additions:
+            requested.setdefault(addition["entity_name"], {}).update(
+                dict.fromkeys(addition["observations"])
+            )
+
+        new: dict[str, set[str]] = {}
+        if requested and self.separate_observations:
+            for entity in await entities_collection.find(
+                {"name": {"$in": list(requested)}}, {"name": 1, "_id": 0}
+            ).to_list():
+                new[entity["name"]] = set()
+            async with self._write():
+                inserted = await self._insert_observations(
+                    [(name, content) for name in new for content in requested[name]]
+                )
+                await self._touch_entities(list(dict.fromkeys(n for n, _ in inserted)))
+            for name, content in inserted:
+                new[name].add(content)
+        elif requested:
+            names = [name for name in requested if requested[name]]
+            before = []
+            if names:
+                async with self._write():
+                    first = await self._reserve_revisions(len(names))
+                    before = await asyncio.gather(
+                        *(
+                            entities_collection.find_one_and_update(
+                                {
+                                    "name": name,
+                                    **self._missing_any(list(requested[name])),
+                                },
+                                {
+                                    "$addToSet": {
+                                        "observations": {"$each": list(requested[name])}
+                                    },
+                                    "$set": {"revision": first + i},
+                                },
+                                projection={"observations": 1, "_id": 0},
+                                return_document=ReturnDocument.BEFORE,
+                            )
+                            for i, name in enumerate(names)
+                        )
+                    )
+            for name, document in zip(names, before):
+                if document is not None:
+                    new[name] = set(requested[name]).difference(
+                        document["observations"]
+                    )
+            unchanged = [name for name in requested if name not in new]
+            if unchanged:
+                for entity in await entities_collection.find(
+                    {"name": {"$in": unchanged}}, {"name": 1, "_id": 0}
+                ).to_list():
+                    new[entity["name"]] = set()
+
+        statuses = []
+        for addition in additions:
+            name = addition["entity_name"]
+            if name not in new:
+                statuses.append({"entity_name": name, "status": "not_found"})
+                continue
+            added = [
+                observation
+                for observation in dict.fromkeys(addition["observations"])
+                if observation in new[name]
+            ]
+            new[name].difference_update(added)
+            statuses.append(
+                {
+                    "entity_name": name,
+                    "status": "updated" if added else "unchanged",
+                    "added_observations": added,
+                }
+            )
+        return statuses
+
+    async def delete_entities(self, entity_names: list[str]) -> None:
+        db = await self.connection.open()
+
+        entities_collection = db[ENTITIES_COLLECTION]
+        relations_collection = db[RELATIONS_COLLECTION]
+
+        async with self._write():
+            existing = [
+                entity["name"]
+                for entity in await entities_collection.find(
+                    {"name": {"$in": entity_names}}, {"name": 1, "_id": 0}
+                ).to_list()
+            ]
+            await entities_collection.delete_many({"name": {"$in": existing}})
+            touching = await relations_collection.find(
+                {
+                    "$or": [
+                        {"from_entity": {"$in": entity_names}},
+                        {"to_entity": {"$in": entity_names}},
+                    ]
+                }
+            ).to_list()
+            if touching:
+                await relations_collection.delete_many(
+                    {"_id": {"$in": [relation["_id"] for relation in touching]}}
+                )
+            await self._add_tombstones(existing, touching)
+        if touching:
+            # The surviving ends lose the relations they had with the deleted ones.
+            ends = self._relation_ends(touching)
+            for name in entity_names:
+                ends.pop(name, None)
+            await self._add_degrees(ends, -1)
+        if self.separate_observations:
+            await db[OBSERVATIONS_COLLECTION].delete_many(
+                {"entity_name": {"$in": entity_names}}
+            )
+
+    async def delete_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        """Embedded observations are removed with a single atomic $pullAll."""
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+
+        if self.separate_observations:
+            if not await entities_collection.find_one(
+                {"name": entity_name}, {"_id": 1}
+            ):
+                return None
+            async with self._write():
+                results = await asyncio.gather(
+                    *(
+                        db[OBSERVATIONS_COLLECTION].delete_one(
+                            {"entity_name": entity_name, "content": content}
+                        )
+                        for content in observations
+                    )
+                )
+                if any(result.deleted_count for result in results):
+                    await self._touch_entities([entity_name])
+            return [
+                content
+                for content, result in zip(observations, results)
+                if result.deleted_count
+            ]
+
+        async with self._write():
+            revision = await self._reserve_revisions(1)
+            before = await entities_collection.find_one_and_update(
+                {"name": entity_name},
+                {
+                    "$pullAll": {"observations": observations},
+                    "$set": {"revision": revision},
+                },
+                projection={"observations": 1, "_id": 0},
+                return_document=ReturnDocument.BEFORE,
+            )
+        if before is None:
+            return None
+
+        existing = set(before["observations"])
+        return [obs for obs in observations if obs in existing]
+
+    async def delete_relation(self, relation: dict) -> None:
+        db = await self.connection.open()
+        async with self._write():
+            result = await db[RELATIONS_COLLECTION].delete_one(relation)
+            if result.deleted_count:
+                await self._add_tombstones([], [relation])
+        if result.deleted_count:
+            await self._add_degrees(self._relation_ends([relation]), -1)
+
+    # Reads
+
+    @staticmethod
+    async def _read_documents(
+        collection: AsyncCollection,
+        fields: list[str],
+        after: str | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """
+        Stream documents in _id order, keeping only the requested fields.
+
+        When paging (``limit`` given) the _id is kept so the caller can build
+        the next cursor from it.
+        """
+        if after is not None:
+            try:
+                after = ObjectId(after)
+            except (InvalidId, TypeError):
+                raise Exception(f"Invalid cursor position: {after}")
+        cursor = collection.find(
+            {"_id": {"$gt": after}} if after is not None else {},
+            {field: 1 for field in fields},
+        )
+        if limit is not None:
+            cursor = cursor.sort("_id", ASCENDING).limit(limit)
+        documents = []
+        async for document in cursor:
+            item = {field: document[field] for field in fields if field in document}
+            if limit is not None:
+                item["_id"] = document["_id"]
+            documents.append(item)
+        return documents
+
+    async def read_entities(
+        self, fields: list[str], after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        db = await self.connection.open()
+        return await self._read_documents(db[ENTITIES_COLLECTION], fields, after, limit)
+
+    async def read_relations(
+        self, after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        db = await self.connection.open()
+        return await self._read_documents(
+            db[RELATIONS_COLLECTION], RELATION_FIELDS, after, limit
+        )
+
+    async def summarize_graph(self) -> dict:
+        db = await self.connection.open()
+        entity_types = await self.count_entity_types()
+        relation_types = {
+            group["_id"]: group["count"]
+            for group in await (
+                await db[RELATIONS_COLLECTION].aggregate(
+                    [{"$group": {"_id": "$relation_type", "count": {"$sum": 1}}}]
+                )
+            ).to_list()
+        }
+        return {
+            "entity_count": sum(entity_types.values()),
+            "relation_count": sum(relation_types.values()),
+            "entity_types": entity_types,
+            "relation_types": relation_types,
+        }
+
+    async def list_by_type(
+        self,
+        entity_type: str,
+        after: str | None,
+        limit: int,
+        observation_counts: bool = False,
+    ) -> list[dict]:
+        """
+        Without counts the query is covered by the type_name index. Embedded
+        observations are counted with $size on the page's documents, separate
+        ones with one aggregation over the observation_unique index.
+        """
+        db = await self.connection.open()
+        query = {"entity_type": entity_type}
+        if after is not None:
+            query["name"] = {"$gt": after}
+        projection = {"_id": 0, "name": 1}
+        if observation_counts and not self.separate_observations:
+            projection["observation_count"] = {"$size": "$observations"}
+        documents = (
+            await db[ENTITIES_COLLECTION]
+            .find(query, projection)
+            .sort([("entity_type", ASCENDING), ("name", ASCENDING)])
+            .limit(limit)
+            .to_list()
+        )
+        if observation_counts and self.separate_observations and documents:
+            counts = {
+                group["_id"]: group["count"]
+                for group in await (
+                    await db[OBSERVATIONS_COLLECTION].aggregate(
+                        [
+                            {
+                                "$match": {
+                                    "entity_name": {
+                                        "$in": [doc["name"] for doc in documents]
+                                    }
+                                }
+                            },
+                            {"$group": {"_id": "$entity_name", "count": {"$sum": 1}}},
+                        ]
+                    )
+                ).to_list()
+            }
+            for document in documents:
+                document["observation_count"] = counts.get(document["name"], 0)
+        return documents
+
+    async def count_entity_types(self) -> dict[str, int]:
+        """Sorting on entity_type first lets the $group stream off the type_name index."""
+        db = await self.connection.open()
+        return {
+            group["_id"]: group["count"]
+            for group in await (
+                await db[ENTITIES_COLLECTION].aggregate(
+                    [
+                        {"$sort": {"entity_type": 1}},
+                        {"$group": {"_id": "$entity_type", "count": {"$sum": 1}}},
+                    ]
+                )
+            ).to_list()
+        }
+
+    async def get_entities(self, entity_names: list[str]) -> list[dict]:
+        db = await self.connection.open()
+        return (
+            await db[ENTITIES_COLLECTION]
+            .find({"name": {"$in": entity_names}}, ENTITY_PROJECTION)
+            .to_list()
+        )
+
+    async def search_text(self, query: str, limit: int) -> list[dict]:
+        """
+        The query is reduced to its word tokens, as the SQLite backend does, so
+        a leading "-" or a quote in it is not read as a $text negation or
+        phrase. Space separated terms match any of them, like FTS5's OR.
+        """
+        tokens = dict.fromkeys(tokenize(query))
+        if not tokens:
+            return []
+        query = " ".join(tokens)
+        db = await self.connection.open()
+        entities_collection = db[ENTITIES_COLLECTION]
+        documents = (
+            await entities_collection.find(
+                {"$text": {"$search": query}},
+                {**ENTITY_PROJECTION, "score": {"$meta": "textScore"}},
+            )
+            .sort([("score", {"$meta": "textScore"})])
+            .limit(limit)
+            .to_list()
+        )
+        if not self.separate_observations:
+            return documents
+
+        # Entities matched through their observations rank by their best match.
+        scores = {document["name"]: document["score"] for document in documents}
+        for match in await (
+            await db[OBSERVATIONS_COLLECTION].aggregate(
+                [
+                    {"$match": {"$text": {"$search": query}}},
+                    {"$addFields": {"score": {"$meta": "textScore"}}},
+                    {"$group": {"_id": "$entity_name", "score": {"$max": "$score"}}},
+                    {"$sort": {"score": -1}},
+                    {"$limit": limit},
+                ]
+            )
+        ).to_list():
+            scores[match["_id"]] = scores.get(match["_id"], 0) + match["score"]
+
+        by_name = {document["name"]: document for document in documents}
+        missing = [name for name in scores if name not in by_name]
+        if missing:
+            for document in await self.get_entities(missing):
+                by_name[document["name"]] = document
+        ranked = sorted(
+            (name for name in scores if name in by_name),
+            key=lambda name: scores[name],
+            reverse=True,
+        )
+        return [{**by_name[name], "score": scores[name]} for name in ranked[:limit]]
+
+    async def search_substring(self, query: str, limit: int) -> list[dict]:
+        db = await self.connection.open()
+        pattern = {"$regex": re.escape(query), "$options": "i"}
+        clauses = [{"name": pattern}, {"entity_type": pattern}]
+        if self.separate_observations:
+            names = [
+                group["_id"]
+                for group in await (
+                    await db[OBSERVATIONS_COLLECTION].aggregate(
+                        [
+                            {"$match": {"content": pattern}},
+                            {"$group": {"_id": "$entity_name"}},
+                            {"$limit": limit},
+                        ]
+                    )
+                ).to_list()
+            ]
+            clauses.append({"name": {"$in": names}})
+        else:
+            clauses.append({"observations": pattern})
+        return (
+            await db[ENTITIES_COLLECTION]
+            .find({"$or": clauses}, ENTITY_PROJECTION)
+            .sort([("degree", DESCENDING), ("_id", ASCENDING)])
+            .limit(limit)
+            .to_list()
+        )
+
+    async def relations_among(self, entity_names: list[str]) -> list[dict]:
+        db = await self.connection.open()
+        return (
+            await db[RELATIONS_COLLECTION]
+            .find(
+                {
+                    "from_entity": {"$in": entity_names},
+                    "to_entity": {"$in": entity_names},
+                },
+                RELATION_PROJECTION,
+            )
+            .to_list()
+        )
+
+    async def open_nodes(
+        self, entity_names: list[str]
+    ) -> tuple[list[dict], list[dict]]:
+        """
+        Runs as a single aggregation: an indexed $in match on name, then one
+        indexed $lookup per relation direction.
+        """
+        db = await self.connection.open()
+        documents = await (
+            await db[ENTITIES_COLLECTION].aggregate(
+                [
+                    {"$match": {"name": {"$in": entity_names}}},
+                    {
+                        "$lookup": {
+                            "from": RELATIONS_COLLECTION,
+                            "localField": "name",
+                            "foreignField": "from_entity",
+                            "as": "outgoing",
+                        }
+                    },
+                    {
+                        "$lookup": {
+                            "from": RELATIONS_COLLECTION,
+                            "localField": "name",
+                            "foreignField": "to_entity",
+                            "as": "incoming",
+                        }
+                    },
+                    {
+                        "$project": {
+                            **ENTITY_PROJECTION,
+                            **{
+                                f"{side}.{field}": 1
+                                for side in ("outgoing", "incoming")
+                                for field in RELATION_FIELDS
+                            },
+                        }
+                    },
+                ]
+            )
+        ).to_list()
+
+        # A relation between two opened entities is found from both ends.
+        relations = {
+            (
+                relation["from_entity"],
+                relation["to_entity"],
+                relation["relation_type"],
+            ): relation
+            for document in documents
+            for relation in document.pop("outgoing") + document.pop("incoming")
+        }
+        return documents, list(relations.values())
+
+    async def neighborhood(
+        self,
+        start: list[str],
+        max_depth: int,
+        direction: str,
+        relation_types: list[str] | None,
+    ) -> tuple[list[dict], list[dict]]:
+        """The relations are walked server side by a single $graphLookup."""
+        if direction == "outgoing":
+            near_field, far_field = "from_entity", "to_entity"
+        else:
+            near_field, far_field = "to_entity", "from_entity"
+
+        graph_lookup = {
+            "from": RELATIONS_COLLECTION,
+            "startWith": "$name",
+            "connectFromField": far_field,
+            "connectToField": near_field,
+            "as": "edges",
+            "maxDepth": max_depth - 1,
+            "depthField": "depth",
+        }
+        if relation_types:
+            graph_lookup["restrictSearchWithMatch"] = {
+                "relation_type": {"$in": relation_types}
+            }
+
+        db = await self.connection.open()
+        documents = await (
+            await db[ENTITIES_COLLECTION].aggregate(
+                [
+                    {"$match": {"name": {"$in": start}}},
+                    {"$graphLookup": graph_lookup},
+                    {
+                        "$project": {
+                            **ENTITY_PROJECTION,
+                            **{
+                                f"edges.{field}": 1
+                                for field in RELATION_FIELDS + ["depth"]
+                            },
+                        }
+                    },
+                ]
+            )
+        ).to_list()
+
+        # An edge reached from several start entities keeps its nearest depth.
+        edges = {}
+        for document in documents:
+            for edge in document.pop("edges"):
+                key = (edge["from_entity"], edge["to_entity"], edge["relation_type"])
+                if key not in edges or edge["depth"] < edges[key]["depth"]:
+                    edges[key] = edge
+        return documents, list(edges.values())
+
+    async def changes_since(self, revision: int, limit: int) -> tuple[list[dict], int]:
+        """
+        Stops short of this process's writes still in progress. Writes made
+        by other processes are visible once they land, so a client syncing
+        from several writers should resume a little before the revision it was
+        given and ignore what it has already applied.
+        """
+        db = await self.connection.open()
+        complete = await self._complete_revision()
+        query = {"revision": {"$gt": revision, "$lte": complete}}
+        entity_fields = ["name", "entity_type", "revision"]
+        if not self.separate_observations:
+            entity_fields.append("observations")
+
+        async def read(collection: str, fields: list[str] | None) -> list[dict]:
+            projection = {"_id": 0}
+            if fields is not None:
+                projection.update({field: 1 for field in fields})
+            return (
+                await db[collection]
+                .find(query, projection)
+                .sort("revision", ASCENDING)
+                .limit(limit)
+                .to_list()
+            )
+
+        entities, relations, tombstones = await asyncio.gather(
+            read(ENTITIES_COLLECTION, entity_fields),
+            read(RELATIONS_COLLECTION, RELATION_FIELDS + ["revision"]),
+            read(TOMBSTONES_COLLECTION, None),
+        )
+        changes = heapq.merge(
+            (
+                {"revision": document.pop("revision"), "entity": document}
+                for document in entities
+            ),
+            (
+                {"revision": document.pop("revision"), "relation": document}
+                for document in relations
+            ),
+            (
+                (
+                    {
+                        "revision": tombstone["revision"],
+                        "deleted_entity": tombstone["name"],
+                    }
+                    if "name" in tombstone
+                    else {
+                        "revision": tombstone["revision"],
+                        "deleted_relation": {
+                            field: tombstone[field] for field in RELATION_FIELDS
+                        },
+                    }
+                )
+                for tombstone in tombstones
+            ),
+            key=lambda change: change["revision"],
+        )
+        return list(changes)[:limit], complete
@@ -0,0 +1,241 @@
+import logging
+import os
+from collections import defaultdict
+
+import httpx
+import numpy as np
+import orjson
+
+from .metrics import backend_operation
+
+logger = logging.getLogger("mcp_memory")
+
+MEMORY_EMBEDDING_MODEL = os.environ.get("MEMORY_EMBEDDING_MODEL", "nomic-embed-text")
+MEMORY_EMBEDDING_BATCH_SIZE = int(os.environ.get("MEMORY_EMBEDDING_BATCH_SIZE", 64))
+MEMORY_VECTOR_PATH = os.environ.get("MEMORY_VECTOR_PATH", "memory-vectors")
+# Observation hits fetched per entity wanted, since one entity may match many times.
+OBSERVATIONS_PER_ENTITY = 4
+SYNC_PAGE_SIZE = 1000
+
+
+def ollama_url() -> str:
+    protocol = (
+        "https"
+        if os.environ.get("OLLAMA_USE_SSL", "false").lower() == "true"
+        else "http"
+    )
+    return f"{protocol}://{os.environ.get('OLLAMA_HOST')}:{int(os.environ.get('OLLAMA_PORT', 11434))}"
+
+
+class OllamaEmbedder:
+    """Embeds texts in batches with the Ollama embed API."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str = MEMORY_EMBEDDING_MODEL,
+        batch_size: int = MEMORY_EMBEDDING_BATCH_SIZE,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.client = httpx.AsyncClient(base_url=base_url or ollama_url(), timeout=60)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """One float32 row per text."""
+        rows = []
+        for i in range(0, len(texts), self.batch_size):
+            with backend_operation("ollama", "embed"):
+                response = await self.client.post(
+                    "/api/embed",
+                    json={"model": self.model, "input": texts[i : i + self.batch_size]},
+                )
+                response.raise_for_status()
+            rows.extend(response.json()["embeddings"])
+        return np.array(rows, dtype=np.float32)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class VectorIndex:
+    """
+    A float32 matrix of unit-length rows, one per (entity name, observation).
+
+    Rows are kept packed: the matrix grows by doubling and a removed row is
+    replaced by the last one, so adds and removes are amortized O(1) and a
+    search is a single matrix-vector product over the first ``len(self)`` rows.
+    """
+
+    def __init__(self, dimensions: int = 0):
+        self.matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self.keys: list[tuple[str, str]] = []
+        self.rows: dict[tuple[str, str], int] = {}
+        self.entity_keys: defaultdict[str, set[tuple[str, str]]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self.rows
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+    def add(self, keys: list[tuple[str, str]], vectors: np.ndarray) -> None:
+        """Add or replace the vectors of the given keys."""
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        if not len(self) and self.matrix.shape[1] != vectors.shape[1]:
+            self.matrix = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        for key, vector in zip(keys, vectors):
+            row = self.rows.get(key)
+            if row is None:
+                row = len(self.keys)
+                if row == len(self.matrix):
+                    grown = np.zeros(
+                        (max(2 * row, 64), self.matrix.shape[1]), dtype=np.float32
+                    )
+                    grown[:row] = self.matrix[:row]
+                    self.matrix = grown
+                self.keys.append(key)
+                self.rows[key] = row
+                self.entity_keys[key[0]].add(key)
+            self.matrix[row] = vector
+
+    def remove(self, keys: list[tuple[str, str]]) -> None:
+        for key in keys:
+            row = self.rows.pop(key, None)
+            if row is None:
+                continue
+            last = self.keys.pop()
+            if last != key:
+                self.matrix[row] = self.matrix[len(self.keys)]
+                self.keys[row] = last
+                self.rows[last] = row
+            names = self.entity_keys[key[0]]
+            names.discard(key)
+            if not names:
+                del self.entity_keys[key[0]]
+
+    def remove_entities(self, entity_names: list[str]) -> None:
+        for name in entity_names:
+            self.remove(list(self.entity_keys.get(name, ())))
+
+    def search(self, vector: np.ndarray, k: int) -> list[tuple[tuple[str, str], float]]:
+        """The k keys most cosine-similar to the vector, best first."""
+        if not len(self) or k <= 0:
+            return []
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        scores = self.matrix[: len(self)] @ query
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(self.keys[row], float(scores[row])) for row in top]
+
+    def save(self, path: str, model: str) -> None:
+        """Write the matrix and its keys next to each other, replacing both atomically."""
+        with open(f"{path}.npy.tmp", "wb") as f:
+            np.save(f, self.matrix[: len(self)])
+        with open(f"{path}.json.tmp", "wb") as f:
+            f.write(orjson.dumps({"model": model, "keys": self.keys}))
+        os.replace(f"{path}.npy.tmp", f"{path}.npy")
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+    @classmethod
+    def load(cls, path: str, model: str) -> "VectorIndex":
+        """The index saved at path, or an empty one if none was saved for this model."""
+        index = cls()
+        try:
+            with open(f"{path}.json", "rb") as f:
+                saved = orjson.loads(f.read())
+            matrix = np.load(f"{path}.npy")
+        except FileNotFoundError:
+            return index
+        if saved["model"] != model or len(saved["keys"]) != len(matrix):
+            logger.warning(f"Discarding the vector index at {path}, it does not match")
+            return index
+        index.add([tuple(key) for key in saved["keys"]], matrix)
+        return index
+
+
+class SemanticIndex:
+    """
+    Observation embeddings kept alongside the graph storage.
+
+    The manager reports every observation it writes or deletes. Embeddings
+    are persisted on close, and ``sync`` embeds whatever the storage holds
+    that the saved index lacks, so writes made while the embedding service
+    was unreachable, or by other processes, are picked up on the next start.
+    """
+
+    def __init__(self, embedder: OllamaEmbedder, path: str | None = MEMORY_VECTOR_PATH):
+        self.embedder = embedder
+        self.path = path
+        self.vectors = VectorIndex()
+
+    async def setup(self, storage) -> None:
+        if self.path:
+            self.vectors = VectorIndex.load(self.path, self.embedder.model)
+        await self.sync(storage)
+
+    async def close(self) -> None:
+        if self.path:
+            self.vectors.save(self.path, self.embedder.model)
+        await self.embedder.close()
+
+    async def sync(self, storage) -> None:
+        """Make the index hold exactly the observations in storage."""
+        stored, after = set(), None
+        while True:
+            page = await storage.read_entities(["name"], after, SYNC_PAGE_SIZE)
+            if not page:
+                break
+            after = str(page[-1]["_id"])
+            for entity in await storage.with_observations(page):
+                stored.update(
+                    (entity["name"], observation)
+                    for observation in entity["observations"]
+                )
+        self.vectors.remove([key for key in self.vectors.keys if key not in stored])
+        missing = [key for key in stored if key not in self.vectors]
+        for i in range(0, len(missing), SYNC_PAGE_SIZE):
+            await self.add(missing[i : i + SYNC_PAGE_SIZE])
+        logger.info(f"Semantic index holds {len(self.vectors)} observations")
+
+    async def add(self, keys: list[tuple[str, str]]) -> None:
+        """Embed and index the (entity name, observation) pairs not indexed yet."""
+        keys = [key for key in dict.fromkeys(keys) if key not in self.vectors]
+        if not keys:
+            return
+        try:
+            vectors = await self.embedder.embed(
+                [observation for _, observation in keys]
+            )
+        except (httpx.HTTPError, KeyError) as e:
+            logger.warning(
+                f"Could not embed {len(keys)} observations, they will be "
+                f"embedded on the next start: {e}"
+            )
+            return
+        self.vectors.add(keys, vectors)
+
+    def remove(self, keys: list[tuple[str, str]]) -> None:
+        self.vectors.remove(keys)
+
+    def remove_entities(self, entity_names: list[str]) -> None:
+        self.vectors.remove_entities(entity_names)
+
+    async def search(self, query: str, limit: int) -> dict[str, float]:
+        """Up to limit entity names, each with the similarity of its best observation."""
+        [vector] = await self.embedder.embed([query])
+        scores = {}
+        for (name, _), score in self.vectors.search(
+            vector, limit * OBSERVATIONS_PER_ENTITY
+        ):
+            scores.setdefault(name, score)
+            if len(scores) == limit:
+                break
+        return scores
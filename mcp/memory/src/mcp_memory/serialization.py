@@ -0,0 +1,67 @@
+import orjson
+
+from .storage import ENTITY_FIELDS, RELATION_FIELDS
+
+# Relations read as sentences in the compact format: "from relation_type to".
+COMPACT_RELATION_FIELDS = ["from_entity", "relation_type", "to_entity"]
+
+
+def dumps(value) -> str:
+    """Encode a tool response straight from plain documents."""
+    return orjson.dumps(value).decode()
+
+
+def approximate_tokens(value) -> int:
+    """A rough token count for a response fragment, at about four bytes a token."""
+    return len(orjson.dumps(value)) // 4 + 1
+
+
+def entity_document(document: dict, *extra_fields: str) -> dict:
+    """The public fields of a stored entity document, plus any extra fields."""
+    entity = {field: document[field] for field in ENTITY_FIELDS}
+    for field in extra_fields:
+        entity[field] = document[field]
+    return entity
+
+
+def relation_document(document: dict) -> dict:
+    """The public fields of a stored relation document."""
+    return {field: document[field] for field in RELATION_FIELDS}
+
+
+def compact_graph(graph: dict) -> dict:
+    """
+    Rewrite a graph response with rows instead of objects.
+
+    Entities become lists in the order of ``entity_fields`` with duplicate
+    observations dropped, and relations become ``[from, type, to]`` triples.
+    Any other keys of the response (cursors, flags) are kept as they are.
+    """
+    entities = graph["entities"]
+    entity_fields = list(entities[0]) if entities else []
+    rows = []
+    for entity in entities:
+        row = [entity[field] for field in entity_fields]
+        if "observations" in entity:
+            row[entity_fields.index("observations")] = list(
+                dict.fromkeys(entity["observations"])
+            )
+        rows.append(row)
+    return {
+        **graph,
+        "entity_fields": entity_fields,
+        "entities": rows,
+        "relation_fields": COMPACT_RELATION_FIELDS,
+        "relations": [
+            [relation[field] for field in COMPACT_RELATION_FIELDS]
+            for relation in graph["relations"]
+        ],
+    }
+
+
+def dumps_graph(graph: dict, output_format: str = "json") -> str:
+    if output_format == "compact":
+        return dumps(compact_graph(graph))
+    if output_format != "json":
+        raise Exception(f"Unknown output format: {output_format}")
+    return dumps(graph)
@@ -1,7 +1,11 @@
+import asyncio
+import base64
 import json
 import logging
+import math
 import os
 import sys
+from contextlib import asynccontextmanager, nullcontext
 from typing import Annotated
 
 import anyio
@@ -11,14 +15,52 @@ from mcp.server import Server
 from mcp.shared.exceptions import McpError
 from mcp.types import INTERNAL_ERROR, ErrorData, TextContent
 from pydantic import BaseModel, Field
-from pymongo import MongoClient
+
+from .buffer import BufferedStorage
+from .cache import GraphCache
+from .metrics import (
+    SSE_SESSIONS,
+    handle_metrics,
+    instrument_tool,
+    monitor_event_loop,
+)
+from .serialization import (
+    approximate_tokens,
+    dumps,
+    dumps_graph,
+    entity_document,
+    relation_document,
+)
+from .storage import ENTITY_FIELDS, KnowledgeGraphStorage
 
 load_dotenv()
 
-MONGO_URI = os.environ.get("MONGO_URI")
-DATABASE_NAME = "memories"
-ENTITIES_COLLECTION = "entities"
-RELATIONS_COLLECTION = "relations"
+# "mongo" or "sqlite"; see create_storage.
+MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "mongo")
+MEMORY_CACHE = os.environ.get("MEMORY_CACHE", "false").lower() == "true"
+MEMORY_CACHE_MAX_ENTITIES = int(os.environ.get("MEMORY_CACHE_MAX_ENTITIES", 100000))
+# Coalesce writes arriving within this window into bulk writes; see BufferedStorage.
+MEMORY_WRITE_BUFFER = os.environ.get("MEMORY_WRITE_BUFFER", "false").lower() == "true"
+MEMORY_WRITE_BUFFER_WINDOW_MS = int(os.environ.get("MEMORY_WRITE_BUFFER_WINDOW_MS", 50))
+# "sse", "streamable-http" or "stdio"; see create_app.
+MCP_TRANSPORT = os.environ.get("MCP_TRANSPORT", "sse")
+MCP_WORKERS = int(os.environ.get("MCP_WORKERS", 1))
+MEMORY_SEMANTIC_SEARCH = (
+    os.environ.get("MEMORY_SEMANTIC_SEARCH", "false").lower() == "true"
+)
+ENTITIES_STAGE = "entities"
+RELATIONS_STAGE = "relations"
+DEFAULT_SEARCH_LIMIT = 10
+# Searches rerank this many candidates per returned entity.
+SEARCH_CANDIDATE_FACTOR = 3
+# How strongly an entity's importance (log of its degree) lifts its match score.
+IMPORTANCE_WEIGHT = 0.5
+DEFAULT_TRAVERSAL_DEPTH = 2
+MAX_TRAVERSAL_DEPTH = 5
+DEFAULT_TRAVERSAL_MAX_NODES = 50
+DEFAULT_TRAVERSAL_MAX_EDGES = 100
+DEFAULT_CHANGES_LIMIT = 1000
+DEFAULT_LIST_LIMIT = 100
 
 server = Server("mcp_memory")
 logging.basicConfig(stream=sys.stderr, level=logging.INFO)
@@ -151,180 +193,624 @@ class KnowledgeGraph(BaseModel):
         return {"entities": self.entities, "relations": self.relations}
 
 
+def create_storage(backend: str = MEMORY_BACKEND) -> KnowledgeGraphStorage:
+    if backend == "mongo":
+        from .mongo_storage import MongoStorage
+
+        return MongoStorage()
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+
+        return SQLiteStorage()
+    raise Exception(f"Unknown memory backend: {backend}")
+
+
+def create_semantic_index():
+    """Semantic search needs numpy and an Ollama server, so it is imported on demand."""
+    from .semantic import OllamaEmbedder, SemanticIndex
+
+    return SemanticIndex(OllamaEmbedder())
+
+
 class KnowledgeGraphManager:
-    async def read_graph(self) -> KnowledgeGraph:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        entities = db[ENTITIES_COLLECTION].find()
-        relations = db[RELATIONS_COLLECTION].find()
-        graph = KnowledgeGraph(entities=entities, relations=relations)
-        return graph
+    def __init__(
+        self,
+        storage: KnowledgeGraphStorage | None = None,
+        cache: GraphCache | None = None,
+        semantic=None,
+    ):
+        self.storage = storage or create_storage()
+        if cache is not None and not self.storage.cacheable:
+            logger.warning(
+                "The graph cache cannot follow this storage, disabling the cache"
+            )
+            cache = None
+        self.cache = cache
+        self.semantic = semantic
+        # Set when other workers of this server write to the same database.
+        self.shared_storage = False
+        self._watch_task: asyncio.Task | None = None
+
+    async def setup(self) -> None:
+        await self.storage.setup()
+        if self.semantic is not None:
+            await self.semantic.setup(self.storage)
+
+        if self.cache is not None:
+            self._watch_task = asyncio.create_task(self.watch())
+
+    async def close(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        await self.storage.close()
+        if self.semantic is not None:
+            await self.semantic.close()
+
+    async def load_cache(self) -> None:
+        self.cache.load(*await self.storage.snapshot(self.cache.max_entities))
+
+    async def watch(self) -> None:
+        """
+        Load the cache and apply changes made by other processes to it. The
+        storage only returns once it cannot follow other processes' changes;
+        a cache shared with other workers would then go stale, so it is
+        dropped.
+        """
+        await self.storage.watch(self.cache.apply_change, self.load_cache)
+        if self.shared_storage and self.cache is not None:
+            logger.warning(
+                "Other workers' writes cannot be followed without a change stream, "
+                "disabling the graph cache"
+            )
+            self.cache = None
+
+    def _cached(self) -> GraphCache | None:
+        """The cache, if it holds the whole graph."""
+        if self.cache is not None and self.cache.complete:
+            return self.cache
+        return None
+
+    async def read_graph(self, arguments: dict | None = None) -> dict:
+        """
+        Read the graph, either whole, one page at a time, or as a summary.
+
+        Pages walk the entities and then the relations in storage order. Each
+        page holds at most ``limit`` items and carries the ``next_cursor`` to
+        pass back for the following page, or None once the graph is exhausted.
+        """
+        arguments = arguments or {}
+        cache = self._cached()
+        if arguments.get("mode", "full") == "summary":
+            if cache is not None:
+                return cache.summarize()
+            return await self.storage.summarize_graph()
+
+        fields = ["name"] + [
+            field
+            for field in ENTITY_FIELDS
+            if field != "name" and field in arguments.get("fields", ENTITY_FIELDS)
+        ]
+        limit = arguments.get("limit")
+        observation_limit = arguments.get("observation_limit")
+        if limit is None and cache is not None:
+            entities, relations = cache.read_graph()
+            if "observations" in fields:
+                entities = await self.storage.with_observations(
+                    entities, observation_limit
+                )
+            return {
+                "entities": [
+                    {field: entity[field] for field in fields} for entity in entities
+                ],
+                "relations": relations,
+            }
+
+        if limit is None:
+            entities = await self.storage.read_entities(fields)
+            if "observations" in fields:
+                entities = await self.storage.with_observations(
+                    entities, observation_limit
+                )
+            return {
+                "entities": entities,
+                "relations": await self.storage.read_relations(),
+            }
+
+        limit = int(limit)
+        stage, after = self._decode_cursor(arguments.get("cursor"))
+        entities, relations, next_cursor = [], [], None
+
+        if stage == ENTITIES_STAGE:
+            entities = await self.storage.read_entities(fields, after, limit + 1)
+            if len(entities) > limit:
+                entities = entities[:limit]
+                next_cursor = self._encode_cursor(ENTITIES_STAGE, entities[-1]["_id"])
+            elif len(entities) == limit:
+                next_cursor = self._encode_cursor(RELATIONS_STAGE, None)
+            stage, after = RELATIONS_STAGE, None
+
+        remaining = limit - len(entities)
+        if next_cursor is None and stage == RELATIONS_STAGE:
+            relations = await self.storage.read_relations(after, remaining + 1)
+            if len(relations) > remaining:
+                relations = relations[:remaining]
+                next_cursor = self._encode_cursor(RELATIONS_STAGE, relations[-1]["_id"])
+
+        for document in entities + relations:
+            document.pop("_id")
+        if "observations" in fields:
+            entities = await self.storage.with_observations(entities, observation_limit)
+        return {
+            "entities": entities,
+            "relations": relations,
+            "next_cursor": next_cursor,
+        }
+
+    @staticmethod
+    def _encode_cursor(stage: str, after) -> str:
+        cursor = {"stage": stage, "after": str(after) if after is not None else None}
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str | None) -> tuple[str, str | None]:
+        if not cursor:
+            return ENTITIES_STAGE, None
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            stage, after = decoded["stage"], decoded["after"]
+        except (ValueError, KeyError, TypeError):
+            raise Exception(f"Invalid cursor: {cursor}")
+        if stage not in (ENTITIES_STAGE, RELATIONS_STAGE) or not (
+            after is None or isinstance(after, str)
+        ):
+            raise Exception(f"Invalid cursor: {cursor}")
+        return stage, after
 
     async def create_entity(self, arguments: dict) -> list[Entity]:
         entity = Entity.from_dict(arguments)
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        entities_collection = db[ENTITIES_COLLECTION]
-        if not entities_collection.find_one({"name": entity.name}):
-            entities_collection.insert_one(entity.to_dict())
-            return entity
-        else:
+        [status] = await self.storage.create_entities([entity.to_dict()])
+        if status["status"] == "error":
+            raise Exception(status["error"])
+        if status["status"] != "created":
             return None
+        if self.cache is not None:
+            self.cache.put_entity(entity.to_dict())
+        if self.semantic is not None:
+            await self.semantic.add(
+                [(entity.name, observation) for observation in entity.observations]
+            )
+        return entity
 
     async def create_relation(self, arguments: dict) -> list[Relation]:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        relations_collection = db[RELATIONS_COLLECTION]
-
-        if not relations_collection.find_one(
-            {
-                "from_entity": arguments["from_entity"],
-                "to_entity": arguments["to_entity"],
-                "relation_type": arguments["relation_type"],
-            }
-        ):
-            relation = Relation.from_dict(arguments)
-            relations_collection.insert_one(relation.to_dict())
-            return relation
-
-        return None
+        relation = Relation.from_dict(arguments)
+        [status] = await self.storage.create_relations([relation.to_dict()])
+        if status["status"] == "error":
+            raise Exception(status["error"])
+        if status["status"] != "created":
+            return None
+        if self.cache is not None:
+            self.cache.put_relation(relation.to_dict())
+        return relation
 
     async def add_observations(self, arguments: dict) -> dict:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        entities_collection = db[ENTITIES_COLLECTION]
-
-        entity = entities_collection.find_one({"name": arguments["entity_name"]})
-        if entity:
-            new_observations = [
-                obs
-                for obs in arguments["observations"]
-                if obs not in entity["observations"]
-            ]
-            entities_collection.update_one(
-                {"name": arguments["entity_name"]},
-                {"$set": {"observations": entity["observations"] + new_observations}},
-            )
-            return {
-                "entity_name": arguments["entity_name"],
-                "added_observations": new_observations,
-            }
-        else:
-            raise Exception(f"Entity with name {arguments["entity_name"]} not found")
+        """
+        Add observations atomically, reporting the ones that were actually new.
 
-    async def delete_entities(self, arguments: dict) -> None:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        entities_collection = db[ENTITIES_COLLECTION]
-        relations_collection = db[RELATIONS_COLLECTION]
+        Concurrent writers never lose each other's additions and each addition
+        is reported by exactly one of them.
+        """
+        entity_name = arguments["entity_name"]
+        observations = list(dict.fromkeys(arguments["observations"]))
 
-        entity_names = arguments["entity_names"]
+        new_observations = await self.storage.add_observations(
+            entity_name, observations
+        )
+        if new_observations is None:
+            raise Exception(f"Entity with name {entity_name} not found")
+        if self.cache is not None:
+            self.cache.add_observations(entity_name, new_observations)
+        if self.semantic is not None:
+            await self.semantic.add(
+                [(entity_name, observation) for observation in new_observations]
+            )
+        return {
+            "entity_name": entity_name,
+            "added_observations": new_observations,
+        }
 
-        entities_collection.delete_many({"name": {"$in": entity_names}})
-        relations_collection.delete_many(
-            {
-                "$or": [
-                    {"from_entity": {"$in": entity_names}},
-                    {"to_entity": {"$in": entity_names}},
+    async def create_entities(self, arguments: dict) -> list[dict]:
+        entities = [Entity.from_dict(entity) for entity in arguments["entities"]]
+        statuses = await self.storage.create_entities(
+            [entity.to_dict() for entity in entities]
+        )
+        created = [
+            entity
+            for entity, status in zip(entities, statuses)
+            if status["status"] == "created"
+        ]
+        if self.cache is not None:
+            for entity in created:
+                self.cache.put_entity(entity.to_dict())
+        if self.semantic is not None:
+            await self.semantic.add(
+                [
+                    (entity.name, observation)
+                    for entity in created
+                    for observation in entity.observations
                 ]
-            }
+            )
+        return statuses
+
+    async def create_relations(self, arguments: dict) -> list[dict]:
+        relations = [
+            Relation.from_dict(relation) for relation in arguments["relations"]
+        ]
+        statuses = await self.storage.create_relations(
+            [relation.to_dict() for relation in relations]
         )
+        if self.cache is not None:
+            for relation, status in zip(relations, statuses):
+                if status["status"] == "created":
+                    self.cache.put_relation(relation.to_dict())
+        return statuses
+
+    async def add_observations_batch(self, arguments: dict) -> list[dict]:
+        additions = arguments["observations"]
+        statuses = await self.storage.add_observations_batch(additions)
+        updated = [status for status in statuses if status["status"] == "updated"]
+        if self.cache is not None:
+            for status in updated:
+                self.cache.add_observations(
+                    status["entity_name"], status["added_observations"]
+                )
+        if self.semantic is not None:
+            await self.semantic.add(
+                [
+                    (status["entity_name"], observation)
+                    for status in updated
+                    for observation in status["added_observations"]
+                ]
+            )
+        return statuses
 
-    async def delete_observations(self, arguments: dict) -> None:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        entities_collection = db[ENTITIES_COLLECTION]
-
+    async def delete_entities(self, arguments: dict) -> None:
+        entity_names = arguments["entity_names"]
+        await self.storage.delete_entities(entity_names)
+        if self.cache is not None:
+            self.cache.remove_entities(entity_names)
+        if self.semantic is not None:
+            self.semantic.remove_entities(entity_names)
+
+    async def delete_observations(self, arguments: dict) -> dict | None:
+        """
+        Remove observations atomically.
+
+        Returns the observations that were actually removed, or None if the
+        entity does not exist.
+        """
         entity_name = arguments["entity_name"]
-        observations = arguments["observations"]
-
-        entity = entities_collection.find_one({"name": entity_name})
-        if entity:
-            updated_observations = [
-                observation
-                for observation in entity["observations"]
-                if observation not in observations
-            ]
-            entities_collection.update_one(
-                {"name": entity_name},
-                {"$set": {"observations": updated_observations}},
+        observations = list(dict.fromkeys(arguments["observations"]))
+
+        deleted_observations = await self.storage.delete_observations(
+            entity_name, observations
+        )
+        if deleted_observations is None:
+            return None
+        if self.cache is not None:
+            self.cache.remove_observations(entity_name, deleted_observations)
+        if self.semantic is not None:
+            self.semantic.remove(
+                [(entity_name, observation) for observation in deleted_observations]
             )
+        return {
+            "entity_name": entity_name,
+            "deleted_observations": deleted_observations,
+        }
 
     async def delete_relation(self, arguments: dict) -> None:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        relations_collection = db[RELATIONS_COLLECTION]
-
         relation = Relation.from_dict(arguments)
+        await self.storage.delete_relation(relation.to_dict())
+        if self.cache is not None:
+            self.cache.remove_relation(
+                (relation.from_entity, relation.to_entity, relation.relation_type)
+            )
 
-        relations_collection.delete_one(relation.to_dict())
-
-    async def search_nodes(self, arguments: dict) -> KnowledgeGraph:
-        client = MongoClient(MONGO_URI)
-        db = client[DATABASE_NAME]
-        entities_collection = db[ENTITIES_COLLECTION]
-        relations_collection = db[RELATIONS_COLLECTION]
+    async def search_nodes(self, arguments: dict) -> dict:
+        """
+        Find the entities best matching the query.
 
+        A pool of the best matches is reranked by match score weighted with
+        each entity's importance, its degree, which the storage keeps current
+        as relations change. The result is cut to ``limit`` entities and then
+        to ``max_tokens`` if given, and only carries the relations among the
+        returned entities.
+        """
         query = arguments["query"]
+        mode = arguments.get("mode", "text")
+        limit = int(arguments.get("limit", DEFAULT_SEARCH_LIMIT))
+        max_tokens = arguments.get("max_tokens")
+        observation_limit = arguments.get("observation_limit")
+        if mode not in ("text", "substring", "semantic"):
+            raise Exception(f"Unknown search mode: {mode}")
+
+        candidates = limit * SEARCH_CANDIDATE_FACTOR
+        cache = self._cached()
+        if mode == "semantic":
+            documents = await self._search_semantic(query, candidates)
+        elif cache is not None:
+            if mode == "text":
+                documents = [
+                    {**entity, "score": score}
+                    for entity, score in cache.search_text(query, candidates)
+                ]
+            else:
+                documents = cache.search_substring(query, candidates)
+            documents = [
+                {**document, "degree": cache.degree(document["name"])}
+                for document in documents
+            ]
+        elif mode == "text":
+            documents = await self.storage.search_text(query, candidates)
+        else:
+            documents = await self.storage.search_substring(query, candidates)
 
-        filtered_entities = list(
-            entities_collection.find(
-                {
-                    "$or": [
-                        {"name": {"$regex": f".*{query}.*", "$options": "i"}},
-                        {"entity_type": {"$regex": f".*{query}.*", "$options": "i"}},
-                        {"observations": {"$regex": f".*{query}.*", "$options": "i"}},
-                    ]
-                }
-            )
-        )
+        documents = self._rank(documents, mode)[:limit]
+        documents = await self.storage.with_observations(documents, observation_limit)
+        names = [document["name"] for document in documents]
+        if cache is not None:
+            relations = cache.relations_among(names)
+        else:
+            relations = await self.storage.relations_among(names)
 
-        filtered_entity_names = [entity["name"] for entity in filtered_entities]
+        extra_fields = ("score",) if mode != "substring" else ()
+        graph = {
+            "entities": [
+                entity_document(document, *extra_fields) for document in documents
+            ],
+            "relations": [relation_document(relation) for relation in relations],
+        }
+        if max_tokens is not None:
+            graph = self._fit_budget(graph, int(max_tokens))
+        return graph
 
-        filtered_relations = list(
-            relations_collection.find(
-                {
-                    "$or": [
-                        {"from_entity": {"$in": filtered_entity_names}},
-                        {"to_entity": {"$in": filtered_entity_names}},
-                    ]
-                }
+    async def _search_semantic(self, query: str, limit: int) -> list[dict]:
+        """Entities scored by the cosine similarity of their closest observation."""
+        if self.semantic is None:
+            raise Exception(
+                "Semantic search is disabled, set MEMORY_SEMANTIC_SEARCH=true to enable it"
+            )
+        scores = await self.semantic.search(query, limit)
+        documents = await self.storage.get_entities(list(scores))
+        return [
+            {**document, "score": scores[document["name"]]} for document in documents
+        ]
+
+    @staticmethod
+    def _rank(documents: list[dict], mode: str) -> list[dict]:
+        """
+        Order scored matches by weighted score and substring matches by degree.
+        Only positive scores are lifted: semantic scores are cosine similarities,
+        and scaling a negative one up would sink a well connected entity.
+        """
+        if mode == "substring":
+            return sorted(
+                documents, key=lambda document: document.get("degree", 0), reverse=True
             )
+        for document in documents:
+            if document["score"] <= 0:
+                continue
+            importance = math.log1p(max(document.get("degree", 0), 0))
+            document["score"] = document["score"] * (1 + IMPORTANCE_WEIGHT * importance)
+        return sorted(documents, key=lambda document: document["score"], reverse=True)
+
+    @staticmethod
+    def _fit_budget(graph: dict, max_tokens: int) -> dict:
+        """
+        Keep the best entities, with the relations among them, that fit in
+        about max_tokens. The result is marked as truncated if any were cut.
+        """
+        relations = graph["relations"]
+        entities, names, used = [], set(), 0
+        for entity in graph["entities"]:
+            name = entity["name"]
+            admitted = names | {name}
+            cost = approximate_tokens(entity) + sum(
+                approximate_tokens(relation)
+                for relation in relations
+                if name in (relation["from_entity"], relation["to_entity"])
+                and relation["from_entity"] in admitted
+                and relation["to_entity"] in admitted
+            )
+            if used + cost > max_tokens:
+                break
+            entities.append(entity)
+            names.add(name)
+            used += cost
+        return {
+            "entities": entities,
+            "relations": [
+                relation
+                for relation in relations
+                if relation["from_entity"] in names and relation["to_entity"] in names
+            ],
+            "truncated": len(entities) < len(graph["entities"]),
+        }
+
+    async def open_nodes(
+        self, entity_names: list[str], observation_limit: int | None = None
+    ) -> dict:
+        """Fetch the named entities and every relation touching them."""
+        cached = self.cache.open_nodes(entity_names) if self.cache else None
+        if cached is not None:
+            documents, relations = cached
+        else:
+            documents, relations = await self.storage.open_nodes(entity_names)
+        documents = await self.storage.with_observations(documents, observation_limit)
+        return {
+            "entities": [entity_document(document) for document in documents],
+            "relations": [relation_document(relation) for relation in relations],
+        }
+
+    async def list_by_type(self, arguments: dict) -> dict:
+        """
+        Page through the entities of one type in name order. The cursor is the
+        last name of the previous page, so pages stay stable under writes.
+        """
+        entity_type = arguments["entity_type"]
+        limit = int(arguments.get("limit", DEFAULT_LIST_LIMIT))
+        entities = await self.storage.list_by_type(
+            entity_type,
+            arguments.get("cursor"),
+            limit + 1,
+            bool(arguments.get("observation_counts", False)),
         )
+        next_cursor = None
+        if len(entities) > limit:
+            entities = entities[:limit]
+            next_cursor = entities[-1]["name"]
+        return {
+            "entity_type": entity_type,
+            "entities": entities,
+            "next_cursor": next_cursor,
+        }
+
+    async def count_by_type(self) -> dict:
+        """The number of entities of each type, most common first."""
+        counts = await self.storage.count_entity_types()
+        return {
+            "entity_types": dict(
+                sorted(counts.items(), key=lambda item: item[1], reverse=True)
+            )
+        }
 
-        filtered_graph = KnowledgeGraph(
-            entities=filtered_entities, relations=filtered_relations
+    async def changes_since(self, arguments: dict) -> dict:
+        """
+        Everything that changed after a revision, for clients keeping a copy of
+        the graph in sync.
+
+        Entities and relations written since come back whole, deletions as
+        tombstones. Applying the deletions and then the upserts brings a copy
+        that was current at ``revision`` up to the returned ``revision``; when
+        ``has_more`` is set, call again from there.
+        """
+        since = int(arguments.get("revision", 0))
+        limit = int(arguments.get("limit", DEFAULT_CHANGES_LIMIT))
+        changes, revision = await self.storage.changes_since(since, limit + 1)
+        has_more = len(changes) > limit
+        if has_more:
+            changes = changes[:limit]
+            revision = changes[-1]["revision"]
+        entities = await self.storage.with_observations(
+            [change["entity"] for change in changes if "entity" in change],
+            arguments.get("observation_limit"),
         )
+        return {
+            "revision": revision,
+            "has_more": has_more,
+            "entities": [entity_document(document) for document in entities],
+            "relations": [
+                relation_document(change["relation"])
+                for change in changes
+                if "relation" in change
+            ],
+            "deleted_entities": [
+                change["deleted_entity"]
+                for change in changes
+                if "deleted_entity" in change
+            ],
+            "deleted_relations": [
+                change["deleted_relation"]
+                for change in changes
+                if "deleted_relation" in change
+            ],
+        }
 
-        return filtered_graph
+    async def traverse(self, arguments: dict) -> dict:
+        """
+        Collect the neighborhood of the start entities up to max_depth hops.
+
+        The storage walks the relations in one query. Edges are then admitted
+        nearest first until the node or edge budget runs out, in which case the
+        result is marked as truncated.
+        """
+        start = arguments["start"]
+        max_depth = min(
+            int(arguments.get("max_depth", DEFAULT_TRAVERSAL_DEPTH)),
+            MAX_TRAVERSAL_DEPTH,
+        )
+        max_nodes = int(arguments.get("max_nodes", DEFAULT_TRAVERSAL_MAX_NODES))
+        max_edges = int(arguments.get("max_edges", DEFAULT_TRAVERSAL_MAX_EDGES))
+        relation_types = arguments.get("relation_types")
+        direction = arguments.get("direction", "outgoing")
+
+        if direction == "outgoing":
+            near_field, far_field = "from_entity", "to_entity"
+        elif direction == "incoming":
+            near_field, far_field = "to_entity", "from_entity"
+        else:
+            raise Exception(f"Unknown traversal direction: {direction}")
 
-    # TODO: Implement this method
-    # async def open_nodes(self, entity_names: list[str]) -> KnowledgeGraph:
-    #     client = MongoClient(MONGO_URI)
-    #     db = client[DATABASE_NAME]
-    #     entities_collection = db[ENTITIES_COLLECTION]
-    #     relations_collection = db[RELATIONS_COLLECTION]
+        documents, edges = await self.storage.neighborhood(
+            start, max_depth, direction, relation_types
+        )
+        truncated = len(documents) > max_nodes
+        documents = documents[:max_nodes]
+
+        depths = {document["name"]: 0 for document in documents}
+        relations = []
+        for edge in sorted(edges, key=lambda edge: edge["depth"]):
+            node = edge[far_field]
+            if (
+                len(relations) >= max_edges
+                or edge[near_field] not in depths
+                or (node not in depths and len(depths) >= max_nodes)
+            ):
+                truncated = True
+                continue
+            depths.setdefault(node, edge["depth"] + 1)
+            relations.append(relation_document(edge))
+
+        entities = {document["name"]: document for document in documents}
+        missing = [name for name in depths if name not in entities]
+        if missing:
+            entities.update(
+                {
+                    document["name"]: document
+                    for document in await self.storage.get_entities(missing)
+                }
+            )
+        entities = {
+            document["name"]: document
+            for document in await self.storage.with_observations(
+                list(entities.values()), arguments.get("observation_limit")
+            )
+        }
 
-    #     filtered_entities = list(
-    #         entities_collection.find({"name": {"$in": entity_names}})
-    #     )
-    #     filtered_entity_names = [entity["name"] for entity in filtered_entities]
-    #     filtered_relations = list(
-    #         relations_collection.find(
-    #             {
-    #                 "$or": [
-    #                     {"from_entity": {"$in": filtered_entity_names}},
-    #                     {"to_entity": {"$in": filtered_entity_names}},
-    #                 ]
-    #             }
-    #         )
-    #     )
+        return {
+            "entities": [
+                {**entity_document(entities[name]), "depth": depth}
+                for name, depth in depths.items()
+                if name in entities
+            ],
+            "relations": relations,
+            "truncated": truncated,
+        }
 
-    #     filtered_graph = KnowledgeGraph()
-    #     filtered_graph.entities = filtered_entities
-    #     filtered_graph.relations = filtered_relations
 
-    #     return filtered_graph
+manager = KnowledgeGraphManager(
+    storage=(
+        BufferedStorage(create_storage(), MEMORY_WRITE_BUFFER_WINDOW_MS / 1000)
+        if MEMORY_WRITE_BUFFER
+        else None
+    ),
+    cache=GraphCache(MEMORY_CACHE_MAX_ENTITIES) if MEMORY_CACHE else None,
+    semantic=create_semantic_index() if MEMORY_SEMANTIC_SEARCH else None,
+)
 
 
 @server.list_tools()
@@ -333,6 +819,7 @@ async def list_tools() -> list[types.Tool]:
 
 
 @server.call_tool()
+@instrument_tool
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent]:
@@ -340,70 +827,95 @@ async def handle_call_tool(
     logger.info(f"Handling tool {name} with arguments {arguments}")
     if not arguments:
         arguments = {}
+    output_format = arguments.get("format", "json")
     try:
         if name == "create_entity":
-            new_entity = await KnowledgeGraphManager().create_entity(arguments)
+            new_entity = await manager.create_entity(arguments)
             return [
                 TextContent(
                     type="text",
-                    text=json.dumps(new_entity.to_dict()) if new_entity else "None",
+                    text=dumps(new_entity.to_dict()) if new_entity else "None",
                 )
             ]
 
         elif name == "create_relation":
-            new_relation = await KnowledgeGraphManager().create_relation(arguments)
+            new_relation = await manager.create_relation(arguments)
             return [
                 TextContent(
                     type="text",
-                    text=json.dumps(new_relation.to_dict()) if new_relation else "None",
+                    text=dumps(new_relation.to_dict()) if new_relation else "None",
                 )
             ]
 
         elif name == "add_observations":
-            observations = await KnowledgeGraphManager().add_observations(arguments)
+            observations = await manager.add_observations(arguments)
             return [
                 TextContent(
                     type="text",
-                    text=json.dumps(observations if observations else "None"),
+                    text=dumps(observations if observations else "None"),
                 )
             ]
 
+        elif name == "create_entities":
+            statuses = await manager.create_entities(arguments)
+            return [TextContent(type="text", text=dumps(statuses))]
+
+        elif name == "create_relations":
+            statuses = await manager.create_relations(arguments)
+            return [TextContent(type="text", text=dumps(statuses))]
+
+        elif name == "add_observations_batch":
+            statuses = await manager.add_observations_batch(arguments)
+            return [TextContent(type="text", text=dumps(statuses))]
+
         elif name == "delete_entities":
-            await KnowledgeGraphManager().delete_entities(arguments)
+            await manager.delete_entities(arguments)
             return [TextContent(type="text", text="Entities deleted")]
 
         elif name == "delete_observations":
-            await KnowledgeGraphManager().delete_observations(arguments)
-            return [TextContent(type="text", text="Observations deleted")]
+            observations = await manager.delete_observations(arguments)
+            return [
+                TextContent(
+                    type="text",
+                    text=dumps(observations if observations else "None"),
+                )
+            ]
 
         elif name == "delete_relation":
-            await KnowledgeGraphManager().delete_relation(arguments)
+            await manager.delete_relation(arguments)
             return [TextContent(type="text", text="Relations deleted")]
 
+        elif name == "traverse":
+            graph = await manager.traverse(arguments)
+            return [TextContent(type="text", text=dumps_graph(graph, output_format))]
+
         elif name == "read_graph":
-            graph = await KnowledgeGraphManager().read_graph()
-            graph_dict = {
-                "entities": [entity.to_dict() for entity in graph.entities],
-                "relations": [relation.to_dict() for relation in graph.relations],
-            }
-            return [TextContent(type="text", text=json.dumps(graph_dict))]
+            graph = await manager.read_graph(arguments)
+            if arguments.get("mode") == "summary":
+                return [TextContent(type="text", text=dumps(graph))]
+            return [TextContent(type="text", text=dumps_graph(graph, output_format))]
 
         elif name == "search_nodes":
-            graph = await KnowledgeGraphManager().search_nodes(arguments)
-            graph_dict = {
-                "entities": [entity.to_dict() for entity in graph.entities],
-                "relations": [relation.to_dict() for relation in graph.relations],
-            }
-            return [TextContent(type="text", text=json.dumps(graph_dict))]
+            graph = await manager.search_nodes(arguments)
+            return [TextContent(type="text", text=dumps_graph(graph, output_format))]
+
+        elif name == "open_nodes":
+            graph = await manager.open_nodes(
+                arguments["names"], arguments.get("observation_limit")
+            )
+            return [TextContent(type="text", text=dumps_graph(graph, output_format))]
+
+        elif name == "list_by_type":
+            entities = await manager.list_by_type(arguments)
+            return [TextContent(type="text", text=dumps(entities))]
 
-        # TODO: Implement this method
-        # elif name == "open_nodes":
-        #     graph = await KnowledgeGraphManager().open_nodes(arguments["names"])
-        #     graph_dict = {
-        #         "entities": [entity.to_dict() for entity in graph.entities],
-        #         "relations": [relation.to_dict() for relation in graph.relations],
-        #     }
-        #     return [TextContent(type="text", text=json.dumps(graph_dict))]
+        elif name == "count_by_type":
+            counts = await manager.count_by_type()
+            return [TextContent(type="text", text=dumps(counts))]
+
+        elif name == "changes_since":
+            changes = await manager.changes_since(arguments)
+            return [TextContent(type="text", text=dumps(changes))]
 
         else:
             raise Exception(f"Unknown tool name: {name}")
@@ -419,6 +931,20 @@ async def handle_call_tool(
         )
 
 
+FORMAT_PROPERTY = {
+    "type": "string",
+    "enum": ["json", "compact"],
+    "description": "json returns objects; compact returns entities as rows in the order of entity_fields and relations as [from_entity, relation_type, to_entity] triples, which is much smaller",
+    "default": "json",
+}
+
+OBSERVATION_LIMIT_PROPERTY = {
+    "type": "integer",
+    "minimum": 1,
+    "description": "Return only the latest observations of each entity, up to this many",
+}
+
+
 def list_tools_sync() -> list[types.Tool]:
     return [
         types.Tool(
@@ -426,43 +952,74 @@ def list_tools_sync() -> list[types.Tool]:
             description="Create a new entity in the knowledge graph",
             inputSchema=Entity.schema(),
         ),
-        # types.Tool(
-        #     name="create_entities",
-        #     description="Create multiple new entities in the knowledge graph",
-        #     inputSchema={
-        #         "type": "object",
-        #         "properties": {
-        #             "entities": {
-        #                 "type": "array",
-        #                 "items": {
-        #                     "type": "object",
-        #                     "properties": {
-        #                         "name": {
-        #                             "type": "string",
-        #                             "description": "The name of the entity",
-        #                         },
-        #                         "entity_type": {
-        #                             "type": "string",
-        #                             "description": "The type of the entity",
-        #                         },
-        #                         "observations": {
-        #                             "type": "array",
-        #                             "items": {"type": "string"},
-        #                             "description": "An array of observation contents associated with the entity",
-        #                         },
-        #                     },
-        #                     "required": ["name", "entity_type", "observations"],
-        #                 },
-        #             },
-        #         },
-        #         "required": ["entities"],
-        #     },
-        # ),
+        types.Tool(
+            name="create_entities",
+            description="Create multiple new entities in the knowledge graph in one call. Returns whether each entity was created or skipped because it already exists",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "entities": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {
+                                    "type": "string",
+                                    "description": "The name of the entity",
+                                },
+                                "entity_type": {
+                                    "type": "string",
+                                    "description": "The type of the entity",
+                                },
+                                "observations": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "An array of observation contents associated with the entity",
+                                },
+                            },
+                            "required": ["name", "entity_type", "observations"],
+                        },
+                    },
+                },
+                "required": ["entities"],
+            },
+        ),
         types.Tool(
             name="create_relation",
             description="Create multiple new relations between entities in the knowledge graph. Relations should be in active voice",
             inputSchema=Relation.schema(),
         ),
+        types.Tool(
+            name="create_relations",
+            description="Create multiple new relations between entities in the knowledge graph in one call. Relations should be in active voice. Returns whether each relation was created or skipped because it already exists",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "relations": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "from_entity": {
+                                    "type": "string",
+                                    "description": "The name of the entity where the relation starts",
+                                },
+                                "to_entity": {
+                                    "type": "string",
+                                    "description": "The name of the entity where the relation ends",
+                                },
+                                "relation_type": {
+                                    "type": "string",
+                                    "description": "The type of the relation",
+                                },
+                            },
+                            "required": ["from_entity", "to_entity", "relation_type"],
+                        },
+                    },
+                },
+                "required": ["relations"],
+            },
+        ),
         types.Tool(
             name="add_observations",
             description="Add new observations to an existing entity in the knowledge graph",
@@ -482,6 +1039,34 @@ def list_tools_sync() -> list[types.Tool]:
                 "required": ["entity_name", "contents"],
             },
         ),
+        types.Tool(
+            name="add_observations_batch",
+            description="Add new observations to several existing entities in the knowledge graph in one call. Returns for each entity the observations that were new, or that it was not found",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "observations": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "entity_name": {
+                                    "type": "string",
+                                    "description": "The name of the entity to add the observations to",
+                                },
+                                "observations": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "An array of observations to add",
+                                },
+                            },
+                            "required": ["entity_name", "observations"],
+                        },
+                    },
+                },
+                "required": ["observations"],
+            },
+        ),
         types.Tool(
             name="delete_entities",
             description="Delete multiple entities and their associated relations from the knowledge graph",
@@ -541,15 +1126,38 @@ def list_tools_sync() -> list[types.Tool]:
         ),
         types.Tool(
             name="read_graph",
-            description="Read the entire knowledge graph",
+            description="Read the knowledge graph. Use summary mode to see entity and relation type counts first, and limit to page through large graphs",
             inputSchema={
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "mode": {
+                        "type": "string",
+                        "enum": ["full", "summary"],
+                        "default": "full",
+                        "description": "full returns entities and relations; summary returns only counts per entity type and relation type",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "The maximum number of entities and relations to return per page. Omit to read the whole graph",
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "The next_cursor returned by the previous page",
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ENTITY_FIELDS},
+                        "description": "The entity fields to return. The name is always returned",
+                    },
+                    "observation_limit": OBSERVATION_LIMIT_PROPERTY,
+                    "format": FORMAT_PROPERTY,
+                },
             },
         ),
         types.Tool(
             name="search_nodes",
-            description="Search for nodes in the knowledge graph based on a query",
+            description="Search for nodes in the knowledge graph based on a query. Results are ranked by match quality and how connected each entity is, and only include the relations among the returned entities",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -557,96 +1165,337 @@ def list_tools_sync() -> list[types.Tool]:
                         "type": "string",
                         "description": "The search query to match against entity names, types, and observation content",
                     },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["text", "substring", "semantic"],
+                        "default": "text",
+                        "description": "text ranks whole-word matches using the full-text index; substring matches any part of a word but scans every entity; semantic ranks entities by how close in meaning their observations are to the query, if enabled",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "default": DEFAULT_SEARCH_LIMIT,
+                        "description": "The maximum number of entities to return",
+                    },
+                    "max_tokens": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Return only the best entities that fit in about this many tokens, and mark the result as truncated if any were left out",
+                    },
+                    "observation_limit": OBSERVATION_LIMIT_PROPERTY,
+                    "format": FORMAT_PROPERTY,
                 },
                 "required": ["query"],
             },
         ),
-        # types.Tool(
-        #     name="open_nodes",
-        #     description="Open specific nodes in the knowledge graph by their names",
-        #     inputSchema={
-        #         "type": "object",
-        #         "properties": {
-        #             "names": {
-        #                 "type": "array",
-        #                 "items": {"type": "string"},
-        #                 "description": "An array of entity names to retrieve",
-        #             },
-        #         },
-        #         "required": ["names"],
-        #     },
-        # ),
+        types.Tool(
+            name="traverse",
+            description="Return the neighborhood of one or more entities in a single call by following relations up to max_depth hops. Prefer this over repeated search_nodes calls for multi-hop recall",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "start": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "The names of the entities to start from",
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_TRAVERSAL_DEPTH,
+                        "default": DEFAULT_TRAVERSAL_DEPTH,
+                        "description": "The maximum number of relations to follow from a start entity",
+                    },
+                    "direction": {
+                        "type": "string",
+                        "enum": ["outgoing", "incoming"],
+                        "default": "outgoing",
+                        "description": "Follow relations from the start entities or towards them",
+                    },
+                    "relation_types": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Only follow relations of these types",
+                    },
+                    "max_nodes": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "default": DEFAULT_TRAVERSAL_MAX_NODES,
+                        "description": "The maximum number of entities to return",
+                    },
+                    "max_edges": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "default": DEFAULT_TRAVERSAL_MAX_EDGES,
+                        "description": "The maximum number of relations to return",
+                    },
+                    "observation_limit": OBSERVATION_LIMIT_PROPERTY,
+                    "format": FORMAT_PROPERTY,
+                },
+                "required": ["start"],
+            },
+        ),
+        types.Tool(
+            name="open_nodes",
+            description="Open specific nodes in the knowledge graph by their names, along with the relations touching them",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "names": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "An array of entity names to retrieve",
+                    },
+                    "observation_limit": OBSERVATION_LIMIT_PROPERTY,
+                    "format": FORMAT_PROPERTY,
+                },
+                "required": ["names"],
+            },
+        ),
+        types.Tool(
+            name="list_by_type",
+            description="List the names of the entities of one type, such as every project, in name order and one page at a time, optionally with how many observations each has. Cheaper than searching or reading the whole graph; use count_by_type to see which types exist",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "entity_type": {
+                        "type": "string",
+                        "description": "The entity type to list",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Maximum number of entities per page",
+                        "default": DEFAULT_LIST_LIMIT,
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "The next_cursor returned by the previous page",
+                    },
+                    "observation_counts": {
+                        "type": "boolean",
+                        "description": "Include the number of observations of each entity",
+                        "default": False,
+                    },
+                },
+                "required": ["entity_type"],
+            },
+        ),
+        types.Tool(
+            name="count_by_type",
+            description="Count the entities of each type in the knowledge graph, most common type first",
+            inputSchema={"type": "object", "properties": {}},
+        ),
+        types.Tool(
+            name="changes_since",
+            description="Get the entities and relations created or changed, and those deleted, after a revision, to keep a copy of the graph in sync. Pass revision 0 for everything, then the returned revision on the next call. Apply deleted_entities and deleted_relations before entities and relations. Call again from the returned revision while has_more is true",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "revision": {
+                        "type": "integer",
+                        "minimum": 0,
+                        "description": "The revision returned by the previous call, or 0",
+                        "default": 0,
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Maximum number of changes to return",
+                        "default": DEFAULT_CHANGES_LIMIT,
+                    },
+                    "observation_limit": OBSERVATION_LIMIT_PROPERTY,
+                },
+            },
+        ),
     ]
 
 
-def main():
-    logger.info("Server is starting up")
+def worker_count(transport: str = MCP_TRANSPORT) -> int:
+    """
+    The uvicorn workers to run: MCP_WORKERS, except for SSE, whose sessions
+    live in one process, and SQLite, whose calls run on the event loop and
+    would stall it for up to the busy timeout while workers contend for the
+    write lock.
+    """
+    if transport == "sse" or MEMORY_BACKEND == "sqlite":
+        return 1
+    return MCP_WORKERS
 
-    client = MongoClient(MONGO_URI)
-    db = client[DATABASE_NAME]
 
-    if ENTITIES_COLLECTION not in db.list_collection_names():
-        logger.info("Creating entities collection")
-        db.create_collection(ENTITIES_COLLECTION)
+def create_app(transport: str = MCP_TRANSPORT):
+    """
+    The Starlette app serving the sse or streamable-http transport.
 
-    if RELATIONS_COLLECTION not in db.list_collection_names():
-        logger.info("Creating relations collection")
-        db.create_collection(RELATIONS_COLLECTION)
+    SSE sessions live in the memory of the process that opened them, so the
+    sse app must run as a single worker. The streamable-http app is
+    stateless: every request carries everything needed to handle it, so any
+    number of workers or replicas can serve it behind a plain load balancer.
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Mount, Route
+
+    manager.shared_storage = worker_count(transport) > 1
+
+    async def handle_health(request):
+        return PlainTextResponse("ok")
+
+    async def handle_ready(request):
+        try:
+            await manager.storage.ping()
+        except Exception as e:
+            logger.warning(f"Not ready: {e}")
+            return PlainTextResponse("not ready", status_code=503)
+        return PlainTextResponse("ready")
+
+    routes = [
+        Route("/healthz", endpoint=handle_health),
+        Route("/readyz", endpoint=handle_ready),
+        Route("/metrics", endpoint=handle_metrics),
+    ]
 
-    transport = "sse"
     if transport == "sse":
         logger.info("Using SSE transport")
         from mcp.server.sse import SseServerTransport
-        from starlette.applications import Starlette
-        from starlette.routing import Mount, Route
 
         sse = SseServerTransport("/messages/")
 
         async def handle_sse(request):
-            async with sse.connect_sse(
-                request.scope, request.receive, request._send
-            ) as streams:
-                await server.run(
-                    streams[0], streams[1], server.create_initialization_options()
-                )
-
-        starlette_app = Starlette(
-            debug=True,
-            routes=[
-                Route("/sse", endpoint=handle_sse),
-                Mount("/messages/", app=sse.handle_post_message),
-            ],
+            with SSE_SESSIONS.track_inprogress():
+                async with sse.connect_sse(
+                    request.scope, request.receive, request._send
+                ) as streams:
+                    await server.run(
+                        streams[0], streams[1], server.create_initialization_options()
+                    )
+
+        routes += [
+            Route("/sse", endpoint=handle_sse),
+            Mount("/messages/", app=sse.handle_post_message),
+        ]
+        serve = nullcontext
+    elif transport == "streamable-http":
+        logger.info("Using stateless streamable HTTP transport")
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        session_manager = StreamableHTTPSessionManager(
+            app=server, stateless=True, json_response=True
         )
 
+        async def handle_streamable_http(scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+
+        routes.append(Mount("/mcp", app=handle_streamable_http))
+        serve = session_manager.run
+    else:
+        raise Exception(f"Unknown transport: {transport}")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await manager.setup()
+        lag_monitor = asyncio.create_task(monitor_event_loop())
+        try:
+            async with serve():
+                yield
+        finally:
+            lag_monitor.cancel()
+            await manager.close()
+
+    # from fastapi import HTTPException, Request
+    # async def validate_bearer_token(request: Request):
+    #     auth_header = request.headers.get("Authorization")
+    #     if auth_header is None or not auth_header.startswith("Bearer "):
+    #         raise HTTPException(status_code=401, detail="Invalid or missing token")
+    #     token = auth_header.split(" ")[1]
+    #     # Add your token validation logic here
+    #     if token != "your_expected_token":
+    #         raise HTTPException(status_code=401, detail="Invalid token")
+    # starlette_app.add_middleware(validate_bearer_token)
+    return Starlette(debug=True, lifespan=lifespan, routes=routes)
+
+
+def main():
+    logger.info("Server is starting up")
+
+    if MCP_TRANSPORT != "stdio":
         import uvicorn
 
-        # from fastapi import HTTPException, Request
-        # async def validate_bearer_token(request: Request):
-        #     auth_header = request.headers.get("Authorization")
-        #     if auth_header is None or not auth_header.startswith("Bearer "):
-        #         raise HTTPException(status_code=401, detail="Invalid or missing token")
-        #     token = auth_header.split(" ")[1]
-        #     # Add your token validation logic here
-        #     if token != "your_expected_token":
-        #         raise HTTPException(status_code=401, detail="Invalid token")
-        # starlette_app.add_middleware(validate_bearer_token)
+        workers = worker_count()
+        if MCP_WORKERS > 1 and workers == 1:
+            if MCP_TRANSPORT == "sse":
+                logger.warning(
+                    "SSE sessions cannot be shared between workers, running one "
+                    "worker. Use MCP_TRANSPORT=streamable-http to run several"
+                )
+            else:
+                logger.warning(
+                    "SQLite writes from several workers would block each other's "
+                    "event loops, running one worker. Use the mongo backend to run "
+                    "several"
+                )
+        if workers > 1 and MEMORY_SEMANTIC_SEARCH:
+            logger.warning(
+                "Each worker keeps its own semantic index and only sees its own "
+                "writes until restarted"
+            )
+        if workers > 1 and MEMORY_CACHE:
+            logger.warning(
+                "Each worker keeps its own graph cache, which follows the other "
+                "workers' writes only through a replica set change stream; "
+                "without one it is disabled"
+            )
+        if workers > 1 and MEMORY_WRITE_BUFFER:
+            logger.warning(
+                "Each worker buffers its own writes, so writes sent to different "
+                "workers are not ordered against each other"
+            )
         port = os.environ.get("SSE_PORT", 8000)
-        logger.info(f"Starting uvicorn on port {port}")
-        uvicorn.run(starlette_app, host="0.0.0.0", port=int(port))
+        logger.info(f"Starting uvicorn on port {port} with {workers} workers")
+        uvicorn.run(
+            "mcp_memory.server:create_app",
+            factory=True,
+            host="0.0.0.0",
+            port=int(port),
+            workers=workers,
+        )
     else:
         logger.info("Using stdio transport")
         from mcp.server.stdio import stdio_server
 
         async def arun():
-            async with stdio_server() as streams:
-                await server.run(
-                    streams[0], streams[1], server.create_initialization_options()
-                )
+            await manager.setup()
+            try:
+                async with stdio_server() as streams:
+                    await server.run(
+                        streams[0], streams[1], server.create_initialization_options()
+                    )
+            finally:
+                await manager.close()
 
         anyio.run(arun)
 
     return 0
 
 
+def migrate_observations():
+    """Move embedded observations into the separate observations collection."""
+    logger.info("Migrating observations to the observations collection")
+
+    async def arun():
+        from .mongo_storage import MongoStorage
+
+        storage = MongoStorage(observation_storage="collection")
+        await storage.setup()
+        try:
+            await storage.migrate_observations()
+        finally:
+            await storage.close()
+
+    anyio.run(arun)
+
+    return 0
+
+
 # if __name__ == "__main__":
 #     mcp.run(transport="sse")
@@ -0,0 +1,743 @@
+import heapq
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from .cache import tokenize
+from .storage import KnowledgeGraphStorage
+
+load_dotenv()
+
+SQLITE_PATH = os.environ.get("MEMORY_SQLITE_PATH", "memory.db")
+
+logger = logging.getLogger("mcp_memory")
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    entity_type TEXT NOT NULL,
+    degree INTEGER NOT NULL DEFAULT 0,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entities_revision ON entities (revision);
+CREATE INDEX IF NOT EXISTS entities_type_name ON entities (entity_type, name);
+
+CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY,
+    from_entity TEXT NOT NULL,
+    to_entity TEXT NOT NULL,
+    relation_type TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (from_entity, to_entity, relation_type)
+);
+CREATE INDEX IF NOT EXISTS relations_to_entity ON relations (to_entity);
+CREATE INDEX IF NOT EXISTS relations_revision ON relations (revision);
+
+-- The last revision handed out. Every change to an entity or relation takes
+-- the next one; deletions leave a tombstone carrying theirs.
+CREATE TABLE IF NOT EXISTS revision (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO revision (id, value) VALUES (0, 0);
+CREATE TABLE IF NOT EXISTS tombstones (
+    revision INTEGER PRIMARY KEY,
+    name TEXT,
+    from_entity TEXT,
+    to_entity TEXT,
+    relation_type TEXT
+);
+
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    entity_name TEXT NOT NULL REFERENCES entities (name) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE (entity_name, content)
+);
+CREATE INDEX IF NOT EXISTS observations_entity_latest ON observations (entity_name, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS entities_fts USING fts5(
+    name, entity_type, content='entities', content_rowid='id',
+    tokenize='porter unicode61'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS observations_fts USING fts5(
+    content, content='observations', content_rowid='id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS entities_fts_insert AFTER INSERT ON entities BEGIN
+    INSERT INTO entities_fts (rowid, name, entity_type)
+    VALUES (new.id, new.name, new.entity_type);
+END;
+CREATE TRIGGER IF NOT EXISTS entities_fts_delete AFTER DELETE ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, name, entity_type)
+    VALUES ('delete', old.id, old.name, old.entity_type);
+END;
+-- An entity's degree counts the relations touching it, including relations
+-- created before the entity itself.
+CREATE TRIGGER IF NOT EXISTS entities_degree_insert AFTER INSERT ON entities BEGIN
+    UPDATE entities SET degree =
+        (SELECT COUNT(*) FROM relations WHERE from_entity = new.name)
+        + (SELECT COUNT(*) FROM relations WHERE to_entity = new.name)
+    WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS relations_degree_insert AFTER INSERT ON relations BEGIN
+    UPDATE entities SET degree = degree + 1 WHERE name = new.from_entity;
+    UPDATE entities SET degree = degree + 1 WHERE name = new.to_entity;
+END;
+CREATE TRIGGER IF NOT EXISTS relations_degree_delete AFTER DELETE ON relations BEGIN
+    UPDATE entities SET degree = degree - 1 WHERE name = old.from_entity;
+    UPDATE entities SET degree = degree - 1 WHERE name = old.to_entity;
+END;
+CREATE TRIGGER IF NOT EXISTS entities_revision_insert AFTER INSERT ON entities BEGIN
+    UPDATE revision SET value = value + 1;
+    UPDATE entities SET revision = (SELECT value FROM revision) WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS entities_revision_delete AFTER DELETE ON entities BEGIN
+    UPDATE revision SET value = value + 1;
+    INSERT INTO tombstones (revision, name)
+    VALUES ((SELECT value FROM revision), old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS relations_revision_insert AFTER INSERT ON relations BEGIN
+    UPDATE revision SET value = value + 1;
+    UPDATE relations SET revision = (SELECT value FROM revision) WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS relations_revision_delete AFTER DELETE ON relations BEGIN
+    UPDATE revision SET value = value + 1;
+    INSERT INTO tombstones (revision, from_entity, to_entity, relation_type)
+    VALUES ((SELECT value FROM revision), old.from_entity, old.to_entity, old.relation_type);
+END;
+-- Observations are part of their entity, so changing them revises the entity.
+CREATE TRIGGER IF NOT EXISTS observations_revision_insert AFTER INSERT ON observations BEGIN
+    UPDATE revision SET value = value + 1;
+    UPDATE entities SET revision = (SELECT value FROM revision)
+    WHERE name = new.entity_name;
+END;
+CREATE TRIGGER IF NOT EXISTS observations_revision_delete AFTER DELETE ON observations BEGIN
+    UPDATE revision SET value = value + 1;
+    UPDATE entities SET revision = (SELECT value FROM revision)
+    WHERE name = old.entity_name;
+END;
+CREATE TRIGGER IF NOT EXISTS observations_fts_insert AFTER INSERT ON observations BEGIN
+    INSERT INTO observations_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS observations_fts_delete AFTER DELETE ON observations BEGIN
+    INSERT INTO observations_fts (observations_fts, rowid, content)
+    VALUES ('delete', old.id, old.content);
+END;
+"""
+
+# Dropped for the duration of a bulk load and recreated by SCHEMA afterwards.
+# Only indexes that speed up reads: the triggers keep search, degrees and
+# revisions current for a server writing to the same file during the load, and
+# the degree trigger looks up relations_to_entity.
+BULK_LOAD_DROPS = """
+DROP INDEX IF EXISTS entities_type_name;
+DROP INDEX IF EXISTS observations_entity_latest;
+"""
+
+
+class SQLiteStorage(KnowledgeGraphStorage):
+    """
+    Single-file storage for local use, with no server to run.
+
+    Observations live in their own table and full-text search runs on FTS5
+    indexes kept in sync by triggers. Statements run on the event loop thread:
+    they are short, indexed and local, and running them inline keeps each
+    method a single uninterrupted step for concurrent tool calls.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            raise Exception("SQLite storage is not open")
+        return self._db
+
+    async def setup(self) -> None:
+        if self._db is None:
+            logger.info(f"Opening SQLite database {self.path}")
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+        columns = {
+            row["name"] for row in self._db.execute("PRAGMA table_info(entities)")
+        }
+        add_degrees = columns and "degree" not in columns
+        add_revisions = columns and "revision" not in columns
+        if add_degrees:
+            logger.info("Adding entity degrees")
+            self._db.execute(
+                "ALTER TABLE entities ADD COLUMN degree INTEGER NOT NULL DEFAULT 0"
+            )
+        if add_revisions:
+            logger.info("Adding revisions")
+            for table in ("entities", "relations"):
+                self._db.execute(
+                    f"ALTER TABLE {table} ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+                )
+        self._db.executescript(SCHEMA)
+        if add_degrees:
+            self.rebuild_degrees()
+        if add_revisions:
+            self.number_revisions()
+
+    def rebuild_degrees(self) -> None:
+        with self.db:
+            self.db.execute("""
+                UPDATE entities SET degree =
+                    (SELECT COUNT(*) FROM relations WHERE from_entity = entities.name)
+                    + (SELECT COUNT(*) FROM relations WHERE to_entity = entities.name)
+                """)
+
+    def number_revisions(self) -> None:
+        """Give every entity and relation written before revisions one of its own."""
+        with self.db:
+            for table in ("entities", "relations"):
+                self.db.execute(
+                    f"UPDATE {table} SET revision = "
+                    "(SELECT value FROM revision) + id WHERE revision = 0"
+                )
+                self.db.execute(
+                    "UPDATE revision SET value = "
+                    f"MAX(value, (SELECT COALESCE(MAX(revision), 0) FROM {table}))"
+                )
+
+    async def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def ping(self) -> None:
+        self.db.execute("SELECT 1")
+
+    async def snapshot(self, max_entities: int) -> tuple[list[dict], list[dict], int]:
+        total = self.db.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+        entities = [
+            dict(row)
+            for row in self.db.execute(
+                "SELECT name, entity_type FROM entities ORDER BY id LIMIT ?",
+                (max_entities,),
+            )
+        ]
+        relations = await self.read_relations()
+        return await self.with_observations(entities), relations, total
+
+    # Writes
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _insert_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str]:
+        created_at = self._now()
+        return [
+            content
+            for content in dict.fromkeys(observations)
+            if self.db.execute(
+                "INSERT OR IGNORE INTO observations (entity_name, content, created_at) "
+                "VALUES (?, ?, ?)",
+                (entity_name, content, created_at),
+            ).rowcount
+        ]
+
+    def _exists(self, entity_name: str) -> bool:
+        return (
+            self.db.execute(
+                "SELECT 1 FROM entities WHERE name = ?", (entity_name,)
+            ).fetchone()
+            is not None
+        )
+
+    async def create_entities(self, entities: list[dict]) -> list[dict]:
+        statuses = []
+        with self.db:
+            for entity in entities:
+                try:
+                    created = self.db.execute(
+                        "INSERT INTO entities (name, entity_type) VALUES (?, ?) "
+                        "ON CONFLICT (name) DO NOTHING",
+                        (entity["name"], entity["entity_type"]),
+                    ).rowcount
+                    if created:
+                        self._insert_observations(
+                            entity["name"], entity["observations"]
+                        )
+                except sqlite3.Error as e:
+                    statuses.append(
+                        {"name": entity["name"], "status": "error", "error": str(e)}
+                    )
+                    continue
+                statuses.append(
+                    {
+                        "name": entity["name"],
+                        "status": "created" if created else "skipped",
+                    }
+                )
+        return statuses
+
+    async def create_relations(self, relations: list[dict]) -> list[dict]:
+        statuses = []
+        with self.db:
+            for relation in relations:
+                try:
+                    created = self.db.execute(
+                        "INSERT INTO relations (from_entity, to_entity, relation_type) "
+                        "VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+                        (
+                            relation["from_entity"],
+                            relation["to_entity"],
+                            relation["relation_type"],
+                        ),
+                    ).rowcount
+                except sqlite3.Error as e:
+                    statuses.append({**relation, "status": "error", "error": str(e)})
+                    continue
+                statuses.append(
+                    {**relation, "status": "created" if created else "skipped"}
+                )
+        return statuses
+
+    async def add_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        with self.db:
+            if not self._exists(entity_name):
+                return None
+            return self._insert_observations(entity_name, observations)
+
+    async def add_observations_batch(self, additions: list[dict]) -> list[dict]:
+        statuses = []
+        with self.db:
+            for addition in additions:
+                if not self._exists(addition["entity_name"]):
+                    statuses.append(
+                        {"entity_name": addition["entity_name"], "status": "not_found"}
+                    )
+                    continue
+                added = self._insert_observations(
+                    addition["entity_name"], addition["observations"]
+                )
+                statuses.append(
+                    {
+                        "entity_name": addition["entity_name"],
+                        "status": "updated" if added else "unchanged",
+                        "added_observations": added,
+                    }
+                )
+        return statuses
+
+    # Bulk loading
+
+    async def begin_bulk_load(self) -> None:
+        self.db.executescript(BULK_LOAD_DROPS)
+
+    async def load_entities(self, entities: list[dict]) -> int:
+        created_at = self._now()
+        inserted = 0
+        with self.db:
+            for entity in entities:
+                if not self.db.execute(
+                    "INSERT OR IGNORE INTO entities (name, entity_type) VALUES (?, ?)",
+                    (entity["name"], entity["entity_type"]),
+                ).rowcount:
+                    continue
+                inserted += 1
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO observations (entity_name, content, created_at) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (entity["name"], content, created_at)
+                        for content in entity["observations"]
+                    ],
+                )
+        return inserted
+
+    async def load_relations(self, relations: list[dict]) -> int:
+        # The rowcount leaves out the rows the triggers change.
+        with self.db:
+            return self.db.executemany(
+                "INSERT OR IGNORE INTO relations (from_entity, to_entity, relation_type) "
+                "VALUES (?, ?, ?)",
+                [
+                    (
+                        relation["from_entity"],
+                        relation["to_entity"],
+                        relation["relation_type"],
+                    )
+                    for relation in relations
+                ],
+            ).rowcount
+
+    async def end_bulk_load(self) -> None:
+        self.db.executescript(SCHEMA)
+
+    async def delete_entities(self, entity_names: list[str]) -> None:
+        names = json.dumps(entity_names)
+        with self.db:
+            # Observations go with their entity through the foreign key.
+            self.db.execute(
+                "DELETE FROM entities WHERE name IN (SELECT value FROM json_each(?))",
+                (names,),
+            )
+            self.db.execute(
+                "DELETE FROM relations "
+                "WHERE from_entity IN (SELECT value FROM json_each(?)) "
+                "OR to_entity IN (SELECT value FROM json_each(?))",
+                (names, names),
+            )
+
+    async def delete_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        with self.db:
+            if not self._exists(entity_name):
+                return None
+            return [
+                content
+                for content in observations
+                if self.db.execute(
+                    "DELETE FROM observations WHERE entity_name = ? AND content = ?",
+                    (entity_name, content),
+                ).rowcount
+            ]
+
+    async def delete_relation(self, relation: dict) -> None:
+        with self.db:
+            self.db.execute(
+                "DELETE FROM relations "
+                "WHERE from_entity = ? AND to_entity = ? AND relation_type = ?",
+                (
+                    relation["from_entity"],
+                    relation["to_entity"],
+                    relation["relation_type"],
+                ),
+            )
+
+    # Reads
+
+    async def with_observations(
+        self, documents: list[dict], limit: int | None = None
+    ) -> list[dict]:
+        if not documents:
+            return documents
+        observations = {document["name"]: [] for document in documents}
+        for row in self.db.execute(
+            """
+            SELECT entity_name, content FROM (
+                SELECT entity_name, content, id, ROW_NUMBER() OVER (
+                    PARTITION BY entity_name ORDER BY id DESC
+                ) AS position
+                FROM observations
+                WHERE entity_name IN (SELECT value FROM json_each(?))
+            )
+            WHERE ? IS NULL OR position <= ?
+            ORDER BY id
+            """,
+            (json.dumps(list(observations)), limit, limit),
+        ):
+            observations[row["entity_name"]].append(row["content"])
+        return [
+            {**document, "observations": observations[document["name"]]}
+            for document in documents
+        ]
+
+    @staticmethod
+    def _parse_after(after: str | None) -> int:
+        if after is None:
+            return 0
+        try:
+            return int(after)
+        except (ValueError, TypeError):
+            raise Exception(f"Invalid cursor position: {after}")
+
+    async def read_entities(
+        self, fields: list[str], after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        documents = []
+        for row in self.db.execute(
+            "SELECT id, name, entity_type FROM entities WHERE id > ? ORDER BY id LIMIT ?",
+            (self._parse_after(after), -1 if limit is None else limit),
+        ):
+            item = {
+                field: row[field]
+                for field in fields
+                if field in ("name", "entity_type")
+            }
+            if limit is not None:
+                item["_id"] = row["id"]
+            documents.append(item)
+        return documents
+
+    async def read_relations(
+        self, after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        documents = []
+        for row in self.db.execute(
+            "SELECT id, from_entity, to_entity, relation_type FROM relations "
+            "WHERE id > ? ORDER BY id LIMIT ?",
+            (self._parse_after(after), -1 if limit is None else limit),
+        ):
+            item = {
+                "from_entity": row["from_entity"],
+                "to_entity": row["to_entity"],
+                "relation_type": row["relation_type"],
+            }
+            if limit is not None:
+                item["_id"] = row["id"]
+            documents.append(item)
+        return documents
+
+    async def summarize_graph(self) -> dict:
+        entity_types = await self.count_entity_types()
+        relation_types = dict(
+            self.db.execute(
+                "SELECT relation_type, COUNT(*) FROM relations GROUP BY relation_type"
+            ).fetchall()
+        )
+        return {
+            "entity_count": sum(entity_types.values()),
+            "relation_count": sum(relation_types.values()),
+            "entity_types": entity_types,
+            "relation_types": relation_types,
+        }
+
+    async def get_entities(self, entity_names: list[str]) -> list[dict]:
+        return [
+            dict(row)
+            for row in self.db.execute(
+                "SELECT name, entity_type, degree FROM entities "
+                "WHERE name IN (SELECT value FROM json_each(?))",
+                (json.dumps(entity_names),),
+            )
+        ]
+
+    async def list_by_type(
+        self,
+        entity_type: str,
+        after: str | None,
+        limit: int,
+        observation_counts: bool = False,
+    ) -> list[dict]:
+        """Observations are counted off the (entity_name, content) unique index."""
+        count = (
+            ", (SELECT COUNT(*) FROM observations o WHERE o.entity_name = e.name) "
+            "AS observation_count"
+            if observation_counts
+            else ""
+        )
+        return [
+            dict(row)
+            for row in self.db.execute(
+                f"SELECT e.name{count} FROM entities e "
+                "WHERE e.entity_type = ? AND e.name > ? ORDER BY e.name LIMIT ?",
+                (entity_type, after or "", limit),
+            )
+        ]
+
+    async def count_entity_types(self) -> dict[str, int]:
+        return dict(
+            self.db.execute(
+                "SELECT entity_type, COUNT(*) FROM entities GROUP BY entity_type"
+            ).fetchall()
+        )
+
+    async def search_text(self, query: str, limit: int) -> list[dict]:
+        """
+        Ranks by bm25 with the same field weights as the MongoDB text index:
+        an entity's own match plus its best matching observation.
+        """
+        tokens = dict.fromkeys(tokenize(query))
+        if not tokens:
+            return []
+        match = " OR ".join(f'"{token}"' for token in tokens)
+        return [
+            dict(row)
+            for row in self.db.execute(
+                """
+                WITH entity_hits AS MATERIALIZED (
+                    SELECT rowid, -bm25(entities_fts, 10.0, 5.0) AS score
+                    FROM entities_fts WHERE entities_fts MATCH :match
+                ),
+                observation_hits AS MATERIALIZED (
+                    SELECT rowid, -bm25(observations_fts) AS score
+                    FROM observations_fts WHERE observations_fts MATCH :match
+                )
+                SELECT e.name, e.entity_type, e.degree, SUM(matches.score) AS score
+                FROM (
+                    SELECT e.name AS name, entity_hits.score AS score
+                    FROM entity_hits JOIN entities e ON e.id = entity_hits.rowid
+                    UNION ALL
+                    SELECT o.entity_name, MAX(observation_hits.score)
+                    FROM observation_hits
+                    JOIN observations o ON o.id = observation_hits.rowid
+                    GROUP BY o.entity_name
+                ) AS matches
+                JOIN entities e ON e.name = matches.name
+                GROUP BY e.name
+                ORDER BY score DESC
+                LIMIT :limit
+                """,
+                {"match": match, "limit": limit},
+            )
+        ]
+
+    async def search_substring(self, query: str, limit: int) -> list[dict]:
+        pattern = "%{}%".format(
+            query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        return [
+            dict(row)
+            for row in self.db.execute(
+                r"""
+                SELECT name, entity_type, degree FROM entities e
+                WHERE name LIKE :pattern ESCAPE '\'
+                OR entity_type LIKE :pattern ESCAPE '\'
+                OR EXISTS (
+                    SELECT 1 FROM observations o
+                    WHERE o.entity_name = e.name AND o.content LIKE :pattern ESCAPE '\'
+                )
+                ORDER BY degree DESC, id
+                LIMIT :limit
+                """,
+                {"pattern": pattern, "limit": limit},
+            )
+        ]
+
+    async def relations_among(self, entity_names: list[str]) -> list[dict]:
+        names = json.dumps(entity_names)
+        return [
+            dict(row)
+            for row in self.db.execute(
+                "SELECT from_entity, to_entity, relation_type FROM relations "
+                "WHERE from_entity IN (SELECT value FROM json_each(?)) "
+                "AND to_entity IN (SELECT value FROM json_each(?))",
+                (names, names),
+            )
+        ]
+
+    async def relations_touching(self, entity_names: list[str]) -> list[dict]:
+        names = json.dumps(entity_names)
+        return [
+            dict(row)
+            for row in self.db.execute(
+                "SELECT from_entity, to_entity, relation_type FROM relations "
+                "WHERE from_entity IN (SELECT value FROM json_each(?)) "
+                "OR to_entity IN (SELECT value FROM json_each(?))",
+                (names, names),
+            )
+        ]
+
+    async def open_nodes(
+        self, entity_names: list[str]
+    ) -> tuple[list[dict], list[dict]]:
+        documents = await self.get_entities(entity_names)
+        return documents, await self.relations_touching(
+            [document["name"] for document in documents]
+        )
+
+    async def neighborhood(
+        self,
+        start: list[str],
+        max_depth: int,
+        direction: str,
+        relation_types: list[str] | None,
+    ) -> tuple[list[dict], list[dict]]:
+        """The relations are walked by a single recursive query."""
+        if direction == "outgoing":
+            near_field, far_field = "from_entity", "to_entity"
+        else:
+            near_field, far_field = "to_entity", "from_entity"
+
+        documents = await self.get_entities(start)
+        types = json.dumps(relation_types) if relation_types else None
+        edges = [
+            dict(row)
+            for row in self.db.execute(
+                f"""
+                WITH RECURSIVE walk (id, node, depth) AS (
+                    SELECT r.id, r.{far_field}, 0 FROM relations r
+                    WHERE r.{near_field} IN (SELECT value FROM json_each(:start))
+                    AND (:types IS NULL
+                        OR r.relation_type IN (SELECT value FROM json_each(:types)))
+                    UNION
+                    SELECT r.id, r.{far_field}, walk.depth + 1
+                    FROM walk JOIN relations r ON r.{near_field} = walk.node
+                    WHERE walk.depth + 1 < :max_depth
+                    AND (:types IS NULL
+                        OR r.relation_type IN (SELECT value FROM json_each(:types)))
+                )
+                SELECT r.id AS _id, r.from_entity, r.to_entity, r.relation_type,
+                    MIN(walk.depth) AS depth
+                FROM walk JOIN relations r ON r.id = walk.id
+                GROUP BY r.id
+                """,
+                {
+                    "start": json.dumps([document["name"] for document in documents]),
+                    "types": types,
+                    "max_depth": max_depth,
+                },
+            )
+        ]
+        return documents, edges
+
+    async def changes_since(self, revision: int, limit: int) -> tuple[list[dict], int]:
+        [current] = self.db.execute("SELECT value FROM revision").fetchone()
+        entities = (
+            {"revision": row["revision"], "entity": dict(row)}
+            for row in self.db.execute(
+                "SELECT revision, name, entity_type FROM entities "
+                "WHERE revision > ? ORDER BY revision LIMIT ?",
+                (revision, limit),
+            )
+        )
+        relations = (
+            {"revision": row["revision"], "relation": dict(row)}
+            for row in self.db.execute(
+                "SELECT revision, from_entity, to_entity, relation_type FROM relations "
+                "WHERE revision > ? ORDER BY revision LIMIT ?",
+                (revision, limit),
+            )
+        )
+        tombstones = (
+            (
+                {"revision": row["revision"], "deleted_entity": row["name"]}
+                if row["name"] is not None
+                else {
+                    "revision": row["revision"],
+                    "deleted_relation": {
+                        "from_entity": row["from_entity"],
+                        "to_entity": row["to_entity"],
+                        "relation_type": row["relation_type"],
+                    },
+                }
+            )
+            for row in self.db.execute(
+                "SELECT * FROM tombstones WHERE revision > ? ORDER BY revision LIMIT ?",
+                (revision, limit),
+            )
+        )
+        changes = list(
+            heapq.merge(
+                entities, relations, tombstones, key=lambda change: change["revision"]
+            )
+        )[:limit]
+        for change in changes:
+            for document in (change.get("entity"), change.get("relation")):
+                if document is not None:
+                    del document["revision"]
+        return changes, current
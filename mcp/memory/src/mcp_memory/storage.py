@@ -0,0 +1,197 @@
+from typing import Awaitable, Callable
+
+ENTITY_FIELDS = ["name", "entity_type", "observations"]
+RELATION_FIELDS = ["from_entity", "to_entity", "relation_type"]
+
+
+class KnowledgeGraphStorage:
+    """
+    The database behind KnowledgeGraphManager.
+
+    Entities and relations are exchanged as plain dicts shaped like
+    ``Entity.to_dict()`` and ``Relation.to_dict()``. Entity documents returned
+    by reads may lack their observations; pass them through
+    ``with_observations`` before use. Documents returned by paged reads carry
+    an ``_id`` whose string form is the position to resume after.
+
+    Write methods report per-item statuses the way the batch tools do:
+    ``created`` or ``skipped`` for entities and relations, ``updated`` or
+    ``not_found`` for observation adds.
+
+    Every write to an entity (including its observations) or a relation
+    gives it the next revision of a graph-wide counter, and every deletion
+    leaves a tombstone with one, which is what ``changes_since`` reads.
+    """
+
+    # Whether the in-process graph cache can be kept in sync with this storage.
+    cacheable = True
+
+    async def setup(self) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        raise NotImplementedError
+
+    async def ping(self) -> None:
+        """Raise unless the database is reachable; backs the readiness check."""
+        raise NotImplementedError
+
+    async def watch(
+        self,
+        on_change: Callable[[dict], None],
+        on_reset: Callable[[], Awaitable[None]],
+    ) -> None:
+        """
+        Call ``on_reset`` once the cache should be (re)loaded and ``on_change``
+        for every change made by another process.
+
+        Storages without a change feed only see this process's writes, so they
+        just load the cache once.
+        """
+        await on_reset()
+
+    async def snapshot(self, max_entities: int) -> tuple[list[dict], list[dict], int]:
+        """Up to max_entities entities with observations, all relations, and the entity count."""
+        raise NotImplementedError
+
+    # Writes
+
+    async def create_entities(self, entities: list[dict]) -> list[dict]:
+        raise NotImplementedError
+
+    async def create_relations(self, relations: list[dict]) -> list[dict]:
+        raise NotImplementedError
+
+    async def add_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        """Add observations, returning the new ones, or None if the entity does not exist."""
+        raise NotImplementedError
+
+    async def add_observations_batch(self, additions: list[dict]) -> list[dict]:
+        """
+        A status per addition: "not_found", or "updated" or "unchanged" with
+        the observations that were new as ``added_observations``. An
+        observation requested twice for the same entity is reported once.
+        """
+        raise NotImplementedError
+
+    async def delete_entities(self, entity_names: list[str]) -> None:
+        raise NotImplementedError
+
+    async def delete_observations(
+        self, entity_name: str, observations: list[str]
+    ) -> list[str] | None:
+        """Delete observations, returning the removed ones, or None if the entity does not exist."""
+        raise NotImplementedError
+
+    async def delete_relation(self, relation: dict) -> None:
+        raise NotImplementedError
+
+    # Bulk loading
+
+    async def begin_bulk_load(self) -> None:
+        """Drop the indexes and triggers that slow inserts down until end_bulk_load."""
+        raise NotImplementedError
+
+    async def load_entities(self, entities: list[dict]) -> int:
+        """Insert entities without per-item statuses, skipping existing names; returns the count inserted."""
+        raise NotImplementedError
+
+    async def load_relations(self, relations: list[dict]) -> int:
+        """Insert relations without per-item statuses, skipping existing ones; returns the count inserted."""
+        raise NotImplementedError
+
+    async def end_bulk_load(self) -> None:
+        """Rebuild the indexes, search indexes and degrees over everything loaded."""
+        raise NotImplementedError
+
+    # Reads
+
+    async def with_observations(
+        self, documents: list[dict], limit: int | None = None
+    ) -> list[dict]:
+        """Entity documents with at most their latest ``limit`` observations, oldest first."""
+        raise NotImplementedError
+
+    async def read_entities(
+        self, fields: list[str], after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        """Entities in storage order; paged when limit is given."""
+        raise NotImplementedError
+
+    async def read_relations(
+        self, after: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        """Relations in storage order; paged when limit is given."""
+        raise NotImplementedError
+
+    async def summarize_graph(self) -> dict:
+        raise NotImplementedError
+
+    async def get_entities(self, entity_names: list[str]) -> list[dict]:
+        """The named entities, each carrying its ``degree``."""
+        raise NotImplementedError
+
+    async def list_by_type(
+        self,
+        entity_type: str,
+        after: str | None,
+        limit: int,
+        observation_counts: bool = False,
+    ) -> list[dict]:
+        """
+        Up to limit names of entities of a type, in name order after the
+        ``after`` name, read off the (entity_type, name) index. Each carries
+        its ``observation_count`` when asked.
+        """
+        raise NotImplementedError
+
+    async def count_entity_types(self) -> dict[str, int]:
+        """The number of entities of each type, counted off the same index."""
+        raise NotImplementedError
+
+    async def search_text(self, query: str, limit: int) -> list[dict]:
+        """
+        Entities ranked by full-text relevance, each carrying its match
+        ``score`` and its ``degree``, the number of relations touching it.
+        """
+        raise NotImplementedError
+
+    async def search_substring(self, query: str, limit: int) -> list[dict]:
+        """Matching entities, highest degree first, each carrying its ``degree``."""
+        raise NotImplementedError
+
+    async def relations_among(self, entity_names: list[str]) -> list[dict]:
+        """Relations with both ends among the named entities."""
+        raise NotImplementedError
+
+    async def open_nodes(
+        self, entity_names: list[str]
+    ) -> tuple[list[dict], list[dict]]:
+        """The named entities and every relation touching them."""
+        raise NotImplementedError
+
+    async def neighborhood(
+        self,
+        start: list[str],
+        max_depth: int,
+        direction: str,
+        relation_types: list[str] | None,
+    ) -> tuple[list[dict], list[dict]]:
+        """
+        The start entities, and every relation reachable from them within
+        max_depth hops. Each relation carries its ``depth``, 0 for the first hop.
+        """
+        raise NotImplementedError
+
+    async def changes_since(self, revision: int, limit: int) -> tuple[list[dict], int]:
+        """
+        Up to limit changes made after revision, oldest first, and the revision
+        everything up to is included. Each change carries its ``revision`` and
+        one of ``entity`` (an entity document without observations),
+        ``relation``, ``deleted_entity`` (a name) or ``deleted_relation``. An
+        entity or relation written several times appears once, at its latest
+        revision.
+        """
+        raise NotImplementedError
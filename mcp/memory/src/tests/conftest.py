@@ -0,0 +1,19 @@
+import pytest
+from mcp_memory.mongo_storage import MONGO_URI
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+
+@pytest.fixture(scope="session")
+def mongo_client():
+    """A client for the MongoDB at MONGO_URI, skipping the test if it is down."""
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"MongoDB is not reachable at {MONGO_URI}")
+
+    yield client
+
+    client.close()
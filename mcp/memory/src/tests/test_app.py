@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import mcp_memory.server
+import pytest
+from mcp_memory.cache import GraphCache
+from mcp_memory.sqlite_storage import SQLiteStorage
+from starlette.testclient import TestClient
+
+HEADERS = {"Accept": "application/json, text/event-stream"}
+
+
+@pytest.fixture(scope="function")
+def setup_manager(tmp_path, monkeypatch):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db"))
+    )
+    monkeypatch.setattr(mcp_memory.server, "manager", manager)
+    return manager
+
+
+def call_tool(client, request_id, name, arguments):
+    response = client.post(
+        "/mcp/",
+        headers=HEADERS,
+        json={
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "tools/call",
+            "params": {"name": name, "arguments": arguments},
+        },
+    )
+    assert response.status_code == 200
+    return json.loads(response.json()["result"]["content"][0]["text"])
+
+
+@pytest.mark.usefixtures("setup_manager")
+def test_streamable_http():
+    app = mcp_memory.server.create_app("streamable-http")
+
+    with TestClient(app) as client:
+        health = client.get("/healthz")
+        ready = client.get("/readyz")
+        created = call_tool(
+            client,
+            1,
+            "create_entities",
+            {"entities": [{"name": "a", "entity_type": "t", "observations": []}]},
+        )
+        summary = call_tool(client, 2, "read_graph", {"mode": "summary"})
+
+    assert health.status_code == 200
+    assert ready.status_code == 200
+    assert created == [{"name": "a", "status": "created"}]
+    assert summary["entity_count"] == 1
+
+
+def test_worker_count(monkeypatch):
+    monkeypatch.setattr(mcp_memory.server, "MCP_WORKERS", 4)
+    monkeypatch.setattr(mcp_memory.server, "MEMORY_BACKEND", "mongo")
+    streamable = mcp_memory.server.worker_count("streamable-http")
+    sse = mcp_memory.server.worker_count("sse")
+    monkeypatch.setattr(mcp_memory.server, "MEMORY_BACKEND", "sqlite")
+    sqlite = mcp_memory.server.worker_count("streamable-http")
+
+    assert (streamable, sse, sqlite) == (4, 1, 1)
+
+
+def test_shared_cache_without_change_stream(tmp_path):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db")), cache=GraphCache(100)
+    )
+    manager.shared_storage = True
+
+    async def watch():
+        await manager.setup()
+        await manager._watch_task
+        await manager.close()
+
+    asyncio.run(watch())
+
+    assert manager.cache is None
+
+
+@pytest.mark.usefixtures("setup_manager")
+def test_not_ready():
+    app = mcp_memory.server.create_app("sse")
+
+    with TestClient(app) as client:
+        mcp_memory.server.manager.storage._db.close()
+        mcp_memory.server.manager.storage._db = None
+        ready = client.get("/readyz")
+        health = client.get("/healthz")
+
+    assert ready.status_code == 503
+    assert health.status_code == 200
@@ -0,0 +1,30 @@
+import asyncio
+
+from benchmarks.graph import generate_graph
+from benchmarks.run import benchmark, report
+from mcp_memory import server
+
+
+def test_generate_graph():
+    entities, relations = generate_graph(entities=20, observations=3, fanout=2, seed=1)
+
+    assert len(entities) == 20
+    assert all(len(entity["observations"]) <= 3 for entity in entities)
+    assert all(
+        relation["from_entity"] != relation["to_entity"] for relation in relations
+    )
+    assert (entities, relations) == generate_graph(
+        entities=20, observations=3, fanout=2, seed=1
+    )
+
+
+def test_benchmark():
+    results = asyncio.run(benchmark(entities=50, iterations=5))
+    tools = {label.split(":")[0] for label in results["tools"]}
+
+    assert tools == {tool.name for tool in server.list_tools_sync()}
+    assert all(
+        stats["calls"] > 0 and stats["p50_ms"] <= stats["p99_ms"]
+        for stats in results["tools"].values()
+    )
+    assert len(report(results, results)) == len(results["tools"]) + 1
@@ -0,0 +1,178 @@
+import asyncio
+from collections import Counter
+
+import mcp_memory.server
+import pytest
+from mcp_memory.buffer import BufferedStorage
+from mcp_memory.sqlite_storage import SQLiteStorage
+
+
+class CountingStorage(SQLiteStorage):
+    """Counts the write calls that reach the database."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.calls = Counter()
+
+    async def create_entities(self, entities):
+        self.calls["create_entities"] += 1
+        return await super().create_entities(entities)
+
+    async def create_relations(self, relations):
+        self.calls["create_relations"] += 1
+        return await super().create_relations(relations)
+
+    async def add_observations(self, entity_name, observations):
+        self.calls["add_observations"] += 1
+        return await super().add_observations(entity_name, observations)
+
+
+@pytest.fixture(scope="function")
+def setup_manager(tmp_path):
+    storage = CountingStorage(str(tmp_path / "memory.db"))
+    manager = mcp_memory.server.KnowledgeGraphManager(BufferedStorage(storage, 0.05))
+    asyncio.run(manager.setup())
+
+    yield manager, storage
+
+    asyncio.run(manager.close())
+
+
+def test_coalesced_writes(setup_manager):
+    manager, storage = setup_manager
+
+    async def burst():
+        created = await asyncio.gather(
+            *(
+                manager.create_entity(
+                    {"name": f"entity{i}", "entity_type": "tool", "observations": []}
+                )
+                for i in range(5)
+            ),
+            manager.create_entity(
+                {"name": "entity0", "entity_type": "job", "observations": []}
+            ),
+            manager.create_relation(
+                {
+                    "from_entity": "entity0",
+                    "to_entity": "entity1",
+                    "relation_type": "uses",
+                }
+            ),
+        )
+        added = await asyncio.gather(
+            *(
+                manager.add_observations(
+                    {"entity_name": "entity0", "observations": [f"fact{i}", "shared"]}
+                )
+                for i in range(3)
+            ),
+            manager.add_observations(
+                {"entity_name": "missing", "observations": ["fact"]}
+            ),
+            return_exceptions=True,
+        )
+        graph = await manager.open_nodes(["entity0"])
+        return created, added, graph
+
+    created, added, graph = asyncio.run(burst())
+
+    assert [entity and entity.entity_type for entity in created[:6]] == [
+        "tool",
+        "tool",
+        "tool",
+        "tool",
+        "tool",
+        None,
+    ]
+    assert created[6].relation_type == "uses"
+    assert [result["added_observations"] for result in added[:3]] == [
+        ["fact0", "shared"],
+        ["fact1"],
+        ["fact2"],
+    ]
+    assert "not found" in str(added[3])
+    assert graph["entities"][0]["observations"] == ["fact0", "shared", "fact1", "fact2"]
+    assert storage.calls == {
+        "create_entities": 1,
+        "create_relations": 1,
+        "add_observations": 2,
+    }
+
+
+def test_cancelled_write(setup_manager):
+    manager, storage = setup_manager
+
+    async def cancel_one():
+        writes = [
+            asyncio.create_task(
+                manager.storage.create_entities(
+                    [{"name": f"entity{i}", "entity_type": "tool", "observations": []}]
+                )
+            )
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        writes[1].cancel()
+        return await asyncio.gather(*writes, return_exceptions=True)
+
+    statuses = asyncio.run(cancel_one())
+
+    assert isinstance(statuses[1], asyncio.CancelledError)
+    assert statuses[0] == [{"name": "entity0", "status": "created"}]
+    assert statuses[2] == [{"name": "entity2", "status": "created"}]
+    # The cancelled caller's entity was written with the rest.
+    assert storage.calls == {"create_entities": 1}
+    assert [
+        entity["name"]
+        for entity in asyncio.run(manager.read_graph({"fields": ["name"]}))["entities"]
+    ] == ["entity0", "entity1", "entity2"]
+
+
+def test_read_your_writes(setup_manager):
+    manager, storage = setup_manager
+    manager.storage.window = 60
+
+    async def write_then_read():
+        write = asyncio.create_task(
+            manager.create_entity(
+                {"name": "entity1", "entity_type": "tool", "observations": ["fact"]}
+            )
+        )
+        await asyncio.sleep(0)
+        graph = await manager.read_graph()
+        return await write, graph
+
+    created, graph = asyncio.run(write_then_read())
+
+    assert created.name == "entity1"
+    assert graph["entities"] == [
+        {"name": "entity1", "entity_type": "tool", "observations": ["fact"]}
+    ]
+
+
+def test_flush_on_close(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "memory.db"))
+    manager = mcp_memory.server.KnowledgeGraphManager(BufferedStorage(storage, 60))
+
+    async def write_then_close():
+        await manager.setup()
+        write = asyncio.create_task(
+            manager.create_entity(
+                {"name": "entity1", "entity_type": "tool", "observations": []}
+            )
+        )
+        await asyncio.sleep(0)
+        await manager.close()
+        return await write
+
+    assert asyncio.run(write_then_close()).name == "entity1"
+
+    reopened = SQLiteStorage(str(tmp_path / "memory.db"))
+    asyncio.run(reopened.setup())
+    try:
+        assert [e["name"] for e in asyncio.run(reopened.read_entities(["name"]))] == [
+            "entity1"
+        ]
+    finally:
+        asyncio.run(reopened.close())
@@ -0,0 +1,199 @@
+import asyncio
+
+from bson import ObjectId
+from mcp_memory.cache import GraphCache
+from mcp_memory.server import KnowledgeGraphManager
+from mcp_memory.sqlite_storage import SQLiteStorage
+
+entities = [
+    {
+        "_id": ObjectId(),
+        "name": "entity1",
+        "entity_type": "tool",
+        "observations": ["observation1", "observation2"],
+    },
+    {"_id": ObjectId(), "name": "entity2", "entity_type": "person", "observations": []},
+    {
+        "_id": ObjectId(),
+        "name": "entity3",
+        "entity_type": "vehicle",
+        "observations": [],
+    },
+]
+relations = [
+    {
+        "_id": ObjectId(),
+        "from_entity": "entity1",
+        "to_entity": "entity2",
+        "relation_type": "type1",
+    },
+    {
+        "_id": ObjectId(),
+        "from_entity": "entity2",
+        "to_entity": "entity3",
+        "relation_type": "type2",
+    },
+]
+
+
+def load_cache(max_entities=10):
+    cache = GraphCache(max_entities)
+    cache.load(entities, relations, len(entities))
+    return cache
+
+
+def test_load():
+    cache = load_cache()
+
+    assert cache.complete
+    assert cache.summarize() == {
+        "entity_count": 3,
+        "relation_count": 2,
+        "entity_types": {"tool": 1, "person": 1, "vehicle": 1},
+        "relation_types": {"type1": 1, "type2": 1},
+    }
+
+
+def test_search_text():
+    cache = load_cache()
+    cache.add_observations("entity2", ["Uses the tool daily"])
+
+    results = cache.search_text("tool", 10)
+
+    assert [(entity["name"], score) for entity, score in results] == [
+        ("entity1", 5.0),
+        ("entity2", 1.0),
+    ]
+
+
+def test_search_substring():
+    cache = load_cache()
+    cache.put_entity(
+        {"_id": ObjectId(), "name": "entity4", "entity_type": "hub", "observations": []}
+    )
+    for name, relation_type in (
+        ("entity1", "type3"),
+        ("entity2", "type3"),
+        ("entity3", "type3"),
+        ("entity3", "type4"),
+    ):
+        cache.put_relation(
+            {
+                "_id": ObjectId(),
+                "from_entity": "entity4",
+                "to_entity": name,
+                "relation_type": relation_type,
+            }
+        )
+
+    results = cache.search_substring("entity", 2)
+
+    assert [entity["name"] for entity in results] == ["entity4", "entity2"]
+
+
+def test_open_nodes():
+    cache = load_cache()
+
+    found, touching = cache.open_nodes(["entity2"])
+
+    assert [entity["name"] for entity in found] == ["entity2"]
+    assert sorted(relation["relation_type"] for relation in touching) == [
+        "type1",
+        "type2",
+    ]
+
+
+def test_relations_among():
+    cache = load_cache()
+
+    among = cache.relations_among(["entity1", "entity2"])
+
+    assert [relation["relation_type"] for relation in among] == ["type1"]
+    assert [cache.degree(name) for name in ("entity1", "entity2", "entity3")] == [
+        1,
+        2,
+        1,
+    ]
+
+
+def test_remove_entities():
+    cache = load_cache()
+    cache.remove_entities(["entity2"])
+
+    assert cache.relations == {}
+    assert cache.search_text("person", 10) == []
+
+
+def test_apply_change():
+    cache = load_cache()
+    cache.apply_change(
+        {
+            "operationType": "delete",
+            "ns": {"db": "memories", "coll": "relations"},
+            "documentKey": {"_id": relations[0]["_id"]},
+        }
+    )
+    cache.apply_change(
+        {
+            "operationType": "update",
+            "ns": {"db": "memories", "coll": "entities"},
+            "documentKey": {"_id": entities[2]["_id"]},
+            "fullDocument": {**entities[2], "observations": ["Red paint"]},
+        }
+    )
+
+    assert list(cache.relations) == [("entity2", "entity3", "type2")]
+    assert [entity["name"] for entity, _ in cache.search_text("red", 10)] == ["entity3"]
+
+
+def test_eviction():
+    cache = load_cache(max_entities=2)
+
+    assert not cache.complete
+    assert list(cache.entities) == ["entity2", "entity3"]
+    assert cache.open_nodes(["entity1"]) is None
+    assert cache.open_nodes(["entity3"]) is not None
+
+
+def test_cached_substring_search(tmp_path):
+    manager = KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db")), cache=GraphCache(100)
+    )
+
+    async def search():
+        await manager.setup()
+        try:
+            await manager._watch_task
+            await manager.create_entities(
+                {
+                    "entities": [
+                        {
+                            "name": f"entity{i}",
+                            "entity_type": "tool",
+                            "observations": [],
+                        }
+                        for i in range(4)
+                    ]
+                }
+            )
+            await manager.create_relations(
+                {
+                    "relations": [
+                        {
+                            "from_entity": "entity3",
+                            "to_entity": name,
+                            "relation_type": "t",
+                        }
+                        for name in ("entity0", "entity1", "entity2")
+                    ]
+                }
+            )
+            return await manager.search_nodes(
+                {"query": "entity", "mode": "substring", "limit": 1}
+            )
+        finally:
+            await manager.close()
+
+    result = asyncio.run(search())
+
+    assert [entity["name"] for entity in result["entities"]] == ["entity3"]
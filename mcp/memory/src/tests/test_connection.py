@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+from mcp_memory.mongo_storage import MongoConnection
+
+
+def test_reopen_closes_client_of_running_loop(monkeypatch):
+    connection = MongoConnection("mongodb://localhost:1/")
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(connection.open(), other_loop).result()
+        old_client = connection._client
+        closed = threading.Event()
+
+        async def close():
+            assert asyncio.get_running_loop() is other_loop
+            closed.set()
+
+        monkeypatch.setattr(old_client, "close", close)
+        asyncio.run(connection.open())
+
+        assert connection._client is not old_client
+        assert closed.wait(1)
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
+
+
+def test_reopen_drops_client_of_stopped_loop():
+    connection = MongoConnection("mongodb://localhost:1/")
+    asyncio.run(connection.open())
+    old_client = connection._client
+
+    async def reopen():
+        await connection.open()
+        client = connection._client
+        await connection.close()
+        return client
+
+    new_client = asyncio.run(reopen())
+
+    assert new_client is not old_client
+    assert connection._client is None
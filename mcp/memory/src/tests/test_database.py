@@ -1,20 +1,11 @@
 import asyncio
 import json
-import os
 
 import mcp_memory.server
 import pytest
-from dotenv import load_dotenv
 from mcp_memory import server
-from pymongo import MongoClient
-from pytest_lazyfixture import lazy_fixture
-
-load_dotenv()
-
-MONGO_URI = os.environ.get("MONGO_URI")
-DATABASE_NAME = "memories"
-ENTITIES_COLLECTION = "entities"
-RELATIONS_COLLECTION = "relations"
+from mcp_memory.mongo_storage import DATABASE_NAME, MongoStorage
+from mcp_memory.sqlite_storage import SQLiteStorage
 
 entities = [
     {
@@ -33,35 +24,22 @@ relations = [
 ]
 
 
-@pytest.fixture(scope="function", autouse=True)
-def setup_before_each_test():
-    client = MongoClient(MONGO_URI)
-    db = client[DATABASE_NAME]
-    db.entities.drop()
-    db.relations.drop()
-    db.create_collection(ENTITIES_COLLECTION)
-    db.create_collection(RELATIONS_COLLECTION)
-
-    yield
-
-    client.close()
-
-
-@pytest.fixture(scope="function")
-def setup_database():
-    client = MongoClient(MONGO_URI)
-    db = client[DATABASE_NAME]
-    yield db
-    client.close()
-
+@pytest.fixture(scope="function", autouse=True, params=["mongo", "sqlite"])
+def setup_manager(request, tmp_path, monkeypatch):
+    if request.param == "mongo":
+        request.getfixturevalue("mongo_client").drop_database(DATABASE_NAME)
+        storage = MongoStorage()
+    else:
+        storage = SQLiteStorage(str(tmp_path / "memory.db"))
+    manager = mcp_memory.server.KnowledgeGraphManager(storage)
+    monkeypatch.setattr(mcp_memory.server, "manager", manager)
+    asyncio.run(manager.setup())
 
-@pytest.fixture(scope="function")
-def setup_manager():
-    manager = mcp_memory.server.KnowledgeGraphManager()
     yield manager
 
+    asyncio.run(manager.close())
+
 
-@pytest.mark.usefixtures("setup_database")
 @pytest.fixture(scope="function")
 def setup_entities(setup_manager):
     for entity in entities:
@@ -71,12 +49,10 @@ def setup_entities(setup_manager):
             observations=entity["observations"],
         )
         asyncio.run(setup_manager.create_entity(arguments))
-    # yield setup_database
 
 
-@pytest.mark.usefixtures("setup_database", "setup_entities")
 @pytest.fixture(scope="function")
-def setup_relations(setup_manager):
+def setup_relations(setup_manager, setup_entities):
     for relation in relations:
         arguments = dict(
             from_entity=relation["from_entity"],
@@ -86,12 +62,44 @@ def setup_relations(setup_manager):
         asyncio.run(setup_manager.create_relation(arguments))
 
 
+def call(name, arguments):
+    result = asyncio.run(server.handle_call_tool(name, arguments))
+    return json.loads(result[0].text)
+
+
+def summary():
+    return call("read_graph", {"mode": "summary"})
+
+
+def observations(manager, name, observation_limit=None):
+    graph = asyncio.run(manager.open_nodes([name], observation_limit))
+    return graph["entities"][0]["observations"]
+
+
+def degrees(manager):
+    documents = asyncio.run(
+        manager.storage.get_entities(["entity1", "entity2", "entity3"])
+    )
+    return {document["name"]: document["degree"] for document in documents}
+
+
+class RecordingSemantic:
+    def __init__(self):
+        self.added = []
+
+    async def add(self, observations):
+        self.added += observations
+
+    async def close(self):
+        pass
+
+
 def test_list_tools():
     tools = asyncio.run(server.list_tools())
-    assert len(tools) == 8
+    assert len(tools) == 16
 
 
-def test_create_entity(setup_database):
+def test_create_entity():
     name = "create_entity"
     s = """{
             "observations": [
@@ -103,26 +111,28 @@ def test_create_entity(setup_database):
             }"""
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
     assert (
         text
-        == '{"name": "entity1", "entity_type": "tool", "observations": ["observation3", "observation4"]}'
+        == '{"name":"entity1","entity_type":"tool","observations":["observation3","observation4"]}'
     )
-    # for entity in entities:
-    #     arguments = dict(
-    #         name=entity["name"],
-    #         entity_type=entity["entity_type"],
-    #         observations=entity["observations"],
-    #     )
-    #     asyncio.run(setup_manager.create_entity(arguments))
+    assert 1 == summary()["entity_count"]
+
 
-    assert 1 == setup_database[ENTITIES_COLLECTION].count_documents({})
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_create_duplicates(setup_manager):
+    entity = asyncio.run(setup_manager.create_entity(entities[0]))
+    relation = asyncio.run(setup_manager.create_relation(relations[0]))
+
+    assert entity is None
+    assert relation is None
+    assert 3 == summary()["entity_count"]
+    assert 2 == summary()["relation_count"]
 
 
 @pytest.mark.usefixtures("setup_entities")
-def test_add_observations(setup_database):
+def test_add_observations(setup_manager):
     name = "add_observations"
     s = """{
             "observations": [
@@ -133,159 +143,480 @@ def test_add_observations(setup_database):
             }"""
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
     assert (
         text
-        == '{"entity_name": "entity1", "added_observations": ["observation3", "observation4"]}'
+        == '{"entity_name":"entity1","added_observations":["observation3","observation4"]}'
     )
-    # assert result["entity_name"] == entities[0]["name"]
-    # assert set(result["added_observations"]) == set(arguments["observations"])
-    # TODO: Assert that values in database match the actual values
+    assert observations(setup_manager, "entity1", observation_limit=2) == [
+        "observation3",
+        "observation4",
+    ]
+    with pytest.raises(Exception, match="not found"):
+        asyncio.run(
+            setup_manager.add_observations(
+                {"entity_name": "missing", "observations": ["fact"]}
+            )
+        )
 
 
 @pytest.mark.usefixtures("setup_entities")
-def test_create_relation(setup_database):
+def test_concurrent_observation_writers(setup_manager):
+    writers = 50
+
+    async def write_concurrently():
+        return await asyncio.gather(
+            *(
+                setup_manager.add_observations(
+                    {"entity_name": "entity2", "observations": [f"fact{i}", "shared"]}
+                )
+                for i in range(writers)
+            )
+        )
+
+    results = asyncio.run(write_concurrently())
+
+    assert sorted(observations(setup_manager, "entity2")) == sorted(
+        [f"fact{i}" for i in range(writers)] + ["shared"]
+    )
+    assert sum(r["added_observations"].count("shared") for r in results) == 1
+
+    async def delete_concurrently():
+        return await asyncio.gather(
+            *(
+                setup_manager.delete_observations(
+                    {"entity_name": "entity2", "observations": [f"fact{i}", "shared"]}
+                )
+                for i in range(writers)
+            )
+        )
+
+    results = asyncio.run(delete_concurrently())
+
+    assert observations(setup_manager, "entity2") == []
+    assert sum(r["deleted_observations"].count("shared") for r in results) == 1
+
+
+def test_create_entities():
+    statuses = call("create_entities", {"entities": entities})
+    repeated = call(
+        "create_entities",
+        {
+            "entities": [
+                {"name": "entity1", "entity_type": "tool", "observations": []},
+                {"name": "entity4", "entity_type": "place", "observations": ["obs"]},
+                {"name": "entity4", "entity_type": "place", "observations": []},
+            ]
+        },
+    )
+
+    assert [status["status"] for status in statuses] == [
+        "created",
+        "created",
+        "skipped",
+        "created",
+    ]
+    assert repeated == [
+        {"name": "entity1", "status": "skipped"},
+        {"name": "entity4", "status": "created"},
+        {"name": "entity4", "status": "skipped"},
+    ]
+    assert 4 == summary()["entity_count"]
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_create_relations():
+    args = {"relations": [relations[0], {**relations[0], "relation_type": "type3"}]}
+    statuses = call("create_relations", args)
+
+    assert [status["status"] for status in statuses] == ["skipped", "created"]
+    assert 3 == summary()["relation_count"]
+
+
+@pytest.mark.usefixtures("setup_entities")
+def test_add_observations_batch(setup_manager):
+    setup_manager.semantic = RecordingSemantic()
+    statuses = call(
+        "add_observations_batch",
+        {
+            "observations": [
+                {"entity_name": "entity1", "observations": ["observation1", "new"]},
+                {"entity_name": "entity2", "observations": ["other"]},
+                {"entity_name": "entity1", "observations": ["new", "newer"]},
+                {"entity_name": "entity3", "observations": []},
+                {"entity_name": "missing", "observations": ["lost"]},
+            ]
+        },
+    )
+
+    assert statuses == [
+        {"entity_name": "entity1", "status": "updated", "added_observations": ["new"]},
+        {
+            "entity_name": "entity2",
+            "status": "updated",
+            "added_observations": ["other"],
+        },
+        {
+            "entity_name": "entity1",
+            "status": "updated",
+            "added_observations": ["newer"],
+        },
+        {"entity_name": "entity3", "status": "unchanged", "added_observations": []},
+        {"entity_name": "missing", "status": "not_found"},
+    ]
+    assert observations(setup_manager, "entity1") == [
+        "observation1",
+        "observation2",
+        "new",
+        "newer",
+    ]
+    assert sorted(setup_manager.semantic.added) == [
+        ("entity1", "new"),
+        ("entity1", "newer"),
+        ("entity2", "other"),
+    ]
+
+
+@pytest.mark.usefixtures("setup_entities")
+def test_create_relation():
     name = "create_relation"
     s = '{"from_entity": "entity7", "to_entity": "entity8", "relation_type": "type9"}'
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
 
-    # relations = list(
-    #     setup_database[RELATIONS_COLLECTION].find({"from_entity": "entity7"})
-    # )
-
     assert (
         text
-        == '{"from_entity": "entity7", "to_entity": "entity8", "relation_type": "type9"}'
+        == '{"from_entity":"entity7","to_entity":"entity8","relation_type":"type9"}'
     )
 
 
-@pytest.mark.usefixtures("setup_entities")
-def test_delete_entities(setup_database):
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_delete_entities():
     name = "delete_entities"
     s = '{"entity_names": ["entity1"]}'
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
+    graph = call("read_graph", {})
 
     assert text == "Entities deleted"
-    # arguments = dict(entity_names=[entities[0]["name"]])
-    # asyncio.run(setup_manager.delete_entities(arguments))
-    # remaining_entities = list(setup_database[ENTITIES_COLLECTION].find())
-
-    # assert entities[0]["name"] not in remaining_entities
-    # assert 2 == len(remaining_entities)
-    # TODO: Assert that values in database match the actual values
+    assert [entity["name"] for entity in graph["entities"]] == ["entity2", "entity3"]
+    assert graph["relations"] == relations[1:]
 
 
 @pytest.mark.usefixtures("setup_entities")
-def test_delete_observations(setup_database):
+def test_delete_observations(setup_manager):
     name = "delete_observations"
-    s = '{"entity_name": "entity1", "observations": ["observation1"]}'
+    s = '{"entity_name": "entity1", "observations": ["observation1", "missing"]}'
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
 
-    assert text == "Observations deleted"
-    # entity_name = entities[0]["name"]
-    # observation = entities[0]["observations"][0]
-
-    # arguments = dict(entity_name=entity_name, observations=[observation])
-    # asyncio.run(setup_manager.delete_observations(arguments))
-    # entity = setup_database[ENTITIES_COLLECTION].find_one({"name": entity_name})
-    # assert observation not in entity["observations"]
+    assert text == '{"entity_name":"entity1","deleted_observations":["observation1"]}'
+    assert observations(setup_manager, "entity1") == ["observation2"]
 
 
 @pytest.mark.usefixtures("setup_relations")
-def test_delete_relation(setup_database):
-    # setup_manager = mcp_memory_python.server.KnowledgeGraphManager()
-
-    # arguments = dict(
-    #     from_entity=relations[0]["from_entity"],
-    #     to_entity=relations[0]["to_entity"],
-    #     relation_type=relations[0]["relation_type"],
-    # )
-    # asyncio.run(setup_manager.delete_relation(arguments))
+def test_delete_relation():
     name = "delete_relation"
     s = '{"from_entity": "entity1", "to_entity": "entity2", "relation_type": "type1"}'
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
 
     assert text == "Relations deleted"
-
-    remaining_relations = setup_database[RELATIONS_COLLECTION].find()
-    assert all(
-        not (
-            rel["from_entity"] == r["from_entity"]
-            and rel["to_entity"] == r["to_entity"]
-            and rel["relation_type"] == r["relation_type"]
-        )
-        for r in relations
-        for rel in remaining_relations
-    )
-    # TODO: Assert that values in database match the actual values
+    assert call("read_graph", {})["relations"] == relations[1:]
 
 
 @pytest.mark.usefixtures("setup_entities", "setup_relations")
-def test_search_nodes(setup_database):
-    # query_string = "entity"
-    # arguments = dict(query=query_string)
-
-    # result = asyncio.run(setup_manager.search_nodes(arguments))
-    # assert result is not None
-    # assert all(query_string in entity["name"] for entity in result.entities)
+def test_search_nodes():
     name = "search_nodes"
-    s = '{"query": "entity"}'
+    s = '{"query": "entity", "mode": "substring"}'
     args = json.loads(s)
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, args))
     text = result[0].text
     assert (
         text
-        == '{"entities": [{"name": "entity1", "entity_type": "tool", "observations": ["observation1", "observation2"]}, {"name": "entity2", "entity_type": "person", "observations": []}, {"name": "entity3", "entity_type": "vehicle", "observations": []}], "relations": [{"from_entity": "entity1", "to_entity": "entity2", "relation_type": "type1"}, {"from_entity": "entity2", "to_entity": "entity3", "relation_type": "type2"}]}'
+        == '{"entities":[{"name":"entity2","entity_type":"person","observations":[]},{"name":"entity1","entity_type":"tool","observations":["observation1","observation2"]},{"name":"entity3","entity_type":"vehicle","observations":[]}],"relations":[{"from_entity":"entity1","to_entity":"entity2","relation_type":"type1"},{"from_entity":"entity2","to_entity":"entity3","relation_type":"type2"}]}'
     )
-    # TODO: Assert that values in database match the actual values
 
 
-# TODO: Implement this method
-# @pytest.mark.usefixtures("setup_database")
-# def test_open_nodes(setup_manager):
-#     names = ["entity1", "entity2"]
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_search_nodes_text():
+    graph = call("search_nodes", {"query": "tool observation1", "limit": 1})
+
+    assert [entity["name"] for entity in graph["entities"]] == ["entity1"]
+    assert graph["entities"][0]["score"] > 0
+    assert graph["relations"] == []
 
-#     result = asyncio.run(setup_manager.open_nodes(names))
-#     assert result is not None
-#     assert all(entity["name"] in names for entity in result.entities)
-#     # TODO: Assert that values in database match the actual values
 
+@pytest.mark.usefixtures("setup_entities")
+def test_search_nodes_text_operators(setup_manager):
+    # "-" and quotes are plain punctuation on both backends.
+    result = asyncio.run(setup_manager.search_nodes({"query": '-tool "vehicle'}))
+    punctuation = asyncio.run(setup_manager.search_nodes({"query": '-"'}))
+
+    assert sorted(entity["name"] for entity in result["entities"]) == [
+        "entity1",
+        "entity3",
+    ]
+    assert punctuation["entities"] == []
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_search_nodes_ranking(setup_manager):
+    args = {"query": "entity", "mode": "substring", "limit": 2}
+    ranked = asyncio.run(setup_manager.search_nodes(args))
+    budgeted = asyncio.run(setup_manager.search_nodes({**args, "max_tokens": 20}))
+    asyncio.run(setup_manager.delete_entities({"entity_names": ["entity3"]}))
+    after_delete = degrees(setup_manager)
+    asyncio.run(
+        setup_manager.create_entity(
+            {"name": "entity3", "entity_type": "vehicle", "observations": []}
+        )
+    )
+    asyncio.run(setup_manager.create_relations({"relations": relations}))
+
+    assert [entity["name"] for entity in ranked["entities"]] == ["entity2", "entity1"]
+    assert ranked["relations"] == relations[:1]
+    assert [entity["name"] for entity in budgeted["entities"]] == ["entity2"]
+    assert budgeted["truncated"]
+    assert after_delete == {"entity1": 1, "entity2": 1}
+    assert degrees(setup_manager) == {"entity1": 1, "entity2": 2, "entity3": 1}
+
+
+@pytest.mark.usefixtures("setup_entities")
+def test_search_nodes_escapes_query():
+    dots = call("search_nodes", {"query": ".*", "mode": "substring"})
+    percent = call("search_nodes", {"query": "%", "mode": "substring"})
+    substring = call("search_nodes", {"query": "ehic", "mode": "substring"})
+
+    assert dots["entities"] == []
+    assert percent["entities"] == []
+    assert [entity["name"] for entity in substring["entities"]] == ["entity3"]
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_open_nodes(setup_manager):
+    names = ["entity1", "entity2", "missing"]
+
+    result = asyncio.run(setup_manager.open_nodes(names))
+    assert sorted(entity["name"] for entity in result["entities"]) == [
+        "entity1",
+        "entity2",
+    ]
+    assert sorted(
+        (relation["from_entity"], relation["to_entity"])
+        for relation in result["relations"]
+    ) == [("entity1", "entity2"), ("entity2", "entity3")]
 
-@pytest.mark.usefixtures("setup_database", "setup_entities", "setup_relations")
-def test_read_graph(setup_manager):
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_read_graph():
     name = "read_graph"
 
-    server = mcp_memory.server
     result = asyncio.run(server.handle_call_tool(name, None))
     text = result[0].text
 
     assert (
         text
-        == '{"entities": [{"name": "entity1", "entity_type": "tool", "observations": ["observation1", "observation2"]}, {"name": "entity2", "entity_type": "person", "observations": []}, {"name": "entity3", "entity_type": "vehicle", "observations": []}], "relations": [{"from_entity": "entity1", "to_entity": "entity2", "relation_type": "type1"}, {"from_entity": "entity2", "to_entity": "entity3", "relation_type": "type2"}]}'
+        == '{"entities":[{"name":"entity1","entity_type":"tool","observations":["observation1","observation2"]},{"name":"entity2","entity_type":"person","observations":[]},{"name":"entity3","entity_type":"vehicle","observations":[]}],"relations":[{"from_entity":"entity1","to_entity":"entity2","relation_type":"type1"},{"from_entity":"entity2","to_entity":"entity3","relation_type":"type2"}]}'
+    )
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_traverse(setup_manager):
+    graph = asyncio.run(setup_manager.traverse({"start": ["entity1"], "max_depth": 2}))
+
+    assert [(e["name"], e["depth"]) for e in graph["entities"]] == [
+        ("entity1", 0),
+        ("entity2", 1),
+        ("entity3", 2),
+    ]
+    assert graph["relations"] == relations
+    assert not graph["truncated"]
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_traverse_budgets(setup_manager):
+    one_hop = asyncio.run(
+        setup_manager.traverse({"start": ["entity1"], "max_depth": 1})
+    )
+    budgeted = asyncio.run(
+        setup_manager.traverse({"start": ["entity1"], "max_depth": 2, "max_nodes": 2})
+    )
+    incoming = asyncio.run(
+        setup_manager.traverse(
+            {"start": ["entity3"], "direction": "incoming", "relation_types": ["type2"]}
+        )
     )
-    # graph = asyncio.run(setup_manager.read_graph())
-    # assert graph is not None
-    # TODO: Assert that values in database match the actual values
+
+    assert one_hop["relations"] == relations[:1]
+    assert [e["name"] for e in budgeted["entities"]] == ["entity1", "entity2"]
+    assert budgeted["truncated"]
+    assert [e["name"] for e in incoming["entities"]] == ["entity3", "entity2"]
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_read_graph_pages():
+    pages = []
+    cursor = None
+    while True:
+        args = {"limit": 2, "fields": ["name"]}
+        if cursor:
+            args["cursor"] = cursor
+        page = call("read_graph", args)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [[e["name"] for e in page["entities"]] for page in pages] == [
+        ["entity1", "entity2"],
+        ["entity3"],
+        [],
+    ]
+    assert [page["relations"] for page in pages] == [[], relations[:1], relations[1:]]
+    assert all(set(entity) == {"name"} for page in pages for entity in page["entities"])
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_read_graph_summary():
+    assert summary() == {
+        "entity_count": 3,
+        "relation_count": 2,
+        "entity_types": {"tool": 1, "person": 1, "vehicle": 1},
+        "relation_types": {"type1": 1, "type2": 1},
+    }
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_compact_format():
+    graph = call("open_nodes", {"names": ["entity1"], "format": "compact"})
+    pages = call("read_graph", {"limit": 1, "fields": ["name"], "format": "compact"})
+
+    assert graph == {
+        "entity_fields": ["name", "entity_type", "observations"],
+        "entities": [["entity1", "tool", ["observation1", "observation2"]]],
+        "relation_fields": ["from_entity", "relation_type", "to_entity"],
+        "relations": [["entity1", "type1", "entity2"]],
+    }
+    assert pages["entities"] == [["entity1"]]
+    assert pages["next_cursor"] is not None
+
+
+@pytest.mark.usefixtures("setup_entities")
+def test_list_by_type(setup_manager):
+    asyncio.run(
+        setup_manager.create_entities(
+            {
+                "entities": [
+                    {"name": f"tool{i}", "entity_type": "tool", "observations": []}
+                    for i in range(3)
+                ]
+            }
+        )
+    )
+    first = call("list_by_type", {"entity_type": "tool", "limit": 3})
+    rest = call(
+        "list_by_type",
+        {
+            "entity_type": "tool",
+            "cursor": first["next_cursor"],
+            "observation_counts": True,
+        },
+    )
+    counted = call("list_by_type", {"entity_type": "tool", "observation_counts": True})
+
+    assert first == {
+        "entity_type": "tool",
+        "entities": [{"name": "entity1"}, {"name": "tool0"}, {"name": "tool1"}],
+        "next_cursor": "tool1",
+    }
+    assert rest == {
+        "entity_type": "tool",
+        "entities": [{"name": "tool2", "observation_count": 0}],
+        "next_cursor": None,
+    }
+    assert counted["entities"][0] == {"name": "entity1", "observation_count": 2}
+    assert call("count_by_type", {}) == {
+        "entity_types": {"tool": 4, "person": 1, "vehicle": 1}
+    }
+
+
+@pytest.mark.usefixtures("setup_entities", "setup_relations")
+def test_changes_since(setup_manager):
+    everything = call("changes_since", {})
+    asyncio.run(
+        setup_manager.add_observations(
+            {"entity_name": "entity2", "observations": ["observation3"]}
+        )
+    )
+    asyncio.run(setup_manager.delete_entities({"entity_names": ["entity3"]}))
+    changes = call("changes_since", {"revision": everything["revision"]})
+    first = call("changes_since", {"limit": 2})
+    rest = call("changes_since", {"revision": first["revision"]})
+
+    assert [entity["name"] for entity in everything["entities"]] == [
+        "entity1",
+        "entity2",
+        "entity3",
+    ]
+    assert everything["relations"] == relations
+    assert not everything["has_more"]
+    assert changes == {
+        "revision": changes["revision"],
+        "has_more": False,
+        "entities": [
+            {
+                "name": "entity2",
+                "entity_type": "person",
+                "observations": ["observation3"],
+            }
+        ],
+        "relations": [],
+        "deleted_entities": ["entity3"],
+        "deleted_relations": [relations[1]],
+    }
+    assert changes["revision"] > everything["revision"]
+    assert call("changes_since", {"revision": changes["revision"]})["entities"] == []
+    assert first["has_more"]
+    assert [entity["name"] for entity in first["entities"]] == ["entity1"]
+    assert first["relations"] == relations[:1]
+    assert rest["entities"] == changes["entities"]
+    assert not rest["has_more"]
+
+
+@pytest.mark.usefixtures("setup_entities")
+def test_repeated_add_leaves_no_changes(setup_manager):
+    def add():
+        return asyncio.run(
+            setup_manager.add_observations(
+                {"entity_name": "entity1", "observations": ["observation1", "new"]}
+            )
+        )
+
+    first = add()
+    after = asyncio.run(setup_manager.changes_since({}))
+    repeated = add()
+    batch = asyncio.run(
+        setup_manager.add_observations_batch(
+            {"observations": [{"entity_name": "entity1", "observations": ["new"]}]}
+        )
+    )
+    changes = asyncio.run(setup_manager.changes_since({"revision": after["revision"]}))
+
+    assert first["added_observations"] == ["new"]
+    assert repeated["added_observations"] == []
+    assert batch[0]["status"] == "unchanged"
+    assert changes["entities"] == []
 
 
 # @pytest.mark.usefixtures("setup_entities")
@@ -0,0 +1,54 @@
+import asyncio
+
+import mcp_memory.server
+import pytest
+from mcp_memory.metrics import handle_metrics, monitor_event_loop
+from mcp_memory.sqlite_storage import SQLiteStorage
+from prometheus_client import REGISTRY
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup_manager(tmp_path, monkeypatch):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db"))
+    )
+    monkeypatch.setattr(mcp_memory.server, "manager", manager)
+    asyncio.run(manager.setup())
+
+    yield manager
+
+    asyncio.run(manager.close())
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_tool_metrics():
+    calls = sample("mcp_tool_call_duration_seconds_count", tool="read_graph")
+    errors = sample("mcp_tool_call_errors_total", tool="missing_tool")
+
+    asyncio.run(mcp_memory.server.handle_call_tool("read_graph", {}))
+    with pytest.raises(Exception):
+        asyncio.run(mcp_memory.server.handle_call_tool("missing_tool", {}))
+
+    assert sample("mcp_tool_call_duration_seconds_count", tool="read_graph") == (
+        calls + 1
+    )
+    assert sample("mcp_tool_call_errors_total", tool="missing_tool") == errors + 1
+    assert sample("mcp_tool_calls_in_flight", tool="read_graph") == 0
+
+
+def test_metrics_endpoint():
+    async def scrape():
+        monitor = asyncio.create_task(monitor_event_loop(0.01))
+        await asyncio.sleep(0.05)
+        monitor.cancel()
+        return await handle_metrics(None)
+
+    response = asyncio.run(scrape())
+    body = response.body.decode()
+
+    assert response.media_type.startswith("text/plain")
+    assert "mcp_event_loop_lag_seconds_count" in body
+    assert sample("mcp_event_loop_lag_seconds_count") > 0
@@ -0,0 +1,158 @@
+import asyncio
+
+import mcp_memory.server
+import pytest
+from mcp_memory.cache import GraphCache
+from mcp_memory.mongo_storage import (
+    DATABASE_NAME,
+    ENTITIES_COLLECTION,
+    OBSERVATIONS_COLLECTION,
+    RELATIONS_COLLECTION,
+    MongoStorage,
+    mongo,
+)
+
+entities = [
+    {
+        "name": "entity1",
+        "entity_type": "tool",
+        "observations": ["observation1", "observation2"],
+    },
+    {"name": "entity2", "entity_type": "person", "observations": []},
+    {"name": "entity3", "entity_type": "vehicle", "observations": []},
+]
+relations = [
+    {"from_entity": "entity1", "to_entity": "entity2", "relation_type": "type1"},
+    {"from_entity": "entity2", "to_entity": "entity3", "relation_type": "type2"},
+]
+
+
+@pytest.fixture(scope="function")
+def setup_database(mongo_client):
+    mongo_client.drop_database(DATABASE_NAME)
+    yield mongo_client[DATABASE_NAME]
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup_manager(setup_database, monkeypatch):
+    manager = mcp_memory.server.KnowledgeGraphManager(MongoStorage())
+    monkeypatch.setattr(mcp_memory.server, "manager", manager)
+    asyncio.run(manager.setup())
+
+    yield manager
+
+    asyncio.run(manager.close())
+
+
+@pytest.fixture(scope="function")
+def setup_graph(setup_manager):
+    asyncio.run(setup_manager.create_entities({"entities": entities}))
+    asyncio.run(setup_manager.create_relations({"relations": relations}))
+
+
+def test_connection_is_shared():
+    async def open_twice():
+        first = await mongo.open()
+        second = await mongo.open()
+        return first.client is second.client
+
+    assert asyncio.run(open_twice())
+
+
+@pytest.mark.usefixtures("setup_graph")
+def test_indexes(setup_database):
+    entity_indexes = setup_database[ENTITIES_COLLECTION].index_information()
+    relation_indexes = setup_database[RELATIONS_COLLECTION].index_information()
+    plan = (
+        setup_database[ENTITIES_COLLECTION]
+        .find({"entity_type": "tool"}, {"_id": 0, "name": 1})
+        .sort([("entity_type", 1), ("name", 1)])
+        .explain()
+    )
+
+    assert entity_indexes["name_unique"]["unique"]
+    assert relation_indexes["relation_unique"]["key"] == [
+        ("from_entity", 1),
+        ("to_entity", 1),
+        ("relation_type", 1),
+    ]
+    assert "to_entity" in relation_indexes
+    assert "type_name" in str(plan["queryPlanner"]["winningPlan"])
+
+
+@pytest.mark.usefixtures("setup_graph")
+def test_cached_reads(setup_manager, setup_database):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        setup_manager.storage, cache=GraphCache(100)
+    )
+
+    async def write_and_read():
+        await manager.load_cache()
+        await manager.create_entity(
+            {"name": "entity4", "entity_type": "tool", "observations": []}
+        )
+        await manager.delete_relation(relations[1])
+        # Reads must not touch MongoDB once the cache is loaded.
+        setup_database[ENTITIES_COLLECTION].drop()
+        return (
+            await manager.search_nodes({"query": "tool"}),
+            await manager.open_nodes(["entity2"]),
+        )
+
+    search, opened = asyncio.run(write_and_read())
+
+    assert sorted(entity["name"] for entity in search["entities"]) == [
+        "entity1",
+        "entity4",
+    ]
+    assert [entity["name"] for entity in opened["entities"]] == ["entity2"]
+    assert opened["relations"] == relations[:1]
+
+
+@pytest.mark.usefixtures("setup_graph")
+def test_migrate_observations(setup_database):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        MongoStorage(observation_storage="collection")
+    )
+
+    moved = asyncio.run(manager.storage.migrate_observations())
+    graph = asyncio.run(manager.open_nodes(["entity1"], observation_limit=1))
+
+    assert moved == 2
+    assert 2 == setup_database[OBSERVATIONS_COLLECTION].count_documents({})
+    assert "observations" not in setup_database[ENTITIES_COLLECTION].find_one(
+        {"name": "entity1"}
+    )
+    assert graph["entities"][0]["observations"] == ["observation2"]
+
+
+def test_separate_observations(setup_database):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        MongoStorage(observation_storage="collection")
+    )
+
+    async def write_and_read():
+        await manager.create_entity(
+            {"name": "user", "entity_type": "person", "observations": ["first"]}
+        )
+        added = await manager.add_observations(
+            {"entity_name": "user", "observations": ["first", "second", "third"]}
+        )
+        deleted = await manager.delete_observations(
+            {"entity_name": "user", "observations": ["second", "missing"]}
+        )
+        graph = await manager.read_graph({"observation_limit": 5})
+        search = await manager.search_nodes({"query": "third"})
+        return added, deleted, graph, search
+
+    added, deleted, graph, search = asyncio.run(write_and_read())
+
+    assert added["added_observations"] == ["second", "third"]
+    assert deleted["deleted_observations"] == ["second"]
+    assert graph["entities"] == [
+        {"name": "user", "entity_type": "person", "observations": ["first", "third"]}
+    ]
+    assert [entity["name"] for entity in search["entities"]] == ["user"]
+    assert "observations" not in setup_database[ENTITIES_COLLECTION].find_one(
+        {"name": "user"}
+    )
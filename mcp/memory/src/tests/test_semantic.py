@@ -0,0 +1,195 @@
+import asyncio
+
+import mcp_memory.server
+import pytest
+from mcp_memory.cache import tokenize
+from mcp_memory.sqlite_storage import SQLiteStorage
+
+# Semantic search is an optional extra.
+np = pytest.importorskip("numpy")
+from mcp_memory.semantic import SemanticIndex, VectorIndex  # noqa: E402
+
+# Words that mean the same thing share a dimension.
+SYNONYMS = {"employed": "work", "works": "work", "job": "work", "automobile": "car"}
+DIMENSIONS = 256
+
+
+class WordEmbedder:
+    """Bag of words embeddings, standing in for the Ollama model."""
+
+    model = "words"
+
+    def __init__(self):
+        self.calls = 0
+        self.words = {}
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        self.calls += 1
+        vectors = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                word = SYNONYMS.get(token, token)
+                vectors[row, self.words.setdefault(word, len(self.words))] += 1
+        return vectors
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture(scope="function")
+def setup_manager(tmp_path, monkeypatch):
+    def create_manager():
+        return mcp_memory.server.KnowledgeGraphManager(
+            SQLiteStorage(str(tmp_path / "memory.db")),
+            semantic=SemanticIndex(WordEmbedder(), str(tmp_path / "vectors")),
+        )
+
+    manager = create_manager()
+    monkeypatch.setattr(mcp_memory.server, "manager", manager)
+    asyncio.run(manager.setup())
+
+    yield manager, create_manager
+
+    asyncio.run(manager.close())
+
+
+def test_rank_negative_similarity():
+    ranked = mcp_memory.server.KnowledgeGraphManager._rank(
+        [
+            {"name": "hub", "degree": 100, "score": -0.2},
+            {"name": "leaf", "degree": 0, "score": -0.3},
+            {"name": "match", "degree": 1, "score": 0.4},
+        ],
+        "semantic",
+    )
+
+    assert [document["name"] for document in ranked] == ["match", "hub", "leaf"]
+    assert ranked[1]["score"] == -0.2
+
+
+def test_vector_index():
+    index = VectorIndex()
+    keys = [("a", str(i)) for i in range(100)] + [("b", "x")]
+    vectors = np.eye(101, dtype=np.float32) * 3
+
+    index.add(keys, vectors)
+    index.remove([("a", "0"), ("a", "missing")])
+    index.remove_entities(["b"])
+
+    assert len(index) == 99
+    assert index.search(vectors[5], 2)[0] == (("a", "5"), 1.0)
+    assert index.search(vectors[0], 1)[0][1] == 0.0
+    assert all(
+        index.keys[row] == key and index.matrix[row, int(key[1])] == 1.0
+        for key, row in index.rows.items()
+    )
+
+
+def test_semantic_search(setup_manager):
+    manager, create_manager = setup_manager
+    asyncio.run(
+        manager.create_entities(
+            {
+                "entities": [
+                    {
+                        "name": "user",
+                        "entity_type": "person",
+                        "observations": ["Employed at Acme", "Likes tea"],
+                    },
+                    {
+                        "name": "garage",
+                        "entity_type": "place",
+                        "observations": ["Holds an automobile"],
+                    },
+                ]
+            }
+        )
+    )
+    asyncio.run(
+        manager.delete_observations(
+            {"entity_name": "user", "observations": ["Likes tea"]}
+        )
+    )
+
+    result = asyncio.run(
+        manager.search_nodes({"query": "where does the user work", "mode": "semantic"})
+    )
+
+    assert [entity["name"] for entity in result["entities"]][0] == "user"
+    assert result["entities"][0]["score"] > 0
+    assert len(manager.semantic.vectors) == 2
+
+    asyncio.run(manager.close())
+    reopened = create_manager()
+    asyncio.run(reopened.setup())
+    try:
+        assert sorted(reopened.semantic.vectors.keys) == [
+            ("garage", "Holds an automobile"),
+            ("user", "Employed at Acme"),
+        ]
+        assert reopened.semantic.embedder.calls == 0
+    finally:
+        asyncio.run(reopened.close())
+        asyncio.run(manager.setup())
+
+
+def test_semantic_search_disabled(tmp_path):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db"))
+    )
+    asyncio.run(manager.setup())
+    try:
+        with pytest.raises(Exception, match="disabled"):
+            asyncio.run(manager.search_nodes({"query": "work", "mode": "semantic"}))
+    finally:
+        asyncio.run(manager.close())
+
+
+class SlowEmbedder(WordEmbedder):
+    """Takes as long as a remote model would, without holding the event loop."""
+
+    delay = 0.2
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        await asyncio.sleep(self.delay)
+        return await super().embed(texts)
+
+
+def test_semantic_searches_overlap(tmp_path):
+    embedder = SlowEmbedder()
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db")),
+        semantic=SemanticIndex(embedder, None),
+    )
+
+    async def search_concurrently():
+        await manager.setup()
+        try:
+            await manager.create_entities(
+                {
+                    "entities": [
+                        {
+                            "name": f"entity{i}",
+                            "entity_type": "thing",
+                            "observations": [f"fact {i}"],
+                        }
+                        for i in range(10)
+                    ]
+                }
+            )
+            started = asyncio.get_running_loop().time()
+            results = await asyncio.gather(
+                *(
+                    manager.search_nodes({"query": f"fact {i}", "mode": "semantic"})
+                    for i in range(10)
+                )
+            )
+            return results, asyncio.get_running_loop().time() - started
+        finally:
+            await manager.close()
+
+    results, elapsed = asyncio.run(search_concurrently())
+
+    # Ten searches, each waiting on one embed; one after another they would take ten delays.
+    assert elapsed < 3 * SlowEmbedder.delay
+    assert all(result["entities"] for result in results)
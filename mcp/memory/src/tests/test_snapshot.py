@@ -0,0 +1,135 @@
+import asyncio
+import io
+
+import mcp_memory.server
+import pytest
+from mcp_memory.snapshot import export_graph, import_graph, open_snapshot
+from mcp_memory.sqlite_storage import SCHEMA, SQLiteStorage
+
+entities = [
+    {
+        "name": "entity1",
+        "entity_type": "tool",
+        "observations": ["observation1", "observation2"],
+    },
+    {"name": "entity2", "entity_type": "person", "observations": []},
+    {"name": "entity3", "entity_type": "vehicle", "observations": ["red paint"]},
+]
+relations = [
+    {"from_entity": "entity1", "to_entity": "entity2", "relation_type": "type1"},
+    {"from_entity": "entity2", "to_entity": "entity3", "relation_type": "type2"},
+]
+
+
+def open_manager(path):
+    manager = mcp_memory.server.KnowledgeGraphManager(SQLiteStorage(str(path)))
+    asyncio.run(manager.setup())
+    return manager
+
+
+def test_export_import(tmp_path):
+    source = open_manager(tmp_path / "source.db")
+    asyncio.run(source.create_entities({"entities": entities}))
+    asyncio.run(source.create_relations({"relations": relations}))
+    snapshot = str(tmp_path / "graph.jsonl.gz")
+    with open_snapshot(snapshot, "w") as f:
+        exported = asyncio.run(export_graph(source.storage, f, page_size=2))
+    expected = asyncio.run(source.read_graph())
+    asyncio.run(source.close())
+
+    target = open_manager(tmp_path / "target.db")
+    try:
+        with open_snapshot(snapshot, "r") as f:
+            imported = asyncio.run(import_graph(target.storage, f, batch_size=2))
+        with open_snapshot(snapshot, "r") as f:
+            reimported = asyncio.run(import_graph(target.storage, f))
+        graph = asyncio.run(target.read_graph())
+        found = asyncio.run(target.search_nodes({"query": "paint"}))
+        degrees = dict(target.storage.db.execute("SELECT name, degree FROM entities"))
+        changes = asyncio.run(target.changes_since({}))
+    finally:
+        asyncio.run(target.close())
+
+    assert exported == (3, 2)
+    assert imported == (3, 2)
+    assert reimported == (0, 0)
+    assert graph == expected
+    assert [entity["name"] for entity in found["entities"]] == ["entity3"]
+    assert degrees == {"entity1": 1, "entity2": 2, "entity3": 1}
+    assert changes["entities"] == graph["entities"]
+    assert changes["relations"] == graph["relations"]
+
+
+def test_writes_during_import(tmp_path):
+    target = open_manager(tmp_path / "target.db")
+    storage = target.storage
+
+    async def import_while_serving():
+        await storage.begin_bulk_load()
+        await storage.load_entities(entities)
+        await target.create_entities(
+            {
+                "entities": [
+                    {"name": "live", "entity_type": "tool", "observations": ["paint"]}
+                ]
+            }
+        )
+        await target.create_relations(
+            {
+                "relations": [
+                    {
+                        "from_entity": "live",
+                        "to_entity": "entity3",
+                        "relation_type": "t",
+                    }
+                ]
+            }
+        )
+        during = await target.search_nodes({"query": "paint"})
+        await storage.load_relations(relations)
+        await storage.end_bulk_load()
+        after = await target.search_nodes({"query": "paint"})
+        changes = await target.changes_since({})
+        return during, after, changes
+
+    try:
+        during, after, changes = asyncio.run(import_while_serving())
+        degrees = dict(storage.db.execute("SELECT name, degree FROM entities"))
+    finally:
+        asyncio.run(target.close())
+
+    assert sorted(entity["name"] for entity in during["entities"]) == [
+        "entity3",
+        "live",
+    ]
+    assert sorted(entity["name"] for entity in after["entities"]) == [
+        "entity3",
+        "live",
+    ]
+    assert [entity["name"] for entity in changes["entities"]] == [
+        "entity1",
+        "entity2",
+        "entity3",
+        "live",
+    ]
+    assert len(changes["relations"]) == 3
+    assert degrees == {"entity1": 1, "entity2": 2, "entity3": 2, "live": 1}
+
+
+def test_import_invalid(tmp_path):
+    target = open_manager(tmp_path / "target.db")
+    try:
+        with pytest.raises(Exception, match="line 2"):
+            asyncio.run(
+                import_graph(
+                    target.storage,
+                    io.BytesIO(b'{"type": "entity", "name": "a"}\nnot json\n'),
+                )
+            )
+        triggers = target.storage.db.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+        ).fetchone()[0]
+    finally:
+        asyncio.run(target.close())
+
+    assert triggers == SCHEMA.count("CREATE TRIGGER")
@@ -0,0 +1,64 @@
+import asyncio
+
+import mcp_memory.server
+import pytest
+from mcp_memory.sqlite_storage import SQLiteStorage
+
+entities = [
+    {
+        "name": "entity1",
+        "entity_type": "tool",
+        "observations": ["observation1", "observation2"],
+    },
+    {"name": "entity2", "entity_type": "person", "observations": []},
+    {"name": "entity1", "entity_type": "job", "observations": []},
+    {"name": "entity3", "entity_type": "vehicle", "observations": []},
+]
+relations = [
+    {"from_entity": "entity1", "to_entity": "entity2", "relation_type": "type1"},
+    {"from_entity": "entity2", "to_entity": "entity3", "relation_type": "type2"},
+]
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup_manager(tmp_path, monkeypatch):
+    manager = mcp_memory.server.KnowledgeGraphManager(
+        SQLiteStorage(str(tmp_path / "memory.db"))
+    )
+    monkeypatch.setattr(mcp_memory.server, "manager", manager)
+    asyncio.run(manager.setup())
+
+    yield manager
+
+    asyncio.run(manager.close())
+
+
+@pytest.fixture(scope="function")
+def setup_graph(setup_manager):
+    asyncio.run(setup_manager.create_entities({"entities": entities}))
+    asyncio.run(setup_manager.create_relations({"relations": relations}))
+
+
+@pytest.mark.usefixtures("setup_graph")
+def test_delete_entities(setup_manager):
+    asyncio.run(setup_manager.delete_entities({"entity_names": ["entity1"]}))
+
+    assert (
+        setup_manager.storage.db.execute(
+            "SELECT COUNT(*) FROM observations"
+        ).fetchone()[0]
+        == 0
+    )
+
+
+@pytest.mark.usefixtures("setup_graph")
+def test_list_by_type(setup_manager):
+    plan = " ".join(
+        row[-1]
+        for row in setup_manager.storage.db.execute(
+            "EXPLAIN QUERY PLAN SELECT name FROM entities "
+            "WHERE entity_type = 'tool' AND name > '' ORDER BY name"
+        )
+    )
+
+    assert "COVERING INDEX entities_type_name" in plan
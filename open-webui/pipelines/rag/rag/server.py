@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 from functools import wraps
 from typing import Optional
 
@@ -30,7 +32,53 @@ logging.basicConfig(
 logger = logging.getLogger("rag_notes_server")
 logger.setLevel("DEBUG")
 load_dotenv()
-app = FastAPI()
+
+
+async def connect_chroma():
+    remote_db = await chromadb.AsyncHttpClient(
+        settings=Settings(
+            anonymized_telemetry=False,
+            chroma_client_auth_provider="chromadb.auth.token_authn.TokenAuthClientProvider",
+            chroma_client_auth_credentials=os.environ.get("CHROMA_AUTH_TOKEN"),
+        ),
+        host=os.environ.get("CHROMA_HOST"),
+        port=int(os.environ.get("CHROMA_PORT", 8000)),
+        ssl=os.environ.get("CHROMA_USE_SSL", "false").lower() == "true",
+    )
+    return await remote_db.get_collection("notion")
+
+
+def create_embed_model() -> OllamaEmbedding:
+    protocol = (
+        "https"
+        if os.environ.get("OLLAMA_USE_SSL", "false").lower() == "true"
+        else "http"
+    )
+    return OllamaEmbedding(
+        model_name="nomic-embed-text",
+        base_url=f"{protocol}://{os.environ.get('OLLAMA_HOST')}:{os.environ.get('OLLAMA_PORT', 11434)}",
+        # ollama_additional_kwargs={"mirostat": 0},
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The clients are async and shared by every request, so a slow embed or
+    # query only holds up its own request, not the event loop. Chroma is
+    # connected on first use, so the app and its health check come up even
+    # while Chroma is unreachable.
+    logger.debug("Setting up Chroma and embeddings...")
+    app.state.chroma_collection = None
+    app.state.chroma_lock = asyncio.Lock()
+    app.state.embed_model = create_embed_model()
+    with open(
+        os.path.join(os.path.dirname(__file__), "notes_rag_prompt.txt"), "r"
+    ) as file:
+        app.state.template = file.read()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 logger.info("Server started.")
 
@@ -50,6 +98,18 @@ def log_function_call(func):
     return wrapper
 
 
+async def get_chroma_collection():
+    """
+    The collection shared by every request, connected once. A failed
+    connect fails only its request and is retried by the next one.
+    """
+    if app.state.chroma_collection is None:
+        async with app.state.chroma_lock:
+            if app.state.chroma_collection is None:
+                app.state.chroma_collection = await connect_chroma()
+    return app.state.chroma_collection
+
+
 class PromptQuery(BaseModel):
     question: str
 
@@ -67,35 +127,12 @@ async def get_prompt(query: PromptQuery, n_results: Optional[int] = 3):
 
     question = query.question
 
-    remote_db = chromadb.HttpClient(
-        settings=Settings(
-            anonymized_telemetry=False,
-            chroma_client_auth_provider="chromadb.auth.token_authn.TokenAuthClientProvider",
-            chroma_client_auth_credentials=os.environ.get("CHROMA_AUTH_TOKEN"),
-        ),
-        host=os.environ.get("CHROMA_HOST"),
-        port=int(os.environ.get("CHROMA_PORT", 8000)),
-        ssl=os.environ.get("CHROMA_USE_SSL", "false").lower() == "true",
-    )
-
-    chroma_collection = remote_db.get_collection("notion")
     # vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
 
-    protocol = (
-        "https"
-        if os.environ.get("OLLAMA_USE_SSL", "false").lower() == "true"
-        else "http"
-    )
-    logger.debug("Setting up embeddings...")
-    embed_model = OllamaEmbedding(
-        model_name="nomic-embed-text",
-        base_url=f"{protocol}://{os.environ.get('OLLAMA_HOST')}:{os.environ.get('OLLAMA_PORT', 11434)}",
-        # ollama_additional_kwargs={"mirostat": 0},
-    )
-
     logger.debug("Getting query embedding...")
-    query_embedding = embed_model.get_query_embedding(question)
-    results = chroma_collection.query(
+    query_embedding = await app.state.embed_model.aget_query_embedding(question)
+    chroma_collection = await get_chroma_collection()
+    results = await chroma_collection.query(
         query_embeddings=query_embedding, n_results=n_results
     )
 
@@ -110,13 +147,7 @@ async def get_prompt(query: PromptQuery, n_results: Optional[int] = 3):
         logger.info(f"Metadata: {results['metadatas'][0][result_id]}")
         logger.info(f"Score: {results['distances'][0][result_id]}\n")
 
-    logger.info("Loading prompt template...")
-    with open(
-        os.path.join(os.path.dirname(__file__), "notes_rag_prompt.txt"), "r"
-    ) as file:
-        template = file.read()
-
-    template = template.replace("[DOCUMENT_TEXT]", document_text)
+    template = app.state.template.replace("[DOCUMENT_TEXT]", document_text)
     template = template.replace("[USER_MESSAGE]", question)
 
     logger.info("===================Prompt===================")
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from rag import server
+
+DELAY = 0.2
+REQUESTS = 10
+
+
+class SlowEmbedModel:
+    async def aget_query_embedding(self, question):
+        await asyncio.sleep(DELAY)
+        return [1.0]
+
+
+class SlowCollection:
+    async def query(self, query_embeddings, n_results):
+        await asyncio.sleep(DELAY)
+        return {
+            "ids": [["doc1"]],
+            "documents": [["Kubernetes runs on EKS"]],
+            "metadatas": [[{"title": "AWS"}]],
+            "distances": [[0.5]],
+        }
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    attempts = []
+
+    async def connect_chroma():
+        attempts.append(len(attempts))
+        await asyncio.sleep(DELAY)
+        if len(attempts) == 1:
+            raise ConnectionError("Chroma is down")
+        return SlowCollection()
+
+    monkeypatch.setattr(server, "connect_chroma", connect_chroma)
+    monkeypatch.setattr(server, "create_embed_model", SlowEmbedModel)
+    return attempts
+
+
+def test_starts_without_chroma(connections):
+    with TestClient(server.app, raise_server_exceptions=False) as client:
+        health = client.get("/healthz")
+        failed = client.post("/prompt", json={"question": "EKS"})
+        prompt = client.post("/prompt", json={"question": "EKS"})
+
+    assert health.status_code == 200
+    assert failed.status_code == 500
+    assert prompt.status_code == 200
+    assert "Kubernetes runs on EKS" in prompt.json()["prompt"]
+    assert len(connections) == 2
+
+
+def test_prompts_overlap(monkeypatch):
+    attempts = []
+
+    async def connect_chroma():
+        attempts.append(len(attempts))
+        await asyncio.sleep(DELAY)
+        return SlowCollection()
+
+    monkeypatch.setattr(server, "connect_chroma", connect_chroma)
+    monkeypatch.setattr(server, "create_embed_model", SlowEmbedModel)
+
+    async def prompt_concurrently():
+        async with server.lifespan(server.app):
+            started = time.perf_counter()
+            prompts = await asyncio.gather(
+                *(
+                    server.get_prompt(server.PromptQuery(question=f"question {i}"))
+                    for i in range(REQUESTS)
+                )
+            )
+            return prompts, time.perf_counter() - started
+
+    prompts, elapsed = asyncio.run(prompt_concurrently())
+
+    assert all("Kubernetes runs on EKS" in prompt["prompt"] for prompt in prompts)
+    assert len(attempts) == 1
+    # Serialized, the embeds, connect and queries would take 2 * REQUESTS * DELAY.
+    assert elapsed < 5 * DELAY